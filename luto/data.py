@@ -133,6 +133,14 @@ class Data:
         self.ag_man_dvars = {}
         self.prod_data = {}
         self.obj_vals = {}
+        self.solver_telemetry = {}
+        self.written_years = set()      # Years whose outputs were already written during the run (see settings.WRITE_DURING_RUN)
+
+        # Cache of solver inputs reused between timeseries steps (see `luto.solvers.input_data`).
+        self.SOLVER_INPUT_CACHE = {}
+        
+        # Futures of solver inputs precomputed for upcoming target years (see `luto.solvers.input_data`).
+        self.PRECOMPUTED_INPUTS = {}
 
         # Containers for reprojected dvar data
         self.ag_dvars_2D_reproj_match = {}
@@ -370,6 +378,13 @@ class Data:
                     ... # Do nothing, this should be a crop.
 
         self.PR2CM = dict2matrix(self.CM2PR_DICT, self.COMMODITIES, self.PRODUCTS).T # Note the transpose.
+
+        # Scatter matrices (p, j) from the land uses of each agricultural management to their products,
+        # i.e., LU2PR restricted to the land uses the management applies to. Used by `get_production`.
+        self.AM_LU2PR = {
+            am: self.LU2PR * np.isin(self.AGRICULTURAL_LANDUSES, am_lus)
+            for am, am_lus in AG_MANAGEMENTS_TO_LAND_USES.items()
+        }
         
         
         # Get the land-use indices for each commodity.
@@ -592,6 +607,8 @@ class Data:
         # and Calculate base year production 
         ###############################################################
         self.CLIMATE_CHANGE_IMPACT = self.get_df_resfactor_applied(self.CLIMATE_CHANGE_IMPACT)
+        self.CCIMPACT_INTERPOLATORS = {}    # Climate change impact interpolators by (lu, lm), see `ag_quantity.get_ccimpact`.
+        self.AG_SHARED_YIELDS = {}          # Yields shared by the agricultural matrix builders by year index, see `ag_quantity.shared_yields`.
         self.FEED_REQ = self.get_array_resfactor_applied(self.FEED_REQ)
         self.PASTURE_KG_DM_HA = self.get_array_resfactor_applied(self.PASTURE_KG_DM_HA)
         self.SAFE_PUR_MODL = self.get_array_resfactor_applied(self.SAFE_PUR_MODL)
@@ -661,6 +678,9 @@ class Data:
         # Boolean x_mrj matrix with allowed land uses j for each cell r under lm.
         self.EXCLUDE = np.load(os.path.join(INPUT_DIR, "x_mrj.npy"))
         self.EXCLUDE = self.EXCLUDE[:, self.MASK, :]  # Apply resfactor specially for the exclude matrix
+        
+        # Bit-packed x_mrj exclude matrices by lumap hash, see `ag_transitions.get_exclude_matrices`.
+        self.EXCLUDE_MATRICES_CACHE = {}
 
 
 
@@ -745,6 +765,12 @@ class Data:
         
         # Initialize water constraints to avoid recalculating them every time.
         self.WATER_YIELD_LIMITS = None
+        
+        # Livestock yield potential used by the water requirement matrices, see `ag_water.get_lvstk_yield_pot_for_wreq`.
+        self.WREQ_YIELD_POT = {}
+        
+        # Sparse (region x cell) aggregation matrices by water region definition, see `ag_water.get_water_region_matrix`.
+        self.WATER_REGION_MATRICES = {}
 
         # Water requirements by land use -- LVSTK.
         wreq_lvstk_dry = pd.DataFrame()
@@ -1525,17 +1551,24 @@ class Data:
         """
         self.obj_vals[yr] = obj_val
 
+    def add_solver_telemetry(self, yr: int, telemetry: dict):
+        """
+        Safely save the solver telemetry (see `luto.solvers.telemetry`) for a given year to the Data object
+        """
+        self.solver_telemetry[yr] = telemetry
+
     def set_path(self, base_year, target_year) -> str:
-        """Create a folder for storing outputs and return folder name."""
+        """Create a folder for storing outputs and return folder name. In snapshot mode, `target_year` can be a list of target years."""
 
         # Get the years to write
         if settings.MODE == "snapshot":
-            yr_all = [base_year, target_year]
+            yr_all = [base_year] + (sorted(target_year) if isinstance(target_year, list) else [target_year])
         elif settings.MODE == "timeseries":
             yr_all = list(range(base_year, target_year + 1))
 
         # Create path name
         self.path = f"{OUTPUT_DIR}/{self.timestamp_sim}_RF{settings.RESFACTOR}_{yr_all[0]}-{yr_all[-1]}_{settings.MODE}"
+        self.written_years = set()
 
         # Get all paths
         paths = (
@@ -1594,41 +1627,48 @@ class Data:
         # Calculate year index (i.e., number of years since 2010)
         yr_idx = yr_cal - self.YR_CAL_BASE
 
-        # Get the quantity of each commodity produced by agricultural land uses
-        ag_q_mrp = ag_quantity.get_quantity_matrices(self, yr_idx)
+        return self.get_production_from_dvars(yr_idx, ag_X_mrj, non_ag_X_rk, ag_man_X_mrj, lumap)
 
-        # Convert map of land-use in mrj format to mrp format using vectorization
-        ag_X_mrp = np.einsum('mrj,pj->mrp', ag_X_mrj, self.LU2PR.astype(bool))
+    def get_production_from_dvars(
+        self,
+        yr_idx: int,
+        ag_X_mrj: np.ndarray,
+        non_ag_X_rk: np.ndarray,
+        ag_man_X_mrj: dict[str, np.ndarray],
+        lumap: np.ndarray,
+        ag_q_mrp: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Return total production of commodities in year index `yr_idx` of the given agricultural,
+        non-agricultural and agricultural management decision variables (or land-use maps in the same format).
+
+        Products of the agricultural land uses and managements are summed directly from the (m, r, j)
+        decision variables by contracting them with the (p, j) scatter matrices LU2PR and AM_LU2PR,
+        without expanding the decision variables to (m, r, p) arrays. The quantity matrices `ag_q_mrp`
+        of `yr_idx` are calculated if not given.
+        """
+        if ag_q_mrp is None:
+            ag_q_mrp = ag_quantity.get_quantity_matrices(self, yr_idx)
 
         # Sum quantities in product (PR/p) representation.
-        ag_q_p = np.einsum('mrp,mrp->p', ag_q_mrp, ag_X_mrp)
+        ag_q_p = np.einsum('mrp,mrj,pj->p', ag_q_mrp, ag_X_mrj, self.LU2PR, optimize=True)
+
+        # Add quantities produced by agricultural management options
+        ag_man_q_mrp = ag_quantity.get_agricultural_management_quantity_matrices(self, ag_q_mrp, yr_idx)
+        for am, am_X_mrj in ag_man_X_mrj.items():
+            if not settings.AG_MANAGEMENTS[am]:
+                continue
+            ag_q_p += np.einsum('mrp,mrj,pj->p', ag_man_q_mrp[am], am_X_mrj, self.AM_LU2PR[am], optimize=True)
 
         # Transform quantities to commodity (CM/c) representation.
-        ag_q_c = np.einsum('cp,p->c', self.PR2CM.astype(bool), ag_q_p)
+        ag_q_c = self.PR2CM @ ag_q_p
 
         # Get the quantity of each commodity produced by non-agricultural land uses
         q_crk = non_ag_quantity.get_quantity_matrix(self, ag_q_mrp, lumap)
         non_ag_q_c = np.einsum('crk,rk->c', q_crk, non_ag_X_rk)
 
-        # Get quantities produced by agricultural management options
-        ag_man_q_mrp = ag_quantity.get_agricultural_management_quantity_matrices(self, ag_q_mrp, yr_idx)
-        ag_man_q_c = np.zeros(self.NCMS)
-
-        j2p = {j: [p for p in range(self.NPRS) if self.LU2PR[p, j]]
-                        for j in range(self.N_AG_LUS)}
-        for am, am_lus in AG_MANAGEMENTS_TO_LAND_USES.items():
-            am_j_list = [self.DESC2AGLU[lu] for lu in am_lus]
-            current_ag_man_X_mrp = np.zeros(ag_q_mrp.shape, dtype=np.float32)
-            for j in am_j_list:
-                for p in j2p[j]:
-                    current_ag_man_X_mrp[:, :, p] = ag_man_X_mrj[am][:, :, j]
-
-            ag_man_q_p = np.einsum('mrp,mrp->p', ag_man_q_mrp[am], current_ag_man_X_mrp)
-            ag_man_q_c += np.einsum('cp,p->c', self.PR2CM.astype(bool), ag_man_q_p)
-
         # Return total commodity production as numpy array.
-        total_q_c = ag_q_c + non_ag_q_c + ag_man_q_c
-        return total_q_c
+        return ag_q_c + non_ag_q_c
 
     def get_carbon_price_by_yr_idx(self, yr_idx: int) -> float:
         """
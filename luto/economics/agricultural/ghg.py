@@ -22,6 +22,7 @@ Pure functions to calculate greenhouse gas emissions by lm, lu.
 import itertools
 import numpy as np
 import pandas as pd
+from typing import Optional
 
 from luto.data import Data
 from luto.economics.agricultural.quantity import get_yield_pot
@@ -240,7 +241,7 @@ def get_ghg_matrices(data: Data, yr_idx, aggregate=True):
 
 
 
-def get_ghg_transition_penalties(data: Data, lumap) -> np.ndarray:
+def get_ghg_transition_penalties(data: Data, lumap, cells: Optional[np.ndarray] = None) -> np.ndarray:
     """
     Gets the one-off greenhouse gas penalties for transitioning natural land to
     modified land. The penalty represents the carbon that is emitted when
@@ -249,22 +250,24 @@ def get_ghg_transition_penalties(data: Data, lumap) -> np.ndarray:
     Parameters:
         data (object): The data object containing relevant information.
         lumap (1D array): The lumap object containing land use mapping.
+        cells (1D array, optional): Only calculate the rows of these cells (all cells if None).
 
     Returns:
         np.ndarray, <unit : t/cell>.
     """
-    ncells, n_ag_lus = data.REAL_AREA.shape[0], len(data.AGRICULTURAL_LANDUSES)
+    cell_idx = slice(None) if cells is None else cells
+    is_natural_r = np.isin(lumap[cell_idx], data.LU_NATURAL)
+
     # Set up empty array of penalties
-    penalties_rj = np.zeros((ncells, n_ag_lus), dtype=np.float32)
-    natural_lu_cells = tools.get_ag_natural_lu_cells(data, lumap)
+    penalties_rj = np.zeros((is_natural_r.shape[0], len(data.AGRICULTURAL_LANDUSES)), dtype=np.float32)
 
     # Calculate penalties and add to g_rj matrix
-    penalties_r = (
-          data.NATURAL_LAND_T_CO2_HA[natural_lu_cells]
-        * data.REAL_AREA[natural_lu_cells]
+    penalties_r = np.where(
+        is_natural_r,
+        data.NATURAL_LAND_T_CO2_HA[cell_idx] * data.REAL_AREA[cell_idx],
+        0
     )
-    for lu in data.LU_MODIFIED_LAND:
-        penalties_rj[natural_lu_cells, lu] = penalties_r
+    penalties_rj[:, data.LU_MODIFIED_LAND] = penalties_r[:, np.newaxis]
 
     return np.stack([penalties_rj] * 2)
 
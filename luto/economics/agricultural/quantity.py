@@ -18,6 +18,7 @@
 Pure functions for calculating the production quantities of agricutlural commodities.
 """
 
+from contextlib import contextmanager
 from typing import Dict
 import numpy as np
 from scipy.interpolate import interp1d
@@ -74,14 +75,31 @@ def get_ccimpact(data, lu, lm, yr_idx):
 
     Returns:
     - The climate change impact multiplier at the specified year index.
+
+    Notes:
+    - The interpolator of each (lu, lm) is built once and cached in `data.CCIMPACT_INTERPOLATORS`.
     """
+    if (lu, lm) not in data.CCIMPACT_INTERPOLATORS:
+        data.CCIMPACT_INTERPOLATORS[lu, lm] = get_ccimpact_interpolator(data, lu, lm)
+    f = data.CCIMPACT_INTERPOLATORS[lu, lm]
 
-    # Check if land-use exists in CLIMATE_CHANGE_IMPACT (e.g., dryland Pears/Rice do not occur), if not return ones
-    if lu not in {t[0] for t in data.CLIMATE_CHANGE_IMPACT[lm].columns}:
+    # Land-use does not exist in CLIMATE_CHANGE_IMPACT (e.g., dryland Pears/Rice do not occur), return ones
+    if f is None:
         return np.ones((data.NCELLS))
 
     # Convert year index to calendar year to match the climate impact data which is by calendar year.
     yr_cal = data.YR_CAL_BASE + yr_idx
+    return f(yr_cal)
+
+
+def get_ccimpact_interpolator(data, lu, lm):
+    """
+    Return the linear interpolator over calendar years of the climate change impact multiplier of
+    `lu`+`lm` for each cell, or None if the land-use does not exist in CLIMATE_CHANGE_IMPACT.
+    """
+    # Check if land-use exists in CLIMATE_CHANGE_IMPACT (e.g., dryland Pears/Rice do not occur)
+    if lu not in {t[0] for t in data.CLIMATE_CHANGE_IMPACT[lm].columns}:
+        return None
 
     # Interpolate climate change damage for lu, lm, and year for each cell using a linear function.
     xs = {t[2] for t in data.CLIMATE_CHANGE_IMPACT.columns}  # Returns set {2020, 2050, 2080}
@@ -91,9 +109,32 @@ def get_ccimpact(data, lu, lm, yr_idx):
     yys.insert(0, '2010', 1)                                 # Insert a new column for 2010 with value of 1 to ensure no climate change impact at 2010
     yys = yys.astype(np.float32)
 
-    # Create linear function f and interpolate climate change impact
-    f = interp1d(xs, yys, kind='linear', fill_value='extrapolate')
-    return f(yr_cal)
+    # Create linear function f to interpolate climate change impact
+    return interp1d(xs, yys, kind='linear', fill_value='extrapolate')
+
+
+@contextmanager
+def shared_yields(data, yr_idx):
+    """
+    Context manager within which the livestock yield potentials and product quantities of `yr_idx`
+    are calculated once per (lu, lm) and shared by all callers of `get_yield_pot` and `get_quantity`.
+
+    The quantity, cost, revenue, GHG and water builders all start from the same yields, so building
+    them inside this context avoids re-evaluating the yields and their climate change impacts for
+    each of them. The shared yields are stored in `data.AG_SHARED_YIELDS` and dropped on exit.
+
+    Notes:
+    - The shared arrays are returned as is, so callers must not modify them in place.
+    """
+    owner = yr_idx not in data.AG_SHARED_YIELDS
+    if owner:
+        data.AG_SHARED_YIELDS[yr_idx] = {'yield_pot': {}, 'quantity': {}}
+    try:
+        yield
+    finally:
+        # Only the outermost context of this year drops the shared yields.
+        if owner:
+            data.AG_SHARED_YIELDS.pop(yr_idx, None)
 
 
 def get_yield_pot(data, lvstype, vegtype, lm, yr_idx):
@@ -111,6 +152,11 @@ def get_yield_pot(data, lvstype, vegtype, lm, yr_idx):
     - yield_pot: The yield potential <unit: head/ha>.
     """
 
+    # Return the shared yield potential if it was already calculated within `shared_yields`.
+    shared = data.AG_SHARED_YIELDS.get(yr_idx, {}).get('yield_pot')
+    if shared is not None and (lvstype, vegtype, lm) in shared:
+        return shared[lvstype, vegtype, lm]
+
     # Factors varying as a function of `lvstype`.
     dse_per_head = {'BEEF': 8, 'SHEEP': 1.5, 'DAIRY': 17}
     grassfed_factor = {'BEEF': 0.85, 'SHEEP': 0.85, 'DAIRY': 0.65}
@@ -138,6 +184,9 @@ def get_yield_pot(data, lvstype, vegtype, lm, yr_idx):
     # Here we can add a productivity multiplier for sustainable intensification to increase pasture growth and yield potential (i.e., head/ha)
     # yield_pot *= yield_mult  ***Still to do***
 
+    if shared is not None:
+        shared[lvstype, vegtype, lm] = yield_pot
+
     return yield_pot
 
 
@@ -271,6 +320,11 @@ def get_quantity(data, pr, lm, yr_idx):
         - If it is a crop, it is known how to get the quantities.
         - Apply productivity increase multiplier by product. Essentially, this is a total factor productivity increase.
     """
+    # Return the shared quantity if it was already calculated within `shared_yields`.
+    shared = data.AG_SHARED_YIELDS.get(yr_idx, {}).get('quantity')
+    if shared is not None and (pr, lm) in shared:
+        return shared[pr, lm]
+
     # If it is a crop, it is known how to get the quantities.
     if pr in data.PR_CROPS:
         q = get_quantity_crop(data, pr.capitalize(), lm, yr_idx)
@@ -284,6 +338,9 @@ def get_quantity(data, pr, lm, yr_idx):
     # Apply productivity increase multiplier by product. Essentially, this is a total factor productivity increase.
     q *= data.BAU_PROD_INCR[lm, pr][yr_idx]
 
+    if shared is not None:
+        shared[pr, lm] = q
+
     return q
 
 
@@ -18,8 +18,9 @@
 Data about transitions costs.
 """
 
+import hashlib
 import numpy as np
-from typing import Dict
+from typing import Dict, Optional
 
 from luto.data import Data, lumap2ag_l_mrj
 from luto.settings import AG_MANAGEMENTS
@@ -30,7 +31,21 @@ from luto import settings
 import luto.tools as tools
 
 
-def get_exclude_matrices(data: Data, lumap: np.ndarray):
+# Number of lumaps whose (bit-packed) exclude matrices are memoised in `data.EXCLUDE_MATRICES_CACHE`.
+EXCLUDE_MATRICES_CACHE_SIZE = 8
+
+# Cost components along the leading axis of `get_transition_cost_components`.
+AG_TRANSITION_COST_TYPES = ('Establishment cost', 'Water license cost', 'GHG emissions cost')
+
+
+def get_lumap_hash(lumap: np.ndarray) -> tuple:
+    """Return a hashable key identifying the content of `lumap`."""
+    lumap = np.ascontiguousarray(lumap)
+    digest = hashlib.blake2b(lumap.tobytes(), digest_size=16).hexdigest()
+    return (lumap.dtype.str, lumap.shape, digest)
+
+
+def get_exclude_matrices(data: Data, lumap: np.ndarray, cells: Optional[np.ndarray] = None):
     """Return x_mrj exclude matrices.
 
     An exclude matrix indicates whether switching land-use for a certain cell r
@@ -41,10 +56,10 @@ def get_exclude_matrices(data: Data, lumap: np.ndarray):
     ----------
 
     data: Data object.
-    base_year: int
-        Current base year of the solve.
-    lumaps: dict[str, numpy.ndarray]
-        All previously generated land-use maps (shape = ncells, dtype=int).
+    lumap: numpy.ndarray
+        Land-use map of the base year (shape = ncells, dtype=int).
+    cells: numpy.ndarray, optional
+        Only calculate the rows of these cells (all cells if None).
 
 
     Returns
@@ -54,26 +69,50 @@ def get_exclude_matrices(data: Data, lumap: np.ndarray):
         x_mrj exclude matrix. The m-slices correspond to the
         different land-management versions of the land-use `j` to switch _to_.
         With m==0 conventional dryland, m==1 conventional irrigated.
+        If `cells` is given, the r-axis is indexed by `cells`.
+
+    Notes
+    -----
+    The full matrices are memoised per lumap (by content hash) as bit-packed boolean masks, as the
+    same lumap is requested by the agricultural and non-agricultural builders within a year and the
+    all-sheep/all-beef lumaps of the non-agricultural transitions are identical across years.
+    """
+    if cells is not None:
+        return calc_exclude_matrices(data, lumap, cells)
+
+    key = get_lumap_hash(lumap)
+    x_mrj_packed = data.EXCLUDE_MATRICES_CACHE.get(key)
+    if x_mrj_packed is None:
+        x_mrj_packed = np.packbits(calc_exclude_matrices(data, lumap).astype(bool), axis=-1)
+        data.EXCLUDE_MATRICES_CACHE[key] = x_mrj_packed
+
+        # Evict the oldest lumaps
+        for old_key in list(data.EXCLUDE_MATRICES_CACHE)[:-EXCLUDE_MATRICES_CACHE_SIZE]:
+            data.EXCLUDE_MATRICES_CACHE.pop(old_key, None)
+
+    return np.unpackbits(x_mrj_packed, axis=-1, count=data.N_AG_LUS).view(np.int8)
+
+
+def calc_exclude_matrices(data: Data, lumap: np.ndarray, cells: Optional[np.ndarray] = None):
     """
+    Calculate the x_mrj exclude matrices without memoisation, see `get_exclude_matrices`.
+    """
+    cell_idx = slice(None) if cells is None else cells
+
     # Boolean exclusion matrix based on SA2/NLUM agricultural land-use data (in mrj structure).
     # Effectively, this ensures that in any SA2 region the only combinations of land-use and land management
     # that can occur in the future are those that occur in 2010 (i.e., YR_CAL_BASE)
-    x_mrj = data.EXCLUDE
+    x_mrj = data.EXCLUDE[:, cell_idx, :]
 
     # Raw transition-cost matrix is in $/ha and lexicographically ordered by land-use (shape = 28 x 28).
     t_ij = data.AG_TMATRIX
 
-    lumap_2010 = data.LUMAP
-
-    # Get all agricultural and non-agricultural cells
-    ag_cells, non_ag_cells = tools.get_ag_and_non_ag_cells(lumap)
+    # For non-agricultural cells, use the original 2010 solve's LUs to determine what LUs are possible for a cell
+    lumap_cells = lumap[cell_idx]
+    lumap_cells = np.where(lumap_cells >= settings.NON_AGRICULTURAL_LU_BASE_CODE, data.LUMAP[cell_idx], lumap_cells)
 
     # Transition costs from current land-use to all other land-uses j using current land-use map (in $/ha).
-    t_rj = np.zeros((data.NCELLS, len(data.AGRICULTURAL_LANDUSES)))
-    t_rj[ag_cells, :] = t_ij[lumap[ag_cells]]
-
-    # For non-agricultural cells, use the original 2010 solve's LUs to determine what LUs are possible for a cell
-    t_rj[non_ag_cells, :] = t_ij[lumap_2010[non_ag_cells]]
+    t_rj = t_ij[lumap_cells]
 
     # To be excluded based on disallowed switches as specified in transition cost matrix i.e., where t_rj is NaN.
     t_rj = np.where(np.isnan(t_rj), 0, 1)
@@ -81,81 +120,128 @@ def get_exclude_matrices(data: Data, lumap: np.ndarray):
     return (x_mrj * t_rj).astype(np.int8)
 
 
-def get_transition_matrices(data: Data, yr_idx, base_year, separate=False):
+def get_transition_base_matrices(
+    data: Data, lumap: np.ndarray, lmmap: np.ndarray, cells: Optional[np.ndarray] = None
+) -> dict[str, np.ndarray]:
     """
-    Calculate the transition matrices for land-use and land management transitions.
+    Return the parts of the transition matrices that only depend on the land-use and land management
+    maps, i.e. before the year-dependent multipliers (transition cost multiplier, carbon price) are applied.
+
+    Parameters:
+        data (Data object): The data object containing the necessary input data.
+        lumap (np.ndarray): Land-use map of the base year.
+        lmmap (np.ndarray): Land management map of the base year.
+        cells (np.ndarray, optional): Only calculate the rows of these cells (all cells if None).
+
+    Returns:
+        dict: Matrices indexed (m, r, j), where r is indexed by `cells` if given:
+            - 'x_mrj': exclude matrices.
+            - 'l_mrj_not': True where land-use j under land management m is not the current one of the cell.
+            - 'e_mrj' <unit: $/cell>: amortised establishment costs at a transition cost multiplier of 1.
+            - 'ghg_t_mrj' <unit: t/cell>: amortised GHG emissions released by transitions, i.e. the cost at a carbon price of 1.
+    """
+    cell_idx = slice(None) if cells is None else cells
+    lumap_cells = lumap[cell_idx]
+
+    x_mrj = get_exclude_matrices(data, lumap, cells)
+    l_mrj_not = np.logical_not(lumap2ag_l_mrj(lumap_cells, lmmap[cell_idx]))
+
+    # Non-irrigation related transition costs for cell r to change to land-use j calculated based on lumap (in $/ha).
+    # Only consider for cells currently being used for agriculture.
+    ag_cells = lumap_cells < settings.NON_AGRICULTURAL_LU_BASE_CODE
+    e_rj = np.zeros((lumap_cells.shape[0], data.N_AG_LUS))
+    e_rj[ag_cells, :] = data.AG_TMATRIX[lumap_cells[ag_cells]]
+
+    # Amortise upfront costs to annualised costs and converted to $ per cell via REAL_AREA
+    e_rj = tools.amortise(e_rj) * data.REAL_AREA[cell_idx, np.newaxis]
+
+    # Repeat the establishment costs into dryland and irrigated land management types and apply the exclude matrices;
+    # the transition cost for a cell that remain the same is 0.
+    e_mrj = np.einsum('rj,mrj,mrj->mrj', e_rj, x_mrj, l_mrj_not)
+
+    # Carbon released by transitioning natural land to modified land
+    ghg_t_mrj = tools.amortise(ag_ghg.get_ghg_transition_penalties(data, lumap, cells))     # <unit: t/cell>
+    ghg_t_mrj = np.einsum('mrj,mrj,mrj->mrj', ghg_t_mrj, x_mrj, l_mrj_not)
+
+    return {'x_mrj': x_mrj, 'l_mrj_not': l_mrj_not, 'e_mrj': e_mrj, 'ghg_t_mrj': ghg_t_mrj}
+
+
+def get_transition_cost_components(data: Data, yr_idx, base_year, base_matrices: Optional[dict] = None) -> np.ndarray:
+    """
+    Calculate the land-use and land management transition costs with a cost-component axis.
     Args:
         data (Data object): The data object containing the necessary input data.
         yr_idx (int): The index of the current year.
         base_year (int): The base year for the transition calculations.
-        separate (bool, optional): Whether to return separate cost matrices for each cost component.
-                                   Defaults to False.
+        base_matrices (dict, optional): The output of `get_transition_base_matrices` for the land-use and land
+                                   management maps of `base_year`. Calculated if not given.
     Returns:
-        numpy.ndarray or dict: The transition matrices for land-use and land management transitions.
-                               If `separate` is False, returns a numpy array representing the total costs.
-                               If `separate` is True, returns a dictionary with separate cost matrices for
-                               establishment costs, Water license cost, and carbon releasing costs.
+        numpy.ndarray: 4-D array indexed by (s, m, r, j), where `s` follows `AG_TRANSITION_COST_TYPES`.
     """
     yr_cal = data.YR_CAL_BASE + yr_idx
     lumap = data.lumaps[base_year]
     lmmap = data.lmmaps[base_year]
-    # Return l_mrj (Boolean) for current land-use and land management
-    l_mrj = lumap2ag_l_mrj(lumap, lmmap)
-    l_mrj_not = np.logical_not(l_mrj)
 
-    # Get the exclusion matrix
-    x_mrj = get_exclude_matrices(data, lumap)
+    # Get the exclusion matrix and the (Boolean) current land-use and land management matrix
+    if base_matrices is None:
+        base_matrices = get_transition_base_matrices(data, lumap, lmmap)
+    x_mrj = base_matrices['x_mrj']
+    l_mrj_not = base_matrices['l_mrj_not']
+    l_mrj = np.logical_not(l_mrj_not)
 
-    ag_cells, _ = tools.get_ag_and_non_ag_cells(lumap)
+    w_mrj = get_wreq_matrices(data, yr_idx)                                     # <unit: ML/cell>
+    w_delta_mrj = tools.get_water_delta_matrix(w_mrj, l_mrj, data, yr_idx)
 
-    n_ag_lms, ncells, n_ag_lus = data.AG_L_MRJ.shape
+    # All components are written into one buffer so the total and the separate costs share memory
+    dtype = np.result_type(base_matrices['e_mrj'], w_delta_mrj, base_matrices['ghg_t_mrj'])
+    t_smrj = np.empty((len(AG_TRANSITION_COST_TYPES), *w_delta_mrj.shape), dtype=dtype)
 
     # -------------------------------------------------------------- #
     # Establishment costs (upfront, amortised to annual, per cell).  #
     # -------------------------------------------------------------- #
 
-    # Raw transition-cost matrix is in $/ha and lexigraphically ordered (shape: land-use x land-use).
-    t_ij = data.AG_TMATRIX * data.TRANS_COST_MULTS[yr_cal]
-
-    # Non-irrigation related transition costs for cell r to change to land-use j calculated based on lumap (in $/ha).
-    # Only consider for cells currently being used for agriculture.
-    e_rj = np.zeros((ncells, n_ag_lus))
-    e_rj[ag_cells, :] = t_ij[lumap[ag_cells]]
-
-    # Amortise upfront costs to annualised costs and converted to $ per cell via REAL_AREA
-    e_rj = tools.amortise(e_rj) * data.REAL_AREA[:, np.newaxis]
-
-    # Repeat the establishment costs into dryland and irrigated land management types
-    e_mrj = np.stack([e_rj, e_rj], axis=0)
-
-    # Update the cost matrix with exclude matrices; the transition cost for a cell that remain the same is 0.
-    e_mrj = np.einsum('mrj,mrj,mrj->mrj', e_mrj, x_mrj, l_mrj_not)
+    # The base costs are based on the raw transition-cost matrix ($/ha); amortisation is linear so the multiplier can be applied afterwards.
+    np.multiply(base_matrices['e_mrj'], data.TRANS_COST_MULTS[yr_cal], out=t_smrj[0])
 
     # -------------------------------------------------------------- #
     # Water license cost (upfront, amortised to annual, per cell).   #
     # -------------------------------------------------------------- #
 
-    w_mrj = get_wreq_matrices(data, yr_idx)                                     # <unit: ML/cell>
-    w_delta_mrj = tools.get_water_delta_matrix(w_mrj, l_mrj, data, yr_idx)
-    w_delta_mrj = np.einsum('mrj,mrj,mrj->mrj', w_delta_mrj, x_mrj, l_mrj_not)
+    np.einsum('mrj,mrj,mrj->mrj', w_delta_mrj, x_mrj, l_mrj_not, out=t_smrj[1])
 
     # -------------------------------------------------------------- #
     # Carbon costs of transitioning cells.                           #
     # -------------------------------------------------------------- #
 
     # Apply the cost of carbon released by transitioning natural land to modified land
-    ghg_t_mrj = ag_ghg.get_ghg_transition_penalties(data, lumap)               # <unit: t/ha>
-    ghg_t_mrj = tools.amortise(ghg_t_mrj * data.get_carbon_price_by_yr_idx(yr_idx))
-    ghg_t_mrj_cost = np.einsum('mrj,mrj,mrj->mrj', ghg_t_mrj, x_mrj, l_mrj_not)
+    np.multiply(base_matrices['ghg_t_mrj'], data.get_carbon_price_by_yr_idx(yr_idx), out=t_smrj[2])
 
-    # -------------------------------------------------------------- #
-    # Total costs.                                                   #
-    # -------------------------------------------------------------- #
+    return t_smrj
+
+
+def get_transition_matrices(data: Data, yr_idx, base_year, separate=False, base_matrices: Optional[dict] = None):
+    """
+    Calculate the transition matrices for land-use and land management transitions.
+    Args:
+        data (Data object): The data object containing the necessary input data.
+        yr_idx (int): The index of the current year.
+        base_year (int): The base year for the transition calculations.
+        separate (bool, optional): Whether to return separate cost matrices for each cost component.
+                                   Defaults to False.
+        base_matrices (dict, optional): The output of `get_transition_base_matrices` for the land-use and land
+                                   management maps of `base_year`. Calculated if not given.
+    Returns:
+        numpy.ndarray or dict: The transition matrices for land-use and land management transitions.
+                               If `separate` is False, returns a numpy array representing the total costs.
+                               If `separate` is True, returns a dictionary with separate cost matrices for
+                               establishment costs, Water license cost, and carbon releasing costs.
+    """
+    t_smrj = get_transition_cost_components(data, yr_idx, base_year, base_matrices)
 
     if separate:
-        return {'Establishment cost': e_mrj, 'Water license cost': w_delta_mrj, 'GHG emissions cost': ghg_t_mrj_cost}
+        return dict(zip(AG_TRANSITION_COST_TYPES, t_smrj))
     else:
-        return e_mrj + w_delta_mrj + ghg_t_mrj_cost
+        return t_smrj.sum(axis=0)
 
 
 def get_asparagopsis_effect_t_mrj(data: Data):
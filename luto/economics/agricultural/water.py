@@ -24,6 +24,7 @@ import pandas as pd
 from collections import defaultdict
 from itertools import pairwise
 from typing import Optional
+from scipy import sparse
 
 
 import luto.settings as settings
@@ -33,6 +34,29 @@ from luto.economics.agricultural.quantity import get_yield_pot, lvs_veg_types
 import luto.economics.non_agricultural.water as non_ag_water
 
 
+def get_lvstk_yield_pot_for_wreq(data: Data, lm: str, yr_idx: int) -> np.ndarray:
+    """
+    Return the livestock yield potential <unit: head/ha> of all livestock land uses
+    (`data.LU_LVSTK_INDICES`), indexed (r, l).
+
+    The yield potential is evaluated once per (livestock type, vegetation, lm, year) and cached
+    in `data.WREQ_YIELD_POT`, as the water requirement matrices are requested by many of the
+    agricultural, agricultural management and non-agricultural builders within a year.
+    Only the latest year is kept for each land management to bound the memory footprint.
+    """
+    cached = data.WREQ_YIELD_POT.get(lm)
+    if cached is not None and cached[0] == yr_idx:
+        return cached[1]
+
+    yield_pot_rl = np.stack([
+        get_yield_pot(data, *lvs_veg_types(data.AGLU2DESC[j]), lm, yr_idx)
+        for j in data.LU_LVSTK_INDICES
+    ], axis=1)
+
+    data.WREQ_YIELD_POT[lm] = (yr_idx, yield_pot_rl)
+    return yield_pot_rl
+
+
 def get_wreq_matrices(data: Data, yr_idx):
     """
     Return water requirement (water use by irrigation and livestock drinking water) matrices
@@ -50,11 +74,9 @@ def get_wreq_matrices(data: Data, yr_idx):
     w_req_mrj = np.stack(( data.WREQ_DRY_RJ, data.WREQ_IRR_RJ ))    # <unit: ML/head|ha>
 
     # Covert water requirements units from ML/head to ML/ha
-    for j, lu in enumerate(data.AGRICULTURAL_LANDUSES):
-        if lu in data.LU_LVSTK:
-            lvs, veg = lvs_veg_types(lu)
-            w_req_mrj[0, :, j] = w_req_mrj[0, :, j] * get_yield_pot(data, lvs, veg, 'dry', yr_idx)  # Water reqs depend on current stocking rate for drinking water
-            w_req_mrj[1, :, j] = w_req_mrj[1, :, j] * get_yield_pot(data, lvs, veg, 'irr', 0)       # Water reqs depend on initial stocking rate for irrigation
+    lvstk_j = data.LU_LVSTK_INDICES
+    w_req_mrj[0][:, lvstk_j] *= get_lvstk_yield_pot_for_wreq(data, 'dry', yr_idx)  # Water reqs depend on current stocking rate for drinking water
+    w_req_mrj[1][:, lvstk_j] *= get_lvstk_yield_pot_for_wreq(data, 'irr', 0)       # Water reqs depend on initial stocking rate for irrigation
 
     # Convert to ML per cell via REAL_AREA
     w_req_mrj *= data.REAL_AREA[:, np.newaxis]                      # <unit: ML/ha> * <unit: ha/cell> -> <unit: ML/cell>
@@ -79,32 +101,31 @@ def get_wyield_matrices(
     Returns:
         numpy.ndarray: The w_mrj <unit: ML/cell> water yield matrices, indexed (m, r, j).
     """
+    missing_root_def = sorted(
+        set(range(data.N_AG_LUS)) - set(data.LU_SHALLOW_ROOTED) - set(data.LU_DEEP_ROOTED) - set(data.LU_NATURAL)
+    )
+    if missing_root_def:
+        j = missing_root_def[0]
+        raise ValueError(
+            f"Land use {j} ({data.AGLU2DESC[j]}) missing from all of "
+            f"data.LU_SHALLOW_ROOTED, data.LU_DEEP_ROOTED, data.LU_NATURAL "
+            f"(requires root definition)."
+        )
+
     w_yield_mrj = np.zeros((data.NLMS, data.NCELLS, data.N_AG_LUS))
 
     w_yield_dr = data.WATER_YIELD_DR_FILE[yr_idx] if water_dr_yield is None else water_dr_yield
     w_yield_sr = data.WATER_YIELD_SR_FILE[yr_idx] if water_sr_yield is None else water_sr_yield
     w_yield_nl = data.get_water_nl_yield_for_yr_idx(yr_idx, w_yield_dr, w_yield_sr)
 
-
-    for j in range(data.N_AG_LUS):
-        if j in data.LU_SHALLOW_ROOTED:
-            for m in range(data.NLMS):
-                w_yield_mrj[m, :, j] = w_yield_sr * data.REAL_AREA
-
-        elif j in data.LU_DEEP_ROOTED:
-            for m in range(data.NLMS):
-                w_yield_mrj[m, :, j] = w_yield_dr * data.REAL_AREA
-
-        elif j in data.LU_NATURAL:
-            for m in range(data.NLMS):
-                w_yield_mrj[m, :, j] = w_yield_nl * data.REAL_AREA
-
-        else:
-            raise ValueError(
-                f"Land use {j} ({data.AGLU2DESC[j]}) missing from all of "
-                f"data.LU_SHALLOW_ROOTED, data.LU_DEEP_ROOTED, data.LU_NATURAL "
-                f"(requires root definition)."
-            )
+    # Broadcast the yield of each root type to its land uses, the same for all land managements.
+    # Assigned in reverse order of precedence so shallow-rooted wins over deep-rooted over natural.
+    for lu_idx, w_yield_r in (
+        (data.LU_NATURAL, w_yield_nl),
+        (data.LU_DEEP_ROOTED, w_yield_dr),
+        (data.LU_SHALLOW_ROOTED, w_yield_sr),
+    ):
+        w_yield_mrj[:, :, lu_idx] = (w_yield_r * data.REAL_AREA)[np.newaxis, :, np.newaxis]
 
     return w_yield_mrj
 
@@ -431,8 +452,64 @@ def get_water_outside_luto_study_area_from_hist_level(data: Data) -> dict[int, f
     return water_yield_arr
 
 
-def calc_water_net_yield_for_region(
-    region_ind: np.ndarray,
+def get_water_region_definition(
+    data: Data, region_def: Optional[str] = None
+) -> tuple[dict[int, float], np.ndarray, dict[int, str]]:
+    """
+    Return the historical water net yield, the cell-wise region ID and the region names
+    for the given water region definition (defaults to `settings.WATER_REGION_DEF`).
+    """
+    region_def = settings.WATER_REGION_DEF if region_def is None else region_def
+
+    if region_def == 'River Region':
+        return data.RIVREG_LIMITS, data.RIVREG_ID, data.RIVREG_DICT
+
+    elif region_def == 'Drainage Division':
+        return data.DRAINDIV_LIMITS, data.DRAINDIV_ID, data.DRAINDIV_DICT
+
+    else:
+        raise ValueError(
+            f"Invalid value for setting WATER_REGION_DEF: '{region_def}' "
+            f"(must be either 'River Region' or 'Drainage Division')."
+        )
+
+
+def get_water_region_matrix(
+    data: Data, region_def: Optional[str] = None
+) -> tuple[list[int], sparse.csr_array]:
+    """
+    Return the region IDs and the sparse (region x cell) aggregation matrix for the given
+    water region definition (defaults to `settings.WATER_REGION_DEF`).
+
+    Row i of the matrix holds ones at the cells of region `region_ids[i]`, so `matrix @ arr_r`
+    sums any cell-indexed array (or the columns of an r-indexed 2D array) by region.
+    Rows follow the order of the region name lookup table, the same order as the keys of
+    `get_water_net_yield_limit_values`. Both region definitions are cached on `data`.
+    """
+    region_def = settings.WATER_REGION_DEF if region_def is None else region_def
+    if region_def in data.WATER_REGION_MATRICES:
+        return data.WATER_REGION_MATRICES[region_def]
+
+    _, region_id, region_names = get_water_region_definition(data, region_def)
+
+    # Map region IDs to matrix rows; cells in regions without a name (e.g. ID 0) are left out.
+    region_ids = list(region_names)
+    row_lookup = np.full(max(region_id.max(), max(region_ids)) + 1, -1, dtype=np.int64)
+    row_lookup[region_ids] = np.arange(len(region_ids))
+
+    rows = row_lookup[region_id]
+    cells = np.flatnonzero(rows >= 0)
+    matrix = sparse.csr_array(
+        (np.ones(cells.size), (rows[cells], cells)),
+        shape=(len(region_ids), data.NCELLS),
+    )
+
+    data.WATER_REGION_MATRICES[region_def] = (region_ids, matrix)
+    return data.WATER_REGION_MATRICES[region_def]
+
+
+def calc_water_net_yield_by_region(
+    region_matrix: sparse.csr_array,
     am2j: dict[str, list[int]],
     ag_dvars: np.ndarray,
     non_ag_dvars: np.ndarray,
@@ -440,22 +517,22 @@ def calc_water_net_yield_for_region(
     ag_w_mrj: np.ndarray,
     non_ag_w_rk: np.ndarray,
     ag_man_w_mrj: dict[str, np.ndarray],
-    water_yield_outside_luto_study_area: float,
-) -> float:
+    water_yield_outside_luto_study_area: np.ndarray,
+) -> np.ndarray:
     '''
-    This function calculates the net water yield for a given region. \n
+    This function calculates the net water yield for every row of `region_matrix`. \n
 
     `Water_yield` = `ag_contr` + `non_ag_contr` + `ag_mam_contr` + `water_yield_outside_luto_study_area`
     '''
     
-    ag_contr = (ag_w_mrj[:, region_ind, :] * ag_dvars[:, region_ind, :]).sum()
-    non_ag_contr = (non_ag_w_rk[region_ind, :] * non_ag_dvars[region_ind, :]).sum()
-    ag_man_contr = sum(
-        (ag_man_w_mrj[am][:, region_ind, j_idx] * ag_man_dvars[am][:, region_ind, j]).sum()
-        for am, am_j_list in am2j.items()
-        for j_idx, j in enumerate(am_j_list)
+    w_net_yield_r = (
+        np.einsum('mrj,mrj->r', ag_w_mrj, ag_dvars)
+        + np.einsum('rk,rk->r', non_ag_w_rk, non_ag_dvars)
     )
-    return ag_contr + non_ag_contr + ag_man_contr + water_yield_outside_luto_study_area
+    for am, am_j_list in am2j.items():
+        w_net_yield_r += np.einsum('mrj,mrj->r', ag_man_w_mrj[am], ag_man_dvars[am][:, :, am_j_list])
+
+    return region_matrix @ w_net_yield_r + water_yield_outside_luto_study_area
 
 
 def calc_water_net_yield_BASE_YR(data: Data) -> np.ndarray:
@@ -481,16 +558,19 @@ def calc_water_net_yield_BASE_YR(data: Data) -> np.ndarray:
     ag_w_r = np.einsum('mrj,mrj->r', w_mrj, ag_dvar_mrj)
     
     # Get water net yield for each region
-    wny_inside_LUTO_regions = np.bincount(data.RIVREG_ID, ag_w_r)
-    wny_inside_LUTO_regions = {region: wny for region, wny in enumerate(wny_inside_LUTO_regions) if region != 0}
+    region_ids, region_matrix = get_water_region_matrix(data)
+    wny_inside_LUTO_regions = dict(zip(region_ids, region_matrix @ ag_w_r))
     
     # Get water yield from outside the LUTO study area
     wny_outside_LUTO_regions = get_water_outside_luto_study_area_from_hist_level(data)
     
-    return {
+    # Save the results in data to avoid recalculating
+    data.WATER_YIELD_RR_BASE_YR = {
         region: wny_inside_LUTO_regions[region]  + wny_outside_LUTO_regions[region] 
         for region in wny_outside_LUTO_regions
     } 
+    
+    return data.WATER_YIELD_RR_BASE_YR
 
 
 
@@ -520,21 +600,16 @@ def get_water_net_yield_limit_values(
         return data.WATER_YIELD_LIMITS
     
     # Get historical yields of regions, stored in data.RIVREG_LIMITS and data.DRAINDIV_LIMITS
-    if settings.WATER_REGION_DEF == 'River Region':
-        wny_region_hist = data.RIVREG_LIMITS
-        region_id = data.RIVREG_ID
-        region_names = data.RIVREG_DICT
-
-    elif settings.WATER_REGION_DEF == 'Drainage Division':
-        wny_region_hist = data.DRAINDIV_LIMITS
-        region_id = data.DRAINDIV_ID
-        region_names = data.DRAINDIV_DICT
+    wny_region_hist, _, region_names = get_water_region_definition(data)
+    region_ids, region_matrix = get_water_region_matrix(data)
 
-    # Calculate the water yield limits for each region
+    # Calculate the water yield limits for each region; the cells of a region are the
+    # column indices of its row in the (sorted) CSR region matrix
     limits_by_region = {}
-    for region, name in region_names.items():
+    for row, region in enumerate(region_ids):
+        name = region_names[region]
         hist_yield = wny_region_hist[region]
-        ind = np.flatnonzero(region_id == region).astype(np.int32)
+        ind = region_matrix.indices[region_matrix.indptr[row]:region_matrix.indptr[row + 1]].astype(np.int32)
         # Water yield limit calculated as a proportial of historical level based on planetary boundary theory
         limit_hist_level = hist_yield * (1 - settings.WATER_STRESS * settings.AG_SHARE_OF_WATER_USE)   
         limits_by_region[region] = (name, limit_hist_level, ind)    
@@ -148,7 +148,7 @@ def get_biodiv_beccs(data: Data):
     return data.BIODIV_SCORE_RAW_WEIGHTED * data.REAL_AREA * BECCS_BIODIVERSITY_BENEFIT
 
 
-def get_breq_matrix(data: Data, ag_b_mrj: np.ndarray, lumap: np.ndarray):
+def get_breq_matrix(data: Data, ag_b_mrj: np.ndarray, lumap: np.ndarray, agroforestry_x_r: np.ndarray|None = None, cp_belt_x_r: np.ndarray|None = None):
     """
     Returns non-agricultural c_rk matrix of costs per cell and land use.
 
@@ -158,8 +158,10 @@ def get_breq_matrix(data: Data, ag_b_mrj: np.ndarray, lumap: np.ndarray):
     Returns:
     - numpy.ndarray: The non-agricultural c_rk matrix of costs per cell and land use.
     """
-    agroforestry_x_r = tools.get_exclusions_agroforestry_base(data, lumap)
-    cp_belt_x_r = tools.get_exclusions_carbon_plantings_belt_base(data, lumap)
+    if agroforestry_x_r is None:
+        agroforestry_x_r = tools.get_exclusions_agroforestry_base(data, lumap)
+    if cp_belt_x_r is None:
+        cp_belt_x_r = tools.get_exclusions_carbon_plantings_belt_base(data, lumap)
 
     env_plantings_biodiv = get_biodiv_environmental_plantings(data)
     rip_plantings_biodiv = get_biodiv_riparian_plantings(data)
@@ -227,7 +227,7 @@ def get_cost_beccs(data: Data, yr_cal: int) -> np.ndarray:
     return np.nan_to_num(data.BECCS_COSTS_AUD_HA_YR) * data.BECCS_COST_MULTS[yr_cal] * data.REAL_AREA
 
 
-def get_cost_matrix(data: Data, ag_c_mrj: np.ndarray, lumap, yr_cal):
+def get_cost_matrix(data: Data, ag_c_mrj: np.ndarray, lumap, yr_cal, agroforestry_x_r: np.ndarray|None = None, cp_belt_x_r: np.ndarray|None = None):
     """
     Returns non-agricultural c_rk matrix of costs per cell and land use.
 
@@ -237,8 +237,10 @@ def get_cost_matrix(data: Data, ag_c_mrj: np.ndarray, lumap, yr_cal):
     Returns:
     - cost_matrix: A 2D numpy array of costs per cell and land use.
     """
-    agroforestry_x_r = tools.get_exclusions_agroforestry_base(data, lumap)
-    cp_belt_x_r = tools.get_exclusions_carbon_plantings_belt_base(data, lumap)
+    if agroforestry_x_r is None:
+        agroforestry_x_r = tools.get_exclusions_agroforestry_base(data, lumap)
+    if cp_belt_x_r is None:
+        cp_belt_x_r = tools.get_exclusions_carbon_plantings_belt_base(data, lumap)
 
     non_agr_c_matrices = {use: np.zeros((data.NCELLS, 1)) for use in NON_AG_LAND_USES}
 
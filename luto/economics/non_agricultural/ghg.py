@@ -289,7 +289,7 @@ def get_ghg_beccs(data, aggregate) -> np.ndarray|pd.DataFrame:
         raise KeyError(f"Aggregate '{aggregate} can be only specified as [True,False]" )
 
 
-def get_ghg_matrix(data: Data, ag_g_mrj, lumap, aggregate=True) -> np.ndarray:
+def get_ghg_matrix(data: Data, ag_g_mrj, lumap, aggregate=True, agroforestry_x_r: np.ndarray|None = None, cp_belt_x_r: np.ndarray|None = None) -> np.ndarray:
     """
     Get the g_rk matrix containing non-agricultural greenhouse gas emissions.
 
@@ -308,8 +308,10 @@ def get_ghg_matrix(data: Data, ag_g_mrj, lumap, aggregate=True) -> np.ndarray:
     - The function internally calls several other functions to calculate different components of the g_rk matrix.
     """
 
-    agroforestry_x_r = tools.get_exclusions_agroforestry_base(data, lumap)
-    cp_belt_x_r = tools.get_exclusions_carbon_plantings_belt_base(data, lumap)
+    if agroforestry_x_r is None:
+        agroforestry_x_r = tools.get_exclusions_agroforestry_base(data, lumap)
+    if cp_belt_x_r is None:
+        cp_belt_x_r = tools.get_exclusions_carbon_plantings_belt_base(data, lumap)
 
     non_agr_ghg_matrices = {use: np.zeros((data.NCELLS, 1)) for use in NON_AG_LAND_USES}
 
@@ -0,0 +1,68 @@
+from typing import Optional
+import numpy as np
+
+from luto.data import Data
+from luto import tools
+
+import luto.economics.non_agricultural.biodiversity as non_ag_biodiversity
+import luto.economics.non_agricultural.cost as non_ag_cost
+import luto.economics.non_agricultural.ghg as non_ag_ghg
+import luto.economics.non_agricultural.quantity as non_ag_quantity
+import luto.economics.non_agricultural.revenue as non_ag_revenue
+import luto.economics.non_agricultural.water as non_ag_water
+
+
+def get_non_ag_matrices(
+    data: Data,
+    yr_idx: int,
+    lumap: np.ndarray,
+    ag_matrices: dict[str, np.ndarray],
+    water_dr_yield: Optional[np.ndarray] = None,
+    water_sr_yield: Optional[np.ndarray] = None,
+) -> dict[str, np.ndarray]:
+    """
+    Get the non-agricultural matrices of year index `yr_idx` and land-use map `lumap` in one pass.
+
+    The agroforestry and carbon plantings (belt) exclusions of `lumap` are calculated once and shared
+    by all the builders, instead of being recalculated by each of them.
+
+    Parameters
+    ----------
+    data: Data object.
+    yr_idx: Number of years post base-year ('YR_CAL_BASE').
+    lumap: The land-use map the non-agricultural land uses would replace.
+    ag_matrices: The agricultural matrices the non-agricultural matrices are derived from, by name
+        ('ag_c_mrj', 'ag_r_mrj', 'ag_g_mrj', 'ag_w_mrj', 'ag_b_mrj' and 'ag_q_mrp').
+    water_dr_yield, water_sr_yield: Optional deep- and shallow-rooted water yields to use instead of
+        those of `yr_idx` for the water net yield matrix.
+
+    Returns
+    -------
+    dict
+        The non-agricultural matrices by name ('non_ag_c_rk', 'non_ag_r_rk', 'non_ag_g_rk', 'non_ag_w_rk',
+        'non_ag_b_rk' and 'non_ag_q_crk'). Only the matrices whose agricultural matrix is given in
+        `ag_matrices` are built.
+    """
+    yr_cal = data.YR_CAL_BASE + yr_idx
+    exclusions = {
+        'agroforestry_x_r': tools.get_exclusions_agroforestry_base(data, lumap),
+        'cp_belt_x_r': tools.get_exclusions_carbon_plantings_belt_base(data, lumap),
+    }
+
+    # Map of non-agricultural matrix to (agricultural matrix it is derived from, builder)
+    builders = {
+        'non_ag_c_rk': ('ag_c_mrj', lambda ag_c_mrj: non_ag_cost.get_cost_matrix(data, ag_c_mrj, lumap, yr_cal, **exclusions)),
+        'non_ag_r_rk': ('ag_r_mrj', lambda ag_r_mrj: non_ag_revenue.get_rev_matrix(data, yr_cal, ag_r_mrj, lumap, **exclusions)),
+        'non_ag_g_rk': ('ag_g_mrj', lambda ag_g_mrj: non_ag_ghg.get_ghg_matrix(data, ag_g_mrj, lumap, **exclusions)),
+        'non_ag_w_rk': ('ag_w_mrj', lambda ag_w_mrj: non_ag_water.get_w_net_yield_matrix(
+            data, ag_w_mrj, lumap, yr_idx, water_dr_yield, water_sr_yield, **exclusions
+        )),
+        'non_ag_b_rk': ('ag_b_mrj', lambda ag_b_mrj: non_ag_biodiversity.get_breq_matrix(data, ag_b_mrj, lumap, **exclusions)),
+        'non_ag_q_crk': ('ag_q_mrp', lambda ag_q_mrp: non_ag_quantity.get_quantity_matrix(data, ag_q_mrp, lumap, **exclusions)),
+    }
+
+    return {
+        name: build(ag_matrices[ag_name])
+        for name, (ag_name, build) in builders.items()
+        if ag_name in ag_matrices
+    }
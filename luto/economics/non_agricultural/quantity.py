@@ -330,7 +330,7 @@ def get_quantity_beccs(data) -> np.ndarray:
     return np.zeros((data.NCMS, data.NCELLS))
 
 
-def get_quantity_matrix(data, ag_q_mrp: np.ndarray, lumap: np.ndarray) -> np.ndarray:
+def get_quantity_matrix(data, ag_q_mrp: np.ndarray, lumap: np.ndarray, agroforestry_x_r: np.ndarray|None = None, cp_belt_x_r: np.ndarray|None = None) -> np.ndarray:
     """
     Get the non-agricultural quantity matrix q_crk.
     Values represent the yield of each commodity c from the cell r when using
@@ -342,8 +342,10 @@ def get_quantity_matrix(data, ag_q_mrp: np.ndarray, lumap: np.ndarray) -> np.nda
     Returns:
     - np.ndarray: The non-agricultural quantity matrix q_crk.
     """
-    agroforestry_x_r = tools.get_exclusions_agroforestry_base(data, lumap)
-    cp_belt_x_r = tools.get_exclusions_carbon_plantings_belt_base(data, lumap)
+    if agroforestry_x_r is None:
+        agroforestry_x_r = tools.get_exclusions_agroforestry_base(data, lumap)
+    if cp_belt_x_r is None:
+        cp_belt_x_r = tools.get_exclusions_carbon_plantings_belt_base(data, lumap)
 
     env_plantings_quantity_matrix = get_quantity_env_plantings(data)
     rip_plantings_quantity_matrix = get_quantity_rip_plantings(data)
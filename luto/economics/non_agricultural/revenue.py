@@ -216,7 +216,7 @@ def get_rev_beccs(data: Data, yr_cal: int) -> np.ndarray:
     return base_rev + np.nan_to_num(data.BECCS_TCO2E_HA_YR) * data.REAL_AREA * data.get_carbon_price_by_year(yr_cal)
 
 
-def get_rev_matrix(data: Data, yr_cal: int, ag_r_mrj, lumap) -> np.ndarray:
+def get_rev_matrix(data: Data, yr_cal: int, ag_r_mrj, lumap, agroforestry_x_r: np.ndarray|None = None, cp_belt_x_r: np.ndarray|None = None) -> np.ndarray:
     """
     Gets the matrix containing the revenue produced by each non-agricultural land use for each cell.
 
@@ -226,8 +226,10 @@ def get_rev_matrix(data: Data, yr_cal: int, ag_r_mrj, lumap) -> np.ndarray:
     Returns:
         np.ndarray.
     """
-    agroforestry_x_r = tools.get_exclusions_agroforestry_base(data, lumap)
-    cp_belt_x_r = tools.get_exclusions_carbon_plantings_belt_base(data, lumap)
+    if agroforestry_x_r is None:
+        agroforestry_x_r = tools.get_exclusions_agroforestry_base(data, lumap)
+    if cp_belt_x_r is None:
+        cp_belt_x_r = tools.get_exclusions_carbon_plantings_belt_base(data, lumap)
 
     non_agr_rev_matrices = {use: np.zeros((data.NCELLS, 1)) for use in NON_AG_LAND_USES}
 
@@ -563,28 +563,28 @@ def get_sheep_to_ag_base(data: Data, yr_idx: int, lumap, separate=False) -> np.n
     e_rj_dry = np.einsum('rj,r->rj', e_rj, all_sheep_lumap == 0)
     e_rj_irr = np.einsum('rj,r->rj', e_rj, all_dry_lmmap == 1)
     e_mrj = np.stack([e_rj_dry, e_rj_irr], axis=0)
-    e_mrj = np.einsum('mrj,mrj,mrj->mrj', e_mrj, x_mrj, l_mrj_not)
+    # Cost components share one (s, m, r, j) buffer, ordered as `ag_transitions.AG_TRANSITION_COST_TYPES`
+    t_smrj = np.zeros((len(ag_transitions.AG_TRANSITION_COST_TYPES), data.NLMS, data.NCELLS, data.N_AG_LUS))
+    np.einsum('mrj,mrj,mrj->mrj', e_mrj, x_mrj, l_mrj_not, out=t_smrj[0])
 
     # Water license cost
     w_mrj = ag_water.get_wreq_matrices(data, yr_idx)
     w_delta_mrj = tools.get_water_delta_matrix(w_mrj, l_mrj, data, yr_idx)
-    w_delta_mrj = np.einsum('mrj,mrj,mrj->mrj', w_delta_mrj, x_mrj, l_mrj_not)
+    np.einsum('mrj,mrj,mrj->mrj', w_delta_mrj, x_mrj, l_mrj_not, out=t_smrj[1])
 
     # Carbon costs
     ghg_t_mrj = ag_ghg.get_ghg_transition_penalties(data, all_sheep_lumap)               # <unit: t/ha>      
     ghg_t_mrj_cost = tools.amortise(ghg_t_mrj * data.get_carbon_price_by_yr_idx(yr_idx))     
-    ghg_t_mrj_cost = np.einsum('mrj,mrj,mrj->mrj', ghg_t_mrj_cost, x_mrj, l_mrj_not)
+    np.einsum('mrj,mrj,mrj->mrj', ghg_t_mrj_cost, x_mrj, l_mrj_not, out=t_smrj[2])
 
     # Ensure transition costs are zero for all agricultural cells 
-    e_mrj[:, ag_cells, :] = np.zeros((data.NLMS, ag_cells.shape[0], data.N_AG_LUS))
-    w_delta_mrj[:, ag_cells, :] = np.zeros((data.NLMS, ag_cells.shape[0], data.N_AG_LUS))
-    ghg_t_mrj_cost[:, ag_cells, :] = np.zeros((data.NLMS, ag_cells.shape[0], data.N_AG_LUS))
+    t_smrj[:, :, ag_cells, :] = 0
 
     if separate:
-        return {'Establishment cost': e_mrj, 'Water license cost': w_delta_mrj, 'GHG emissions cost': ghg_t_mrj_cost}
+        return dict(zip(ag_transitions.AG_TRANSITION_COST_TYPES, t_smrj))
     
     else:
-        return e_mrj + w_delta_mrj + ghg_t_mrj_cost
+        return t_smrj.sum(axis=0)
 
 
 def get_beef_to_ag_base(data: Data, yr_idx, lumap, separate) -> np.ndarray|dict:
@@ -619,31 +619,31 @@ def get_beef_to_ag_base(data: Data, yr_idx, lumap, separate) -> np.ndarray|dict:
 
     e_rj = tools.amortise(e_rj) * data.REAL_AREA[:, np.newaxis]
     e_mrj = np.stack([e_rj] * 2, axis=0)
-    e_mrj = np.einsum('mrj,mrj,mrj->mrj', e_mrj, x_mrj, l_mrj_not)
+    # Cost components share one (s, m, r, j) buffer, ordered as `ag_transitions.AG_TRANSITION_COST_TYPES`
+    t_smrj = np.zeros((len(ag_transitions.AG_TRANSITION_COST_TYPES), data.NLMS, data.NCELLS, data.N_AG_LUS))
+    np.einsum('mrj,mrj,mrj->mrj', e_mrj, x_mrj, l_mrj_not, out=t_smrj[0])
 
     # Water license cost
     w_mrj = ag_water.get_wreq_matrices(data, yr_idx)
     w_delta_mrj = tools.get_water_delta_matrix(w_mrj, l_mrj, data, yr_idx)
-    w_delta_mrj = np.einsum('mrj,mrj,mrj->mrj', w_delta_mrj, x_mrj, l_mrj_not)
+    np.einsum('mrj,mrj,mrj->mrj', w_delta_mrj, x_mrj, l_mrj_not, out=t_smrj[1])
 
     # Carbon costs
     ghg_t_mrj = ag_ghg.get_ghg_transition_penalties(data, all_beef_lumap)               # <unit: t/ha>      
     ghg_t_mrj_cost = tools.amortise(ghg_t_mrj * data.get_carbon_price_by_yr_idx(yr_idx))     
-    ghg_t_mrj_cost = np.einsum('mrj,mrj,mrj->mrj', ghg_t_mrj_cost, x_mrj, l_mrj_not)
+    np.einsum('mrj,mrj,mrj->mrj', ghg_t_mrj_cost, x_mrj, l_mrj_not, out=t_smrj[2])
 
     beef_af_cells = tools.get_beef_agroforestry_cells(lumap)
-    non_beef_af_cells = np.array([r for r in range(data.NCELLS) if r not in beef_af_cells])
+    non_beef_af_cells = np.setdiff1d(np.arange(data.NCELLS), beef_af_cells)
 
     # Ensure transition costs are zero for all agricultural cells 
-    e_mrj[:, ag_cells, :] = np.zeros((data.NLMS, ag_cells.shape[0], data.N_AG_LUS))
-    w_delta_mrj[:, ag_cells, :] = np.zeros((data.NLMS, ag_cells.shape[0], data.N_AG_LUS))
-    ghg_t_mrj_cost[:, ag_cells, :] = np.zeros((data.NLMS, ag_cells.shape[0], data.N_AG_LUS))
+    t_smrj[:, :, ag_cells, :] = 0
 
     if separate:
-        return {'Establishment cost': e_mrj, 'Water license cost': w_delta_mrj, 'GHG emissions cost': ghg_t_mrj_cost}
+        return dict(zip(ag_transitions.AG_TRANSITION_COST_TYPES, t_smrj))
     
     else:
-        t_mrj = e_mrj + w_delta_mrj + ghg_t_mrj_cost
+        t_mrj = t_smrj.sum(axis=0)
         # Set all costs for non-beef-agroforestry cells to zero
         t_mrj[:, non_beef_af_cells, :] = 0
         return t_mrj
@@ -665,36 +665,22 @@ def get_sheep_agroforestry_to_ag(
     sheep_tcosts = get_sheep_to_ag_base(data, yr_idx, lumap, separate)
     agroforestry_tcosts = get_agroforestry_to_ag_base(data, yr_idx, lumap, lmmap, separate)
 
+    # Broadcast the cell proportions over the (m, r, j) cost matrices
+    agroforestry_x_r_mrj = agroforestry_x_r[np.newaxis, :, np.newaxis]
+
     if separate:
         # Combine and return separated costs
-        combined_costs = {}
-        for key, array in agroforestry_tcosts.items():
-            combined_costs[key] = np.zeros(array.shape)
-            for m in range(data.NLMS):
-                for j in range(data.N_AG_LUS):
-                    combined_costs[key][m, :, j] = array[m, :, j] * agroforestry_x_r
+        combined_costs = {key: array * agroforestry_x_r_mrj for key, array in agroforestry_tcosts.items()}
 
         for key, array in sheep_tcosts.items():
             if key not in combined_costs:
                 combined_costs[key] = np.zeros(array.shape)
-            for m in range(data.NLMS):
-                for j in range(data.N_AG_LUS):
-                    combined_costs[key][m, :, j] += array[m, :, j] * (1 - agroforestry_x_r)
+            combined_costs[key] += array * (1 - agroforestry_x_r_mrj)
 
         return combined_costs
     
     else:
-        sheep_contr = np.zeros((data.NLMS, data.NCELLS, data.N_AG_LUS))
-        for m in range(data.NLMS):
-            for j in range(data.N_AG_LUS):
-                sheep_contr[m, :, j] = (1 - agroforestry_x_r) * sheep_tcosts[m, :, j]
-
-        agroforestry_contr = np.zeros((data.NLMS, data.NCELLS, data.N_AG_LUS))
-        for m in range(data.NLMS):
-            for j in range(data.N_AG_LUS):
-                agroforestry_contr[m, :, j] = agroforestry_x_r * agroforestry_tcosts[m, :, j]
-
-        return sheep_contr + agroforestry_contr
+        return (1 - agroforestry_x_r_mrj) * sheep_tcosts + agroforestry_x_r_mrj * agroforestry_tcosts
 
 
 def get_beef_agroforestry_to_ag(
@@ -713,36 +699,22 @@ def get_beef_agroforestry_to_ag(
     beef_tcosts = get_beef_to_ag_base(data, yr_idx, lumap, separate)
     agroforestry_tcosts = get_agroforestry_to_ag_base(data, yr_idx, lumap, lmmap, separate)
 
+    # Broadcast the cell proportions over the (m, r, j) cost matrices
+    agroforestry_x_r_mrj = agroforestry_x_r[np.newaxis, :, np.newaxis]
+
     if separate:
         # Combine and return separated costs
-        combined_costs = {}
-        for key, array in agroforestry_tcosts.items():
-            combined_costs[key] = np.zeros(array.shape)
-            for m in range(data.NLMS):
-                for j in range(data.N_AG_LUS):
-                    combined_costs[key][m, :, j] = array[m, :, j] * agroforestry_x_r
+        combined_costs = {key: array * agroforestry_x_r_mrj for key, array in agroforestry_tcosts.items()}
 
         for key, array in beef_tcosts.items():
             if key not in combined_costs:
                 combined_costs[key] = np.zeros(array.shape)
-            for m in range(data.NLMS):
-                for j in range(data.N_AG_LUS):
-                    combined_costs[key][m, :, j] += array[m, :, j] * (1 - agroforestry_x_r)
+            combined_costs[key] += array * (1 - agroforestry_x_r_mrj)
 
         return combined_costs
     
     else:
-        beef_contr = np.zeros((data.NLMS, data.NCELLS, data.N_AG_LUS))
-        for m in range(data.NLMS):
-            for j in range(data.N_AG_LUS):
-                beef_contr[m, :, j] = (1 - agroforestry_x_r) * beef_tcosts[m, :, j]
-
-        agroforestry_contr = np.zeros((data.NLMS, data.NCELLS, data.N_AG_LUS))
-        for m in range(data.NLMS):
-            for j in range(data.N_AG_LUS):
-                agroforestry_contr[m, :, j] = agroforestry_x_r * agroforestry_tcosts[m, :, j]
-
-        return beef_contr + agroforestry_contr
+        return (1 - agroforestry_x_r_mrj) * beef_tcosts + agroforestry_x_r_mrj * agroforestry_tcosts
 
 
 def get_carbon_plantings_block_to_ag(data: Data, yr_idx, lumap, lmmap, separate=False):
@@ -789,36 +761,22 @@ def get_sheep_carbon_plantings_belt_to_ag(
     sheep_tcosts = get_sheep_to_ag_base(data, yr_idx, lumap, separate)
     cp_belt_tcosts = get_carbon_plantings_belt_to_ag_base(data, yr_idx, lumap, lmmap, separate)
 
+    # Broadcast the cell proportions over the (m, r, j) cost matrices
+    cp_belt_x_r_mrj = cp_belt_x_r[np.newaxis, :, np.newaxis]
+
     if separate:
         # Combine and return separated costs
-        combined_costs = {}
-        for key, array in cp_belt_tcosts.items():
-            combined_costs[key] = np.zeros(array.shape)
-            for m in range(data.NLMS):
-                for j in range(data.N_AG_LUS):
-                    combined_costs[key][m, :, j] = array[m, :, j] * cp_belt_x_r
+        combined_costs = {key: array * cp_belt_x_r_mrj for key, array in cp_belt_tcosts.items()}
 
         for key, array in sheep_tcosts.items():
             if key not in combined_costs:
                 combined_costs[key] = np.zeros(array.shape)
-            for m in range(data.NLMS):
-                for j in range(data.N_AG_LUS):
-                    combined_costs[key][m, :, j] += array[m, :, j] * (1 - cp_belt_x_r)
+            combined_costs[key] += array * (1 - cp_belt_x_r_mrj)
 
         return combined_costs
     
     else:
-        sheep_contr = np.zeros((data.NLMS, data.NCELLS, data.N_AG_LUS))
-        for m in range(data.NLMS):
-            for j in range(data.N_AG_LUS):
-                sheep_contr[m, :, j] = (1 - cp_belt_x_r) * sheep_tcosts[m, :, j]
-
-        cp_belt_contr = np.zeros((data.NLMS, data.NCELLS, data.N_AG_LUS))
-        for m in range(data.NLMS):
-            for j in range(data.N_AG_LUS):
-                cp_belt_contr[m, :, j] = cp_belt_x_r * cp_belt_tcosts[m, :, j]
-
-        return sheep_contr + cp_belt_contr
+        return (1 - cp_belt_x_r_mrj) * sheep_tcosts + cp_belt_x_r_mrj * cp_belt_tcosts
     
 
 def get_beef_carbon_plantings_belt_to_ag(
@@ -837,36 +795,22 @@ def get_beef_carbon_plantings_belt_to_ag(
     beef_tcosts = get_beef_to_ag_base(data, yr_idx, lumap, separate)
     cp_belt_tcosts = get_carbon_plantings_belt_to_ag_base(data, yr_idx, lumap, lmmap, separate)
 
+    # Broadcast the cell proportions over the (m, r, j) cost matrices
+    cp_belt_x_r_mrj = cp_belt_x_r[np.newaxis, :, np.newaxis]
+
     if separate:
         # Combine and return separated costs
-        combined_costs = {}
-        for key, array in cp_belt_tcosts.items():
-            combined_costs[key] = np.zeros(array.shape)
-            for m in range(data.NLMS):
-                for j in range(data.N_AG_LUS):
-                    combined_costs[key][m, :, j] = array[m, :, j] * cp_belt_x_r
+        combined_costs = {key: array * cp_belt_x_r_mrj for key, array in cp_belt_tcosts.items()}
 
         for key, array in beef_tcosts.items():
             if key not in combined_costs:
                 combined_costs[key] = np.zeros(array.shape)
-            for m in range(data.NLMS):
-                for j in range(data.N_AG_LUS):
-                    combined_costs[key][m, :, j] += array[m, :, j] * (1 - cp_belt_x_r)
+            combined_costs[key] += array * (1 - cp_belt_x_r_mrj)
 
         return combined_costs
     
     else:
-        beef_contr = np.zeros((data.NLMS, data.NCELLS, data.N_AG_LUS))
-        for m in range(data.NLMS):
-            for j in range(data.N_AG_LUS):
-                beef_contr[m, :, j] = (1 - cp_belt_x_r) * beef_tcosts[m, :, j]
-
-        cp_belt_contr = np.zeros((data.NLMS, data.NCELLS, data.N_AG_LUS))
-        for m in range(data.NLMS):
-            for j in range(data.N_AG_LUS):
-                cp_belt_contr[m, :, j] = cp_belt_x_r * cp_belt_tcosts[m, :, j]
-
-        return beef_contr + cp_belt_contr
+        return (1 - cp_belt_x_r_mrj) * beef_tcosts + cp_belt_x_r_mrj * cp_belt_tcosts
 
 
 def get_beccs_to_ag(data: Data, yr_idx, lumap, lmmap, separate=False) -> np.ndarray|dict:
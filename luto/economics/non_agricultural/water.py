@@ -256,7 +256,9 @@ def get_w_net_yield_matrix(
     lumap: np.ndarray,
     yr_idx: int,
     water_dr_yield: Optional[np.ndarray] = None,
-    water_sr_yield: Optional[np.ndarray] = None
+    water_sr_yield: Optional[np.ndarray] = None,
+    agroforestry_x_r: Optional[np.ndarray] = None,
+    cp_belt_x_r: Optional[np.ndarray] = None,
 ) -> np.ndarray:
     """
     Get the water requirements matrix for all non-agricultural land uses.
@@ -272,8 +274,14 @@ def get_w_net_yield_matrix(
         The water requirements matrix for all non-agricultural land uses.
         Indexed by (r, k) where r is the cell index and k is the non-agricultural land usage index.
     """
-    agroforestry_x_r = tools.get_exclusions_agroforestry_base(data, lumap)
-    cp_belt_x_r = tools.get_exclusions_carbon_plantings_belt_base(data, lumap)
+    if agroforestry_x_r is None:
+        agroforestry_x_r = tools.get_exclusions_agroforestry_base(data, lumap)
+    if cp_belt_x_r is None:
+        cp_belt_x_r = tools.get_exclusions_carbon_plantings_belt_base(data, lumap)
+
+    # Look up the water yields of `yr_idx` once for all non-agricultural land uses
+    water_dr_yield = data.WATER_YIELD_DR_FILE[yr_idx] if water_dr_yield is None else water_dr_yield
+    water_sr_yield = data.WATER_YIELD_SR_FILE[yr_idx] if water_sr_yield is None else water_sr_yield
 
     non_agr_wreq_matrices = {use: np.zeros((data.NCELLS, 1)) for use in NON_AG_LAND_USES}
 
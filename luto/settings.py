@@ -109,6 +109,12 @@ RESFACTOR = 20        # set to 1 to run at full spatial resolution, > 1 to run a
 # MODE = 'snapshot'   # Runs for target year only
 MODE = 'timeseries'   # Runs each year from base year to target year
 
+# Number of worker processes solving the target years concurrently when a snapshot run is given a list of target years.
+# The workers are forked from the main process, so they share its Data object, and THREADS is split between them; each
+# worker builds its own model, so memory use grows with the number of workers, and writes its Gurobi log to
+# gurobi_<process id>.log in the output folder. Without fork (e.g. on Windows) the target years are solved one after another.
+SNAPSHOT_WORKERS = 3
+
 # Define the objective function
 OBJECTIVE = 'maxprofit'   # maximise profit (revenue - costs)  **** Requires soft demand constraints otherwise agriculture over-produces
 # OBJECTIVE = 'mincost'  # minimise cost (transitions costs + annual production costs)
@@ -117,6 +123,16 @@ OBJECTIVE = 'maxprofit'   # maximise profit (revenue - costs)  **** Requires sof
 # DEMAND_CONSTRAINT_TYPE = 'hard'  # Adds demand as a constraint in the solver (linear programming approach)
 DEMAND_CONSTRAINT_TYPE = 'soft'  # Adds demand as a type of slack variable in the solver (goal programming approach)
 
+# Number of threads used to calculate the solver input matrices concurrently (1 calculates them one after another)
+INPUT_DATA_THREADS = 10
+
+# Number of upcoming target years for which the solver inputs that only depend on the target year (agricultural cost, 
+# revenue, quantity and GHG matrices) are precomputed in the background while the solver runs in timeseries mode (0 to turn off).
+# Each precomputed year holds several (m, r, j) matrices in memory until it is solved (several GB at RESFACTOR 1), and
+# the PRECOMPUTE_THREADS threads computing them compete with the solver's THREADS.
+PRECOMPUTE_YEARS_AHEAD = 0
+PRECOMPUTE_THREADS = 2
+
 
 # ---------------------------------------------------------------------------- #
 # Geographical raster writing parameters
@@ -127,10 +143,18 @@ WRITE_FULL_RES_MAPS = False     # Write GeoTiffs at full or resfactored resoluti
 PARALLEL_WRITE = True           # If to use parallel processing to write GeoTiffs: True or False
 WRITE_THREADS = 10              # The Threads to use for map making, only work with PARALLEL_WRITE = True
 
+# In timeseries mode, write the outputs of each year in a background thread as soon as the year is solved, while the
+# next years are prepared and solved (False: all years are written after the run). The reports are still made at the end.
+WRITE_DURING_RUN = False
+
 # ---------------------------------------------------------------------------- #
 # Gurobi parameters
 # ---------------------------------------------------------------------------- #
 
+# LP solver: 'gurobi', or 'highs' to solve with the open-source HiGHS solver (via highspy), which needs no licence.
+# The Gurobi parameters below are mapped onto their HiGHS equivalents where there is one.
+SOLVER = 'gurobi'
+
 # Select Gurobi algorithm used to solve continuous models or the initial root relaxation of a MIP model. Default is automatic.
 SOLVE_METHOD = 2  # 'automatic: -1, primal simplex: 0, dual simplex: 0, barrier: 2, concurrent: 3, deterministic concurrent: 4, deterministic concurrent simplex: 5
 
@@ -154,9 +178,70 @@ SCALE_FLAG = -1     # Scales the rows and columns of the model to improve the nu
 NUMERIC_FOCUS = 0   # Controls the degree to which the code attempts to detect and manage numerical issues. Default (0) makes an automatic choice, with a slight preference for speed. Settings 1-3 increasingly shift the focus towards being more careful in numerical computations. NUMERIC_FOCUS = 1 is ok, but 2 increases solve time by ~4x
 BARHOMOGENOUS = 1  # Useful for recognizing infeasibility or unboundedness. At the default setting (-1), it is only used when barrier solves a node relaxation for a MIP model. 0 = off, 1 = on. It is a bit slower than the default algorithm (3x slower in testing).
 
+# Scale the LP before it is handed to the solver, exactly (by powers of two): every constraint row and the objective to a
+# largest coefficient near one, and the demand and GHG deviations to units of the demand and the GHG target. Solutions,
+# dual prices and reduced costs are unscaled after the solve. The tolerances above then apply to the scaled model, i.e.
+# relative to the largest coefficient of each row and of the objective, and need tightening: tolerances of 1e-6 with
+# scaling give solutions about as accurate as 1e-2 without, in fewer barrier iterations.
+LP_SCALING = False
+
 # Number of threads to use in parallel algorithms (e.g., barrier)
 THREADS = 50
 
+# Give the decision variables descriptive names (e.g. 'X_ag_dry_3_1024') in the Gurobi model. Useful when inspecting
+# a written-out model, but naming millions of variables slows down model construction considerably.
+NAME_DECISION_VARIABLES = False
+
+# Write each year's model to OUTPUT_DIR/solver_models before it is solved: an MPS file, the (m, r, j) / (r, k) index
+# of its variables and the objective of the solve, so that it can be re-solved offline with luto/tools/solver_replay.py.
+WRITE_SOLVER_MODELS = False
+
+# Solve each year by Dantzig-Wolfe decomposition over this many blocks of cells instead of as one LP (0 or 1: off).
+# With WATER_LIMITS on the blocks are made of whole water regions, so the water constraints stay within a block. The
+# blocks are solved in parallel worker processes, priced by the duals of the coupling constraints (demand, GHG
+# emissions, biodiversity and adoption limits) in a master LP, with SOLVER as the LP solver.
+DECOMPOSITION_BLOCKS = 0
+DECOMPOSITION_WORKERS = 8               # Number of worker processes solving the blocks
+DECOMPOSITION_MAX_ITERATIONS = 200      # Every iteration keeps a solution of each improving block, so memory grows with iterations
+DECOMPOSITION_GAP_TOLERANCE = 1e-6      # Relative gap between the master objective and the Lagrangian bound to stop at
+
+# Solve each year at this coarser resfactor first (0: off), and use the coarse solution to start the solve at RESFACTOR and
+# to prune its land-use options: each cell keeps the options that are active, or near active, in the coarse cell covering
+# it. Pruned options whose reduced cost shows they would improve the solution are added back and the year is solved again,
+# so the solution is still optimal at RESFACTOR. Loads a second Data object at the coarse resfactor.
+COARSE_TO_FINE_RESFACTOR = 0
+COARSE_TO_FINE_ACTIVE_THRESHOLD = 0.01  # Options using at least this share of the coarse cell are active
+COARSE_TO_FINE_RC_MARGIN = 0.05         # Options whose coarse reduced cost is within this share of their economic contribution are near active
+
+# In a timeseries run, prune the variables that were unused in the previous year and whose reduced cost then showed them
+# to be far from worth using: by more than REDUCED_COST_PRUNING_SAFETY times the change of their coefficients since,
+# weighted by the previous year's dual prices. As with COARSE_TO_FINE_RESFACTOR, pruned variables that price out after
+# the solve are added back and the year is solved again, so the solution is still optimal. Cannot be combined with
+# DECOMPOSITION_BLOCKS, as the decomposition does not give reduced costs.
+REDUCED_COST_PRUNING = False
+REDUCED_COST_PRUNING_SAFETY = 2.0
+
+# Solve each year on super-cells instead of cells (False: off). Cells with the same feasible land uses and lower bounds, in
+# the same water region and with the same coefficients per hectare, up to CELL_AGGREGATION_TOLERANCE times the largest
+# coefficient per hectare of each input matrix, are merged into a super-cell, and each cell takes its super-cell's solution.
+# The compression ratio is printed and recorded in the solver telemetry. With a tolerance of 0 only cells that are identical
+# per hectare are merged, and the solution is optimal unless they differ in area and an agricultural management adoption
+# limit (which counts cells, not hectares) binds. The super-cells differ from year to year, so each year of a timeseries
+# run is formulated from scratch and TIMESERIES_WARM_START and REDUCED_COST_PRUNING have no effect. Cannot be combined with
+# DECOMPOSITION_BLOCKS or COARSE_TO_FINE_RESFACTOR.
+CELL_AGGREGATION = False
+CELL_AGGREGATION_TOLERANCE = 1e-3
+
+# Bound the objective error of each aggregated solve with its dual prices, printed and recorded in the solver telemetry
+# (True or False). The bound builds the constraint matrices once more over all cells, which takes about as long and as
+# much memory as formulating the model without aggregation.
+CELL_AGGREGATION_BOUND = False
+
+# How to solve the years after the first in a timeseries run. 'cold' solves every year from scratch with SOLVE_METHOD;
+# 'simplex' warm starts dual simplex from the previous year's basis, or from its primal and dual solution when that
+# solve left no basis (barrier with CROSSOVER = 0).
+TIMESERIES_WARM_START = 'cold'    # 'cold' or 'simplex'
+
 
 # ---------------------------------------------------------------------------- #
 # Non-agricultural land usage parameters
@@ -26,19 +26,26 @@ import time
 import dill
 import threading
 import time
+import multiprocessing
 
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from datetime import datetime
+from typing import Union
 from joblib import Parallel, delayed
 
 import luto.settings as settings
+import luto.solvers.solver as solver_module
 
 from luto.data import Data
 from luto import tools
-from luto.solvers.input_data import get_input_data
-from luto.solvers.solver import LutoSolver
+from luto.solvers.input_data import get_input_data, precompute_target_year_inputs
+from luto.solvers.solver import get_solver, SolverSolution
+from luto.solvers.coarse_to_fine import CoarseToFine
+from luto.solvers.aggregation import CellAggregation
+from luto.solvers.telemetry import write_telemetry, summarise_telemetry
 from luto.tools.create_task_runs.helpers import log_memory_usage
 from luto.tools.report.data_tools import get_all_files
-from luto.tools.write import write_outputs
+from luto.tools.write import write_outputs, write_output_single_year
 
 # Get date and time
 timestamp = datetime.now().strftime('%Y_%m_%d__%H_%M_%S')
@@ -55,14 +62,20 @@ def load_data() -> Data:
     return Data(timestamp=timestamp)
 
 @tools.LogToFile(f"{settings.OUTPUT_DIR}/run_{timestamp}", 'a')
-def run( data: Data, base: int, target: int) -> None:
+def run( data: Data, base: int, target: Union[int, list[int]]) -> None:
     """
     Run the simulation.
     Parameters:
         'data' is a Data object, and 'base' and 'target' are the base and target years for the whole simulation.
+        In snapshot mode, 'target' can be a list of target years, which are solved concurrently.
     """
     memory_thread = threading.Thread(target=log_memory_usage, daemon=True)
     memory_thread.start()
+
+    if isinstance(target, list) and settings.MODE != 'snapshot':
+        raise ValueError("A list of target years can only be run in snapshot mode.")
+    if settings.MODE == 'timeseries' and settings.REDUCED_COST_PRUNING and settings.DECOMPOSITION_BLOCKS > 1:
+        raise ValueError("REDUCED_COST_PRUNING needs the reduced costs of the solves, which the decomposition does not provide")
     
     # Set Data object's path and create output directories
     data.set_path(base, target)
@@ -77,12 +90,16 @@ def run( data: Data, base: int, target: int) -> None:
         steps = target - base
         solve_timeseries(data, steps, base, target)
 
+    elif settings.MODE == 'snapshot' and isinstance(target, list):
+        solve_snapshots(data, base, sorted(target))
+
     elif settings.MODE == 'snapshot':
-        # If demands is a time series, choose the appropriate entry.
         solve_snapshot(data, base, target)
 
     else:
         raise ValueError(f"Unkown MODE: {settings.MODE}.")
+
+    summarise_telemetry(data.solver_telemetry, f"{data.path}/solver_telemetry.csv")
     
     # Save the Data object to disk
     write_outputs(data)
@@ -92,67 +109,129 @@ def solve_timeseries(data: Data, steps: int, base: int, target: int):
     print('\n')
     print(f"Running LUTO {settings.VERSION} timeseries from {base} to {target} at resfactor {settings.RESFACTOR}.", flush=True)
 
-    for s in range(steps):
-        print( "-------------------------------------------------")
-        print( f"Running for year {base + s + 1}"   )
-        print( "-------------------------------------------------\n" )
-        start_time = time.time()
-
-        input_data = get_input_data(data, base + s, base + s + 1)
-        d_c = data.D_CY[s + 1]
-
-        if s == 0:
-            luto_solver = LutoSolver(input_data, d_c, target)
-            luto_solver.formulate()
-
-        if s > 0:
-            old_ag_x_mrj = luto_solver._input_data.ag_x_mrj.copy()
-            old_ag_man_lb_mrj = luto_solver._input_data.ag_man_lb_mrj.copy()
-            old_non_ag_x_rk = luto_solver._input_data.non_ag_x_rk.copy()
-            old_non_ag_lb_rk = luto_solver._input_data.non_ag_lb_rk.copy()
-
-            luto_solver.update_formulation(
-                input_data=input_data,
-                d_c=d_c,
-                old_ag_x_mrj=old_ag_x_mrj,
-                old_ag_man_lb_mrj=old_ag_man_lb_mrj,
-                old_non_ag_x_rk=old_non_ag_x_rk,
-                old_non_ag_lb_rk=old_non_ag_lb_rk,
-                old_lumap=data.lumaps[base + s - 1],
-                current_lumap=data.lumaps[base + s],
-                old_lmmap=data.lmmaps[base + s - 1],
-                current_lmmap=data.lmmaps[base + s],
-            )
-
-        solution = luto_solver.solve()
-
-        yr = base + s + 1
-        data.add_lumap(yr, solution.lumap)
-        data.add_lmmap(yr, solution.lmmap)
-        data.add_ammaps(yr, solution.ammaps)
-        data.add_ag_dvars(yr, solution.ag_X_mrj)
-        data.add_non_ag_dvars(yr, solution.non_ag_X_rk)
-        data.add_ag_man_dvars(yr, solution.ag_man_X_mrj)
-        data.add_obj_vals(yr, solution.obj_val)
-
-        if settings.CALC_BIODIVERSITY_CONTRIBUTION:
-            print(f'Reproject decision variables...')
-            data.add_ag_dvars_xr(yr, solution.ag_X_mrj)
-            data.add_am_dvars_xr(yr, solution.ag_man_X_mrj)
-            data.add_non_ag_dvars_xr(yr, solution.non_ag_X_rk)
-
-        for data_type, prod_data in solution.prod_data.items():
-            data.add_production_data(yr, data_type, prod_data)
-
-        print(f'Processing for {base + s + 1} completed in {round(time.time() - start_time)} seconds\n\n' )
+    coarse_to_fine = CoarseToFine(data, target) if settings.COARSE_TO_FINE_RESFACTOR > settings.RESFACTOR else None
+    cell_aggregation = CellAggregation() if settings.CELL_AGGREGATION else None
+
+    # Background pool precomputing the target-year-only inputs of upcoming years while the solver runs
+    precompute_pool = (
+        ThreadPoolExecutor(max_workers=max(settings.PRECOMPUTE_THREADS, 1)) if settings.PRECOMPUTE_YEARS_AHEAD > 0 else None
+    )
+
+    # Background writer of the outputs of each year once it is solved; the years are written in order
+    write_pool = ThreadPoolExecutor(max_workers=1) if settings.WRITE_DURING_RUN else None
+    writes = {}
+    if write_pool is not None:
+        writes[base] = write_pool.submit(write_output_single_year, data, base, f"{data.path}/out_{base}")
+
+    try:
+        for s in range(steps):
+            print( "-------------------------------------------------")
+            print( f"Running for year {base + s + 1}"   )
+            print( "-------------------------------------------------\n" )
+            start_time = time.time()
+
+            # Stop on a failed write now rather than after the last year is solved
+            for write in writes.values():
+                if write.done() and write.exception() is not None:
+                    raise write.exception()
+
+            if precompute_pool is not None:
+                upcoming_years = range(base + s + 1, min(base + s + 1 + settings.PRECOMPUTE_YEARS_AHEAD, target) + 1)
+                precompute_target_year_inputs(data, upcoming_years, precompute_pool)
+
+            input_data = get_input_data(data, base + s, base + s + 1)
+            d_c = data.D_CY[s + 1]
+
+            if cell_aggregation is not None:
+                input_data = cell_aggregation.aggregate(input_data)
+
+            # The super-cells are numbered afresh every year, so an aggregated model cannot be updated to the next year
+            if s == 0 or cell_aggregation is not None:
+                luto_solver = get_solver(input_data, d_c, target)
+                luto_solver.formulate()
+            else:
+                luto_solver.update_formulation(input_data=input_data, d_c=d_c)
+
+            if coarse_to_fine is not None:
+                coarse_to_fine.prepare(luto_solver, base + s, base + s + 1, d_c)
+
+            solution = luto_solver.solve()
+
+            if cell_aggregation is not None:
+                solution = cell_aggregation.disaggregate(luto_solver, solution, d_c)
+
+            add_solution(data, base + s + 1, solution, luto_solver.telemetry)
+            if write_pool is not None:
+                writes[base + s + 1] = write_pool.submit(write_output_single_year, data, base + s + 1, f"{data.path}/out_{base + s + 1}")
+
+            print(f'Processing for {base + s + 1} completed in {round(time.time() - start_time)} seconds\n\n' )
+
+        if write_pool is not None:
+            print("Waiting for the outputs of the last years to be written...", flush=True)
+            for yr, write in writes.items():
+                write.result()
+                data.written_years.add(yr)
+    finally:
+        # Drop the inputs and writes still queued for years that will not be solved or written, e.g. after an error
+        if precompute_pool is not None:
+            precompute_pool.shutdown(cancel_futures=True)
+            data.PRECOMPUTED_INPUTS.clear()
+        if write_pool is not None:
+            write_pool.shutdown(cancel_futures=True)
+
+
+def add_solution(data: Data, yr: int, solution: SolverSolution, telemetry: dict):
+    """
+    Store the solution and solver telemetry of year `yr` in `data`.
+    """
+    data.add_lumap(yr, solution.lumap)
+    data.add_lmmap(yr, solution.lmmap)
+    data.add_ammaps(yr, solution.ammaps)
+    data.add_ag_dvars(yr, solution.ag_X_mrj)
+    data.add_non_ag_dvars(yr, solution.non_ag_X_rk)
+    data.add_ag_man_dvars(yr, solution.ag_man_X_mrj)
+    data.add_obj_vals(yr, solution.obj_val)
+    data.add_solver_telemetry(yr, telemetry)
+    write_telemetry(telemetry, f"{data.path}/out_{yr}/solver_telemetry_{yr}.json")
 
+    if settings.CALC_BIODIVERSITY_CONTRIBUTION:
+        print(f'Reproject decision variables...')
+        data.add_ag_dvars_xr(yr, solution.ag_X_mrj)
+        data.add_am_dvars_xr(yr, solution.ag_man_X_mrj)
+        data.add_non_ag_dvars_xr(yr, solution.non_ag_X_rk)
 
-def solve_snapshot(data: Data, base: int, target: int):
+    for data_type, prod_data in solution.prod_data.items():
+        data.add_production_data(yr, data_type, prod_data)
+
+
+def get_snapshot_solution(data: Data, base: int, target: int) -> tuple[SolverSolution, dict]:
+    """
+    Solve the snapshot from `base` to `target` and return its solution and solver telemetry.
+    """
     if len(data.D_CY.shape) == 2:
         d_c = data.D_CY[ target - data.YR_CAL_BASE ]       # Demands needs to be a timeseries from 2010 to target year
     else:
         d_c = data.D_CY
 
+    input_data = get_input_data(data, base, target)
+    cell_aggregation = CellAggregation() if settings.CELL_AGGREGATION else None
+    if cell_aggregation is not None:
+        input_data = cell_aggregation.aggregate(input_data)
+
+    luto_solver = get_solver(input_data, d_c, target)
+    luto_solver.formulate()
+
+    if settings.COARSE_TO_FINE_RESFACTOR > settings.RESFACTOR:
+        CoarseToFine(data, target).prepare(luto_solver, base, target, d_c)
+
+    solution = luto_solver.solve()
+    if cell_aggregation is not None:
+        solution = cell_aggregation.disaggregate(luto_solver, solution, d_c)
+
+    return solution, luto_solver.telemetry
+
+
+def solve_snapshot(data: Data, base: int, target: int):
     print('\n')
     print( f"Running LUTO {settings.VERSION} snapshot for {target} at resfactor {settings.RESFACTOR}" )
     print( "-------------------------------------------------" )
@@ -160,29 +239,66 @@ def solve_snapshot(data: Data, base: int, target: int):
     print( "-------------------------------------------------" )
 
     start_time = time.time()
-    input_data = get_input_data(data, base, target)
-    luto_solver = LutoSolver(input_data, d_c, target)
-    luto_solver.formulate()
+    solution, telemetry = get_snapshot_solution(data, base, target)
+    add_solution(data, target, solution, telemetry)
 
-    solution = luto_solver.solve()
-    data.add_lumap(target, solution.lumap)
-    data.add_lmmap(target, solution.lmmap)
-    data.add_ammaps(target, solution.ammaps)
-    data.add_ag_dvars(target, solution.ag_X_mrj)
-    data.add_non_ag_dvars(target, solution.non_ag_X_rk)
-    data.add_ag_man_dvars(target, solution.ag_man_X_mrj)
-    data.add_obj_vals(target, solution.obj_val)
+    print(f'Processing for {target} completed in {round(time.time() - start_time)} seconds\n\n')
 
-    if settings.CALC_BIODIVERSITY_CONTRIBUTION:
-        print(f'Reproject decision variables...')
-        data.add_ag_dvars_xr(target, solution.ag_X_mrj)
-        data.add_am_dvars_xr(target, solution.ag_man_X_mrj)
-        data.add_non_ag_dvars_xr(target, solution.non_ag_X_rk)
 
-    for data_type, prod_data in solution.prod_data.items():
-        data.add_production_data(target, data_type, prod_data)
+# Data object shared with the snapshot workers, which are forked while it is set
+snapshot_data = None
 
-    print(f'Processing for {target} completed in {round(time.time() - start_time)} seconds\n\n')
+
+def init_snapshot_worker(threads: int):
+    settings.THREADS = threads
+    # A Gurobi environment cannot be carried over into a forked process. Each worker logs to its own file in the
+    # output folder, as the workers would otherwise write over each other in gurobi.log
+    solver_module.gurenv = None
+    solver_module.get_gurobi_env(logfilename=f"{snapshot_data.path}/gurobi_{os.getpid()}.log")
+
+
+def solve_snapshot_worker(base: int, target: int):
+    print(f"Running for year {target} in worker process {os.getpid()}", flush=True)
+    return get_snapshot_solution(snapshot_data, base, target)
+
+
+def solve_snapshots(data: Data, base: int, targets: list[int]):
+    """
+    Solve the snapshots for `targets` concurrently in up to `settings.SNAPSHOT_WORKERS` worker processes,
+    which share `data` by being forked from this process and split `settings.THREADS` between them.
+    """
+    global snapshot_data
+
+    n_workers = min(settings.SNAPSHOT_WORKERS, len(targets))
+    if n_workers <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        for target in targets:
+            solve_snapshot(data, base, target)
+        return
+
+    threads = max(settings.THREADS // n_workers, 1)
+    print('\n')
+    print(
+        f"Running LUTO {settings.VERSION} snapshots for {', '.join(map(str, targets))} at resfactor {settings.RESFACTOR} "
+        f"in {n_workers} worker processes with {threads} threads each"
+    )
+    print( "-------------------------------------------------", flush=True)
+
+    start_time = time.time()
+    snapshot_data = data
+    try:
+        with ProcessPoolExecutor(
+            max_workers=n_workers, mp_context=multiprocessing.get_context('fork'),
+            initializer=init_snapshot_worker, initargs=(threads,),
+        ) as pool:
+            futures = {target: pool.submit(solve_snapshot_worker, base, target) for target in targets}
+            for target, future in futures.items():
+                solution, telemetry = future.result()
+                add_solution(data, target, solution, telemetry)
+                print(f'Processing for {target} completed after {round(time.time() - start_time)} seconds\n', flush=True)
+    finally:
+        snapshot_data = None
+
+    print(f'Processing for {", ".join(map(str, targets))} completed in {round(time.time() - start_time)} seconds\n\n')
 
 
 def save_data_to_disk(data: Data, path: str, compress_level=9) -> None:
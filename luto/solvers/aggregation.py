@@ -0,0 +1,274 @@
+# Copyright 2022 Fjalar J. de Haan and Brett A. Bryan at Deakin University
+#
+# This file is part of LUTO 2.0.
+#
+# LUTO 2.0 is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# LUTO 2.0 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# LUTO 2.0. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Aggregation of cells into super-cells. Cells with the same feasible land uses and bounds, in the same water region
+and with (nearly) the same coefficients per hectare are merged into a super-cell whose coefficients are the sums over
+its cells. Every cell of a super-cell takes the super-cell's solution, which is feasible for the LP over the cells
+and has the same objective; the dual prices of the aggregated solve bound how far that is from the optimum.
+"""
+
+import numpy as np
+import luto.settings as settings
+
+from dataclasses import replace
+from gurobipy import GRB
+from scipy import sparse
+
+from luto.solvers.input_data import SolverInputData
+from luto.solvers.solver import LutoSolver, MatrixLutoSolver, SolverSolution
+
+
+# Constraint families over the variables of a single cell; all others couple the cells
+CELL_CONSTRAINT_FAMILIES = ('cell_usage', 'ag_management')
+
+
+def get_cell_rows(arr: np.ndarray, cell_axis: int) -> np.ndarray:
+    """
+    Return `arr` as a 2D array with a row per cell.
+    """
+    arr = np.moveaxis(arr, cell_axis, 0)
+    return arr.reshape(arr.shape[0], -1)
+
+
+def get_super_cells(input_data: SolverInputData, tolerance: float) -> np.ndarray:
+    """
+    Return the super-cell of each cell, numbered in the order of their first cells. Cells are in the same super-cell if
+    they have the same exclude matrices and lower bounds, are in the same water region, and their coefficients per
+    hectare are equal after rounding to `tolerance` times the largest coefficient per hectare of the same input matrix
+    (with a tolerance of zero, they are exactly equal).
+    """
+    ncells = input_data.ncells
+    water_regions = np.asarray(input_data.limits["water_region_matrix"].argmax(axis=0)).ravel()
+
+    exact_rows = [
+        get_cell_rows(input_data.ag_x_mrj, 1),
+        get_cell_rows(input_data.non_ag_x_rk, 0),
+        get_cell_rows(input_data.non_ag_lb_rk, 0),
+        *(get_cell_rows(lb_mrj, 1) for lb_mrj in input_data.ag_man_lb_mrj.values()),
+        water_regions[:, np.newaxis],
+    ]
+
+    ag_economy_mrj, non_ag_economy_rk, ag_man_economy_mrj = input_data.economic_contr_mrj
+    per_cell_coeffs = [
+        (ag_economy_mrj, 1), (non_ag_economy_rk, 0), *((arr, 1) for arr in ag_man_economy_mrj.values()),
+        (input_data.ag_g_mrj, 1), (input_data.ag_ghg_t_mrj, 1), (input_data.ag_w_mrj, 1), (input_data.ag_b_mrj, 1),
+        (input_data.ag_q_mrp, 1), (input_data.non_ag_g_rk, 0), (input_data.non_ag_w_rk, 0),
+        (input_data.non_ag_b_rk, 0), (input_data.non_ag_q_crk, 1),
+        *((arr, 1) for ag_man in (
+            input_data.ag_man_g_mrj, input_data.ag_man_q_mrp, input_data.ag_man_w_mrj, input_data.ag_man_b_mrj
+        ) for arr in ag_man.values()),
+    ]
+    rounded_rows = []
+    for arr, cell_axis in per_cell_coeffs:
+        rows = get_cell_rows(arr, cell_axis) / input_data.real_area_r[:, np.newaxis]
+        largest = np.abs(rows).max(initial=0)
+        rounded_rows.append(np.round(rows / (tolerance * largest)) if tolerance > 0 and largest > 0 else rows)
+
+    # Refine the grouping of the cells by one input matrix at a time
+    super_cells = np.zeros(ncells, dtype=np.int64)
+    for rows in exact_rows + rounded_rows:
+        keys = np.column_stack([super_cells, rows.astype(np.float64)])
+        super_cells = np.unique(keys, axis=0, return_inverse=True)[1].ravel()
+
+    n_super_cells = super_cells.max() + 1
+    first_cells = np.full(n_super_cells, ncells)
+    np.minimum.at(first_cells, super_cells, np.arange(ncells))
+    return np.argsort(np.argsort(first_cells))[super_cells]
+
+
+def aggregate_input_data(input_data: SolverInputData, super_cells: np.ndarray) -> SolverInputData:
+    """
+    Return the solver input data over the super-cells: the coefficients, areas and cell counts are summed over the cells
+    of each super-cell, and the exclude matrices, lower bounds and water region are those of its (identical) cells.
+    """
+    ncells, n_super_cells = input_data.ncells, super_cells.max() + 1
+    cell_sums = sparse.csr_array((np.ones(ncells), (super_cells, np.arange(ncells))), shape=(n_super_cells, ncells))
+    first_cells = np.full(n_super_cells, ncells)
+    np.minimum.at(first_cells, super_cells, np.arange(ncells))
+
+    def total(arr, cell_axis):
+        moved = np.moveaxis(arr, cell_axis, 0)
+        summed = cell_sums @ moved.reshape(ncells, -1)
+        return np.moveaxis(summed.reshape((n_super_cells,) + moved.shape[1:]), 0, cell_axis)
+
+    def pick(arr, cell_axis):
+        return np.take(arr, first_cells, axis=cell_axis)
+
+    ag_economy_mrj, non_ag_economy_rk, ag_man_economy_mrj = input_data.economic_contr_mrj
+    return replace(
+        input_data,
+        ag_g_mrj=total(input_data.ag_g_mrj, 1),
+        ag_w_mrj=total(input_data.ag_w_mrj, 1),
+        ag_b_mrj=total(input_data.ag_b_mrj, 1),
+        ag_x_mrj=pick(input_data.ag_x_mrj, 1),
+        ag_q_mrp=total(input_data.ag_q_mrp, 1),
+        ag_ghg_t_mrj=total(input_data.ag_ghg_t_mrj, 1),
+        non_ag_g_rk=total(input_data.non_ag_g_rk, 0),
+        non_ag_w_rk=total(input_data.non_ag_w_rk, 0),
+        non_ag_b_rk=total(input_data.non_ag_b_rk, 0),
+        non_ag_x_rk=pick(input_data.non_ag_x_rk, 0),
+        non_ag_q_crk=total(input_data.non_ag_q_crk, 1),
+        non_ag_lb_rk=pick(input_data.non_ag_lb_rk, 0),
+        ag_man_g_mrj={am: total(arr, 1) for am, arr in input_data.ag_man_g_mrj.items()},
+        ag_man_q_mrp={am: total(arr, 1) for am, arr in input_data.ag_man_q_mrp.items()},
+        ag_man_w_mrj={am: total(arr, 1) for am, arr in input_data.ag_man_w_mrj.items()},
+        ag_man_b_mrj={am: total(arr, 1) for am, arr in input_data.ag_man_b_mrj.items()},
+        ag_man_lb_mrj={am: pick(arr, 1) for am, arr in input_data.ag_man_lb_mrj.items()},
+        economic_contr_mrj=(
+            total(ag_economy_mrj, 1),
+            total(non_ag_economy_rk, 0),
+            {am: total(arr, 1) for am, arr in ag_man_economy_mrj.items()},
+        ),
+        limits={**input_data.limits, "water_region_matrix": input_data.limits["water_region_matrix"][:, first_cells]},
+        real_area_r=total(input_data.real_area_r, 0),
+        cell_count_r=total(input_data.cell_count_r, 0),
+    )
+
+
+def disaggregate_solution(solution: SolverSolution, super_cells: np.ndarray) -> SolverSolution:
+    """
+    Return the solution over the cells, where every cell takes the solution of its super-cell.
+    """
+    return replace(
+        solution,
+        lumap=solution.lumap[super_cells],
+        lmmap=solution.lmmap[super_cells],
+        ammaps={am: ammap[super_cells] for am, ammap in solution.ammaps.items()},
+        ag_X_mrj=solution.ag_X_mrj[:, super_cells],
+        non_ag_X_rk=solution.non_ag_X_rk[super_cells],
+        ag_man_X_mrj={am: X_mrj[:, super_cells] for am, X_mrj in solution.ag_man_X_mrj.items()},
+    )
+
+
+def get_lagrangian_bound(full: MatrixLutoSolver, duals: dict[str, np.ndarray]) -> float:
+    """
+    Return the Lagrangian bound on the objective of the LP `full` for the dual prices `duals` of its constraints that
+    couple the cells: the value of those constraints at these prices, plus the best use of every cell on its own at the
+    reduced costs. An upper bound on the optimum when maximising, a lower bound when minimising.
+    """
+    sign = -1.0 if settings.OBJECTIVE == "mincost" else 1.0
+    reduced_costs = full.obj_coeffs.copy()
+    bound = full.obj_con
+    for name, family in full.constraint_families.items():
+        if name in CELL_CONSTRAINT_FAMILIES:
+            continue
+        # Prices of the wrong sign (within the tolerances of the solve) are taken as zero, so that the bound is valid
+        pi = duals[name]
+        if family.sense == GRB.LESS_EQUAL:
+            pi = sign * np.maximum(sign * pi, 0)
+        elif family.sense == GRB.GREATER_EQUAL:
+            pi = sign * np.minimum(sign * pi, 0)
+        reduced_costs -= family.A.T @ pi
+        bound += pi @ family.rhs
+
+    # Gain of each column in the direction of the objective. The deviation penalties are unbounded above, so the bound
+    # is infinite if any of them gains by more than the optimality tolerance
+    gain = sign * reduced_costs
+    for cols in (full.V_cols, full.E_cols):
+        if cols is not None and (gain[cols] * full.col_scale[cols] * full.obj_scale > settings.OPTIMALITY_TOLERANCE).any():
+            return sign * np.inf
+
+    # Each agricultural option brings its management options along: those that gain are used as much as it is, the
+    # others as little as their lower bounds allow, which the agricultural option must then reach
+    ag, non_ag = full.ag_vars, full.non_ag_vars
+    ag_slope, ag_const, ag_lb = gain[ag.cols].copy(), np.zeros(ag.size), full.var_lb[ag.cols].copy()
+    for am_vars in full.ag_man_vars.values():
+        ag_pos = full._get_ag_cols(am_vars.m, am_vars.j, am_vars.r) - ag.cols.start
+        am_gain, am_lb = gain[am_vars.cols], full.var_lb[am_vars.cols]
+        np.add.at(ag_slope, ag_pos, np.maximum(am_gain, 0))
+        np.add.at(ag_const, ag_pos, np.minimum(am_gain, 0) * am_lb)
+        np.maximum.at(ag_lb, ag_pos, am_lb)
+
+    # The best use of each cell fills its lower bounds, then the rest of the cell in order of the gains
+    r = np.concatenate([ag.r, non_ag.r])
+    slope = np.concatenate([ag_slope, gain[non_ag.cols]])
+    const = np.concatenate([ag_const, np.zeros(non_ag.size)])
+    lb = np.concatenate([ag_lb, full.var_lb[non_ag.cols]])
+    ub = np.concatenate([full.var_ub[ag.cols], full.var_ub[non_ag.cols]])
+
+    ncells = full._input_data.ncells
+    best = (const + lb * slope).sum()
+    free = 1 - np.bincount(r, weights=lb, minlength=ncells)
+    order = np.lexsort((-slope, r))
+    r, slope, room = r[order], slope[order], (ub - lb)[order]
+    room_before = np.cumsum(room) - room
+    room_before -= room_before[np.searchsorted(r, r)]
+    best += np.clip(free[r] - room_before, 0, room) @ slope
+
+    return bound + sign * best
+
+
+class CellAggregation:
+    """
+    Solves the years of a run on super-cells (see `get_super_cells`), and reports the compression ratio and,
+    with CELL_AGGREGATION_BOUND, a bound on the objective error of each solve.
+    """
+
+    def __init__(self):
+        if settings.DECOMPOSITION_BLOCKS > 1:
+            raise ValueError("CELL_AGGREGATION needs the dual prices of the solves, which the decomposition does not provide")
+        if settings.COARSE_TO_FINE_RESFACTOR > settings.RESFACTOR:
+            raise ValueError("CELL_AGGREGATION cannot be combined with COARSE_TO_FINE_RESFACTOR, which maps solutions onto cells")
+
+        self.input_data = None
+        self.super_cells = None
+
+    def aggregate(self, input_data: SolverInputData) -> SolverInputData:
+        """
+        Returns `input_data` aggregated into super-cells.
+        """
+        print("Aggregating cells into super-cells...", flush=True)
+        self.input_data = input_data
+        self.super_cells = get_super_cells(input_data, settings.CELL_AGGREGATION_TOLERANCE)
+        n_super_cells = self.super_cells.max() + 1
+        print(
+            f"    ...{input_data.ncells:,} cells into {n_super_cells:,} super-cells "
+            f"(compression ratio {input_data.ncells / n_super_cells:.2f})", flush=True
+        )
+        return aggregate_input_data(input_data, self.super_cells)
+
+    def disaggregate(self, luto_solver: LutoSolver, solution: SolverSolution, d_c: np.ndarray) -> SolverSolution:
+        """
+        Returns the solution of `luto_solver` over the super-cells as a solution over the cells. With
+        CELL_AGGREGATION_BOUND, also bounds its objective error with the dual prices of the solve, which formulates
+        the constraint matrices over all cells.
+        """
+        n_super_cells = self.super_cells.max() + 1
+        luto_solver.telemetry['aggregation'] = {
+            'cells': int(self.input_data.ncells),
+            'super_cells': int(n_super_cells),
+            'compression_ratio': self.input_data.ncells / n_super_cells,
+            'objective_bound': None,
+            'objective_error_bound': None,
+        }
+
+        if settings.CELL_AGGREGATION_BOUND:
+            print("Bounding the objective error of the aggregation over all cells...", flush=True)
+            full = MatrixLutoSolver(self.input_data, d_c, luto_solver.final_target_year)
+            full.formulate()
+            bound = get_lagrangian_bound(full, luto_solver.get_duals())
+
+            objective = solution.obj_val['SUM']
+            error_bound = abs(bound - objective)
+            print(
+                f"    ...objective {objective:,.2f} is within {error_bound:,.2f} "
+                f"({error_bound / max(abs(objective), 1e-10):.2e} relative) of the optimum over all cells\n", flush=True
+            )
+            luto_solver.telemetry['aggregation']['objective_bound'] = float(bound)
+            luto_solver.telemetry['aggregation']['objective_error_bound'] = float(error_bound)
+
+        return disaggregate_solution(solution, self.super_cells)
@@ -0,0 +1,152 @@
+# Copyright 2022 Fjalar J. de Haan and Brett A. Bryan at Deakin University
+#
+# This file is part of LUTO 2.0.
+#
+# LUTO 2.0 is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# LUTO 2.0 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# LUTO 2.0. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Coarse-to-fine solves: every year is first solved at `settings.COARSE_TO_FINE_RESFACTOR`, and the coarse
+solution prunes the land-use options of the solve at `settings.RESFACTOR` and gives it a start.
+"""
+
+import numpy as np
+import luto.settings as settings
+
+from luto.data import Data
+from luto.solvers.input_data import get_input_data
+from luto.solvers.solver import LutoSolver, get_solver, match_keys
+
+
+def load_coarse_data(timestamp: str) -> Data:
+    """
+    Load the Data object at `settings.COARSE_TO_FINE_RESFACTOR`.
+    """
+    resfactor = settings.RESFACTOR
+    settings.RESFACTOR = settings.COARSE_TO_FINE_RESFACTOR
+    try:
+        return Data(timestamp=timestamp)
+    finally:
+        settings.RESFACTOR = resfactor
+
+
+def get_covering_cells(data: Data, coarse_data: Data) -> np.ndarray:
+    """
+    Return the cell of `coarse_data` covering each cell of `data`, or -1 where there is none. A coarse cell is the
+    middle cell of a COARSE_TO_FINE_RESFACTOR x COARSE_TO_FINE_RESFACTOR block (see `Data.__init__`), so a block
+    whose middle cell is outside the land-use mask, or cut off by the edge of the map, has no coarse cell.
+    """
+    factor = settings.COARSE_TO_FINE_RESFACTOR
+    rows, cols = np.nonzero(data.NLUM_MASK)     # Full resolution land cells, in the order of the 1D maps
+    coarse_ids = np.full(data.NLUM_MASK.shape, -1)
+    coarse_ids[rows[coarse_data.MASK], cols[coarse_data.MASK]] = np.arange(coarse_data.MASK.sum())
+
+    block_rows = rows[data.MASK] // factor * factor + factor // 2
+    block_cols = cols[data.MASK] // factor * factor + factor // 2
+    inside = (block_rows < data.NLUM_MASK.shape[0]) & (block_cols < data.NLUM_MASK.shape[1])
+
+    covering = np.full(block_rows.size, -1)
+    covering[inside] = coarse_ids[block_rows[inside], block_cols[inside]]
+    return covering
+
+
+class CoarseToFine:
+    """
+    Solves the years of a run at `settings.COARSE_TO_FINE_RESFACTOR`, and prunes and starts the solves of the
+    same years at `settings.RESFACTOR` with the coarse solutions.
+    """
+
+    def __init__(self, data: Data, final_target_year: int):
+        if settings.DECOMPOSITION_BLOCKS > 1:
+            raise ValueError("COARSE_TO_FINE_RESFACTOR needs the reduced costs of the solves, which the decomposition does not provide")
+
+        print(f"Loading data at the coarse resfactor {settings.COARSE_TO_FINE_RESFACTOR}...", flush=True)
+        self.coarse_data = load_coarse_data(data.timestamp_sim)
+        self.covering_cells = get_covering_cells(data, self.coarse_data)
+        self.area_ratio = data.RESMULT / self.coarse_data.RESMULT
+        self.final_target_year = final_target_year
+        self.coarse_solver = None
+
+    def solve_coarse(self, base_year: int, target_year: int, d_c: np.ndarray):
+        """
+        Solves `target_year` at the coarse resolution, starting from the coarse solution of `base_year`.
+        """
+        print(f"Solving {target_year} at the coarse resfactor {settings.COARSE_TO_FINE_RESFACTOR}...", flush=True)
+        input_data = get_input_data(self.coarse_data, base_year, target_year)
+        if self.coarse_solver is None:
+            self.coarse_solver = get_solver(input_data, d_c, self.final_target_year)
+            self.coarse_solver.formulate()
+        else:
+            self.coarse_solver.update_formulation(input_data=input_data, d_c=d_c)
+
+        solution = self.coarse_solver.solve()
+        self.coarse_data.add_lumap(target_year, solution.lumap)
+        self.coarse_data.add_lmmap(target_year, solution.lmmap)
+        self.coarse_data.add_ammaps(target_year, solution.ammaps)
+        self.coarse_data.add_ag_dvars(target_year, solution.ag_X_mrj)
+        self.coarse_data.add_non_ag_dvars(target_year, solution.non_ag_X_rk)
+        self.coarse_data.add_ag_man_dvars(target_year, solution.ag_man_X_mrj)
+
+    def prepare(self, luto_solver: LutoSolver, base_year: int, target_year: int, d_c: np.ndarray):
+        """
+        Solves `target_year` at the coarse resolution, then prunes the land-use options of `luto_solver` (formulated
+        for the same years at `settings.RESFACTOR`) and sets its start from the coarse solution.
+        """
+        self.solve_coarse(base_year, target_year, d_c)
+        coarse_solver = self.coarse_solver
+        coarse_cols = luto_solver.map_columns(coarse_solver, self.covering_cells)
+        mapped = coarse_cols >= 0
+
+        # Keep the options that are active in the covering coarse cell, or whose reduced cost there is small next
+        # to their economic contribution; cells without a coarse cell, and options it does not have, are kept
+        coarse_rc = np.abs(coarse_solver.get_reduced_costs()[coarse_cols])
+        near_active = coarse_rc <= settings.COARSE_TO_FINE_RC_MARGIN * np.abs(coarse_solver.obj_economy_coeffs[coarse_cols])
+        active = coarse_solver.X_sol[coarse_cols] >= settings.COARSE_TO_FINE_ACTIVE_THRESHOLD
+        pruned = np.zeros(luto_solver.ncols, dtype=bool)
+        for family in luto_solver.x_var_families:
+            pruned[family.cols] = mapped[family.cols] & ~active[family.cols] & ~near_active[family.cols]
+
+        # Keep all options of the cells that would have no land use left
+        usage_families = [luto_solver.ag_vars, luto_solver.non_ag_vars]
+        n_kept = np.bincount(
+            np.concatenate([f.r for f in usage_families]),
+            weights=np.concatenate([~pruned[f.cols] for f in usage_families]),
+            minlength=len(self.covering_cells),
+        )
+        for family in luto_solver.x_var_families:
+            pruned[family.col_idx[n_kept[family.r] == 0]] = False
+        luto_solver.prune(pruned)
+
+        if luto_solver.warm_start is not None:
+            return      # Warm started from the previous year's solve instead
+
+        # Start from the coarse solution. The dual prices of the rows of a cell scale with its area, the others are
+        # prices per unit of a commodity, emissions, water or biodiversity and are the same at both resolutions
+        x_start = np.where(mapped & ~luto_solver.pruned, coarse_solver.X_sol[coarse_cols], 0)
+        coarse_duals = coarse_solver.get_duals()
+        duals = {}
+        for name, family in luto_solver.constraint_families.items():
+            coarse_family = coarse_solver.constraint_families.get(name)
+            scale = self.area_ratio
+            if coarse_family is None:
+                coarse_rows = np.full(family.rhs.size, -1)
+            elif name == 'cell_usage':
+                coarse_rows = self.covering_cells
+            elif family.row_keys is not None:
+                coarse_rows = match_keys(coarse_family.row_keys, coarse_cols[family.row_keys])
+            else:
+                coarse_rows = np.arange(family.rhs.size) if coarse_family.rhs.size == family.rhs.size else np.full(family.rhs.size, -1)
+                scale = 1.0
+            found = coarse_rows >= 0
+            duals[name] = np.zeros(family.rhs.size)
+            duals[name][found] = coarse_duals[name][coarse_rows[found]] * scale
+        luto_solver.set_start(x_start, duals)
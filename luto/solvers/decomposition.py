@@ -0,0 +1,418 @@
+# Copyright 2022 Fjalar J. de Haan and Brett A. Bryan at Deakin University
+#
+# This file is part of LUTO 2.0.
+#
+# LUTO 2.0 is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# LUTO 2.0 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# LUTO 2.0. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Dantzig-Wolfe decomposition of the LUTO LP over blocks of cells.
+
+The cell usage and agricultural management constraints, and the water constraints of regions that lie
+within one block, only involve the variables of one block. The remaining (coupling) constraints - demand,
+GHG emissions, biodiversity and the adoption limits - are kept in a small master LP over convex combinations
+of block solutions. Each iteration prices the blocks with the dual prices of the master, solving them in
+worker processes that are given the block LPs once, and adds the block solutions that improve the master.
+"""
+
+import time
+import itertools
+import multiprocessing
+import numpy as np
+import gurobipy as gp
+from scipy import sparse
+import luto.settings as settings
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from gurobipy import GRB
+
+from luto.solvers.input_data import SolverInputData
+from luto.solvers.solver import MatrixLutoSolver, get_gurobi_env
+from luto.solvers.telemetry import get_solve_record
+
+
+# Settings changed for the LPs of the decomposition: the blocks are solved in parallel, and need basic solutions
+LP_SETTINGS = {'VERBOSE': 0, 'THREADS': 1, 'SOLVE_METHOD': 1}
+
+# Weight of the duals with the best Lagrangian bound so far in the duals that the blocks are priced at
+DUAL_SMOOTHING = 0.5
+
+# Gurobi environment of the process, for the LPs of the decomposition
+lp_env = None
+
+# Block LPs of a worker process, given to it when it starts; each pricing only sends the new costs
+worker_block_lps = None
+
+
+@dataclass
+class LinearProgram:
+    """
+    The LP `min c @ x s.t. A @ x <sense> rhs, lb <= x <= ub` (or max, if `maximise`).
+    """
+    c: np.ndarray
+    A: sparse.csr_array
+    sense: np.ndarray                       # Sense of each row: GRB.LESS_EQUAL, GRB.GREATER_EQUAL or GRB.EQUAL
+    rhs: np.ndarray
+    lb: np.ndarray
+    ub: np.ndarray
+    obj_con: float = 0.0
+    maximise: bool = False
+
+
+def solve_lp(lp: LinearProgram, solver: str) -> tuple[np.ndarray, np.ndarray, float]:
+    """
+    Solves `lp` with 'gurobi' or 'highs', and returns its solution, the dual prices of its rows and its objective.
+    """
+    if solver == 'gurobi':
+        global lp_env
+        if lp_env is None:
+            lp_env = get_gurobi_env(LP_SETTINGS, logfilename="")
+
+        model = gp.Model(env=lp_env)
+        x = model.addMVar(lp.c.size, lb=lp.lb, ub=lp.ub, obj=lp.c)
+        constrs = model.addMConstr(lp.A, x, lp.sense, lp.rhs)
+        model.ObjCon = lp.obj_con
+        model.ModelSense = GRB.MAXIMIZE if lp.maximise else GRB.MINIMIZE
+        model.optimize()
+
+        if model.Status != GRB.OPTIMAL:
+            raise RuntimeError(f"Gurobi did not solve the LP to optimality: status {model.Status}")
+        solution = x.X, constrs.Pi, model.ObjVal
+        model.dispose()
+        return solution
+
+    elif solver == 'highs':
+        import highspy
+        from luto.solvers.highs_solver import set_highs_options
+
+        highs = highspy.Highs()
+        set_highs_options(highs, LP_SETTINGS)
+        highs.passModel(get_highs_lp(lp))
+        highs.run()
+
+        status = highs.getModelStatus()
+        if status not in (highspy.HighsModelStatus.kOptimal, highspy.HighsModelStatus.kModelEmpty):
+            raise RuntimeError(f"HiGHS did not solve the LP to optimality: {highs.modelStatusToString(status)}")
+        solution = highs.getSolution()
+        return np.array(solution.col_value), np.array(solution.row_dual), highs.getInfo().objective_function_value
+
+    else:
+        raise ValueError("Unknown choice for `SOLVER` setting: must be either 'gurobi' or 'highs'")
+
+
+def init_block_worker(block_lps: list[LinearProgram], settings_values: dict):
+    global worker_block_lps
+    worker_block_lps = block_lps
+    for name, value in settings_values.items():   # The settings of the parent process, which may differ from settings.py
+        setattr(settings, name, value)
+
+
+def solve_block(b: int, c: np.ndarray, solver: str) -> tuple[np.ndarray, np.ndarray, float]:
+    """
+    Solves the block LP `b` of the worker process with the costs `c`.
+    """
+    return solve_lp(replace(worker_block_lps[b], c=c), solver)
+
+
+def get_highs_lp(lp: LinearProgram):
+    import highspy
+
+    highs_lp = highspy.HighsLp()
+    highs_lp.num_col_ = lp.c.size
+    highs_lp.num_row_ = lp.A.shape[0]
+    highs_lp.col_cost_ = lp.c
+    highs_lp.col_lower_ = lp.lb
+    highs_lp.col_upper_ = lp.ub
+    highs_lp.row_lower_ = np.where(lp.sense == GRB.LESS_EQUAL, -highspy.kHighsInf, lp.rhs)
+    highs_lp.row_upper_ = np.where(lp.sense == GRB.GREATER_EQUAL, highspy.kHighsInf, lp.rhs)
+    highs_lp.offset_ = lp.obj_con
+    highs_lp.sense_ = highspy.ObjSense.kMaximize if lp.maximise else highspy.ObjSense.kMinimize
+    highs_lp.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+    highs_lp.a_matrix_.num_col_ = lp.c.size
+    highs_lp.a_matrix_.num_row_ = lp.A.shape[0]
+    highs_lp.a_matrix_.start_ = lp.A.indptr
+    highs_lp.a_matrix_.index_ = lp.A.indices
+    highs_lp.a_matrix_.value_ = lp.A.data
+    return highs_lp
+
+
+def get_artificial_matrix(sense: np.ndarray) -> sparse.csr_array:
+    """
+    Returns the columns of the artificial variables that relax rows of the given senses:
+    one per inequality, in the direction that relaxes it, and two per equality.
+    """
+    rows = np.concatenate([np.flatnonzero(sense != GRB.LESS_EQUAL), np.flatnonzero(sense != GRB.GREATER_EQUAL)])
+    coeffs = np.concatenate([np.ones((sense != GRB.LESS_EQUAL).sum()), -np.ones((sense != GRB.GREATER_EQUAL).sum())])
+    return sparse.csr_array((coeffs, (rows, np.arange(rows.size))), shape=(sense.size, rows.size))
+
+
+class DecomposedLutoSolver(MatrixLutoSolver):
+    """
+    Solves the formulation of `LutoSolver` by Dantzig-Wolfe decomposition over `settings.DECOMPOSITION_BLOCKS`
+    blocks of cells, with the block and master LPs solved by the backend chosen by `settings.SOLVER`.
+    """
+
+    def __init__(self, input_data: SolverInputData, d_c: np.array, final_target_year: int):
+        if settings.DECOMPOSITION_MAX_ITERATIONS < 1:
+            raise ValueError("DECOMPOSITION_MAX_ITERATIONS must be at least 1")
+        super().__init__(input_data, d_c, final_target_year)
+
+    def get_reduced_costs(self) -> np.ndarray:
+        raise RuntimeError("The decomposition does not give reduced costs, which pruning needs")
+
+    def get_duals(self) -> dict[str, np.ndarray]:
+        raise RuntimeError("The decomposition does not give dual prices, which pruning needs")
+
+    def get_cell_blocks(self) -> np.ndarray:
+        """
+        Returns the block of each cell. With water limits on, whole water regions are assigned to the blocks
+        (largest first, to the block with the fewest cells) so that the water constraints stay within a block;
+        otherwise the cells are split into contiguous ranges.
+        """
+        n_blocks = settings.DECOMPOSITION_BLOCKS
+        ncells = self._input_data.ncells
+
+        if settings.WATER_LIMITS != 'on':
+            return np.arange(ncells) * n_blocks // ncells
+
+        cell_regions = np.asarray(self._input_data.limits["water_region_matrix"].argmax(axis=0)).ravel()
+        region_sizes = np.bincount(cell_regions)
+        region_blocks = np.zeros(region_sizes.size, dtype=int)
+        block_sizes = np.zeros(n_blocks, dtype=int)
+        for region in np.argsort(-region_sizes, kind='stable'):
+            region_blocks[region] = block_sizes.argmin()
+            block_sizes[region_blocks[region]] += region_sizes[region]
+        return region_blocks[cell_regions]
+
+    def _get_block_lps(self):
+        """
+        Splits the LP (as a minimisation) into the LPs of the blocks, over their local constraints, and the
+        coupling constraints. Returns the block LPs, the columns and coupling constraint coefficients of each
+        block, the coupling constraints over the master columns (the deviation penalties) and the master columns.
+        """
+        A, sense, rhs = self.get_lp_rows()
+        obj_coeffs, lb, ub, _ = self.get_lp_columns()
+        c = -obj_coeffs if settings.OBJECTIVE != "mincost" else obj_coeffs
+
+        cell_blocks = self.get_cell_blocks()
+        col_blocks = np.full(self.ncols, -1)
+        for var_family in self.x_var_families:
+            col_blocks[var_family.cols] = cell_blocks[var_family.r]
+
+        # A row is local to a block if all its variables are in that block; the others couple the blocks
+        A_coo = A.tocoo()
+        row_min = np.full(A.shape[0], settings.DECOMPOSITION_BLOCKS)
+        row_max = np.full(A.shape[0], -1)
+        np.minimum.at(row_min, A_coo.row, col_blocks[A_coo.col])
+        np.maximum.at(row_max, A_coo.row, col_blocks[A_coo.col])
+        row_blocks = np.where((row_min == row_max) & (row_min >= 0), row_min, -1)
+
+        coupling_rows = np.flatnonzero(row_blocks == -1)
+        D = A[coupling_rows].tocsc()
+
+        block_lps, block_cols, block_D = [], [], []
+        for b in range(settings.DECOMPOSITION_BLOCKS):
+            cols = np.flatnonzero(col_blocks == b)
+            rows = np.flatnonzero(row_blocks == b)
+            block_lps.append(LinearProgram(
+                c[cols], A[rows][:, cols].tocsr(), sense[rows], rhs[rows], lb[cols], ub[cols]
+            ))
+            block_cols.append(cols)
+            block_D.append(D[:, cols])
+
+        master_cols = np.flatnonzero(col_blocks == -1)
+        coupling = LinearProgram(
+            c[master_cols], D[:, master_cols].tocsr(), sense[coupling_rows], rhs[coupling_rows],
+            lb[master_cols], ub[master_cols],
+        )
+        return block_lps, block_cols, block_D, coupling, master_cols
+
+    def _write_model_file(self, path: str) -> np.ndarray:
+        A, sense, rhs = self.get_lp_rows()
+        obj_coeffs, lb, ub, obj_con = self.get_lp_columns()
+        lp = LinearProgram(obj_coeffs, A, sense, rhs, lb, ub, obj_con, settings.OBJECTIVE != "mincost")
+        if settings.SOLVER == 'gurobi':
+            model = gp.Model(env=get_gurobi_env())
+            x = model.addMVar(lp.c.size, lb=lp.lb, ub=lp.ub, obj=lp.c)
+            model.addMConstr(lp.A, x, lp.sense, lp.rhs)
+            model.ObjCon = lp.obj_con
+            model.ModelSense = GRB.MAXIMIZE if lp.maximise else GRB.MINIMIZE
+            model.write(path)
+            model.dispose()
+        else:
+            import highspy
+            highs = highspy.Highs()
+            highs.passModel(get_highs_lp(lp))
+            highs.writeModel(path)
+        return np.arange(self.ncols)
+
+    def _optimize(self) -> tuple[np.ndarray, float]:
+        start_time = time.time()
+        block_lps, block_cols, block_D, coupling, master_cols = self._get_block_lps()
+        n_blocks, n_coupling = len(block_lps), coupling.rhs.size
+        print(
+            f"    ...decomposing into {n_blocks} blocks of {min(c.size for c in block_cols):,} to "
+            f"{max(c.size for c in block_cols):,} variables, coupled by {n_coupling} constraints"
+        )
+
+        # The artificial variables keep the master feasible until the block solutions can satisfy the coupling
+        # constraints; their cost is raised whenever the master converges with artificial variables in use
+        artificial = get_artificial_matrix(coupling.sense)
+        penalty = 1e3 * max(1.0, np.abs(np.concatenate([lp.c for lp in block_lps] + [coupling.c])).max())
+
+        # Block solutions added to the master: block, solution, cost and coupling constraint coefficients
+        proposals = {'block': [], 'x': [], 'cost': [], 'D': []}
+
+        def add_proposal(b, x):
+            proposals['block'].append(b)
+            proposals['x'].append(x)
+            proposals['cost'].append(block_lps[b].c @ x)
+            proposals['D'].append(block_D[b] @ x)
+
+        def lagrangian_bound(pi, block_objs):
+            # The Lagrangian bound of the duals `pi`: the best block solutions, deviation penalties and artificial
+            # variables for the relaxed coupling constraints, which is -inf if any of them is unbounded
+            master_rc = np.concatenate([coupling.c - coupling.A.T @ pi, penalty - artificial.T @ pi])
+            master_lb = np.concatenate([coupling.lb, np.zeros(artificial.shape[1])])
+            master_ub = np.concatenate([coupling.ub, np.full(artificial.shape[1], np.inf)])
+            with np.errstate(invalid='ignore'):
+                master_min = np.where(master_rc > 0, master_rc * master_lb, np.where(master_rc < 0, master_rc * master_ub, 0))
+            return sum(block_objs) + master_min.sum() + pi @ coupling.rhs
+
+        # The worker processes keep the block LPs, so that pricing only sends them the new costs
+        n_workers = min(settings.DECOMPOSITION_WORKERS, n_blocks)
+        pool = ProcessPoolExecutor(
+            max_workers=n_workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_block_worker,
+            initargs=(block_lps, {name: getattr(settings, name) for name in dir(settings) if name.isupper()}),
+        ) if n_workers > 1 else None
+
+        def price_blocks(pi):
+            costs = [lp.c - D.T @ pi for lp, D in zip(block_lps, block_D)]
+            if pool is None:
+                return [solve_lp(replace(lp, c=c), settings.SOLVER) for lp, c in zip(block_lps, costs)]
+            return list(pool.map(solve_block, range(n_blocks), costs, itertools.repeat(settings.SOLVER)))
+
+        try:
+            for b, (x, _, _) in enumerate(price_blocks(np.zeros(n_coupling))):
+                add_proposal(b, x)
+
+            # The blocks are priced at a smoothed dual, between the master duals and the duals with the best bound
+            # so far, which damps the oscillation of the master duals that slows down the convergence
+            best_pi, bound = None, -np.inf
+            converged = False
+            progress = []
+            for iteration in range(settings.DECOMPOSITION_MAX_ITERATIONS):
+                # Master LP over the deviation penalties, the weights of the block solutions and the artificial variables
+                n_props = len(proposals['block'])
+                convexity = sparse.csr_array(
+                    (np.ones(n_props), (proposals['block'], np.arange(n_props))), shape=(n_blocks, n_props)
+                )
+                master = LinearProgram(
+                    c=np.concatenate([coupling.c, proposals['cost'], np.full(artificial.shape[1], penalty)]),
+                    A=sparse.block_array([
+                        [coupling.A, sparse.csr_array(np.column_stack(proposals['D'])), artificial],
+                        [None, convexity, None],
+                    ], format='csr'),
+                    sense=np.concatenate([coupling.sense, np.full(n_blocks, GRB.EQUAL)]),
+                    rhs=np.concatenate([coupling.rhs, np.ones(n_blocks)]),
+                    lb=np.concatenate([coupling.lb, np.zeros(n_props + artificial.shape[1])]),
+                    ub=np.concatenate([coupling.ub, np.full(n_props + artificial.shape[1], np.inf)]),
+                )
+                z, duals, master_obj = solve_lp(master, settings.SOLVER)
+                pi, mu = duals[:n_coupling], duals[n_coupling:]
+                artificial_use = z[coupling.c.size + n_props:].sum()
+                # The gap is relative to the master objective, or to an objective of one before scaling if smaller
+                objective_size = max(self.obj_scale, abs(master_obj))
+                tolerance = settings.DECOMPOSITION_GAP_TOLERANCE * objective_size
+
+                # Price the blocks, falling back to the master duals if the smoothed duals give no improving solution
+                added = 0
+                for pricing_pi in ([] if best_pi is None else [DUAL_SMOOTHING * best_pi + (1 - DUAL_SMOOTHING) * pi]) + [pi]:
+                    priced = price_blocks(pricing_pi)
+                    pricing_bound = lagrangian_bound(pricing_pi, [obj for _, _, obj in priced])
+                    if pricing_bound > bound:
+                        best_pi, bound = pricing_pi, pricing_bound
+
+                    for b, (x, _, _) in enumerate(priced):
+                        if block_lps[b].c @ x - pi @ (block_D[b] @ x) - mu[b] < -tolerance:
+                            add_proposal(b, x)
+                            added += 1
+                    if added:
+                        break
+
+                gap = (master_obj - bound) / objective_size
+                progress.append({
+                    'time': time.time() - start_time,
+                    'phase': 'decomposition',
+                    'iteration': iteration + 1,
+                    'primal_objective': master_obj,
+                    'dual_objective': bound if np.isfinite(bound) else None,
+                    'primal_infeasibility': artificial_use,
+                    'dual_infeasibility': None,
+                })
+                print(
+                    f"    ...iteration {iteration + 1}: master objective {master_obj:,.4f}, "
+                    f"bound {bound:,.4f}, gap {gap:.2e}", flush=True
+                )
+
+                if gap <= settings.DECOMPOSITION_GAP_TOLERANCE or not added:
+                    if artificial_use <= settings.FEASIBILITY_TOLERANCE:
+                        converged = True
+                        break
+                    if penalty > 1e12:
+                        raise RuntimeError("The decomposed LP is infeasible: the coupling constraints cannot be met")
+                    # The bounds so far are for the lower penalty, so the smoothing starts again
+                    penalty *= 100
+                    best_pi, bound = None, -np.inf
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        # Unless it converged, the decomposition stopped at the iteration limit: the master's combination of the block
+        # solutions is then feasible only if the artificial variables are out of use, and optimal up to the remaining gap
+        feasible = artificial_use <= settings.FEASIBILITY_TOLERANCE
+        if converged:
+            status = 'converged'
+        elif feasible:
+            status = f"stopped at gap {gap:.2e}"
+            print(f"    ...WARNING: stopped after {settings.DECOMPOSITION_MAX_ITERATIONS} iterations with gap {gap:.2e}")
+        else:
+            status = 'infeasible'
+
+        # The solution is the master's combination of the block solutions, unscaled
+        X_sol = np.zeros(self.ncols)
+        X_sol[master_cols] = z[:coupling.c.size]
+        weights = z[coupling.c.size:coupling.c.size + n_props]
+        for b, x, weight in zip(proposals['block'], proposals['x'], weights):
+            if weight > 0:
+                X_sol[block_cols[b]] += weight * x
+        X_sol *= self.col_scale
+
+        # The progress holds the master objective and Lagrangian bound (as a minimisation, of the scaled LP) of every iteration
+        self.telemetry['solves'].append(get_solve_record(
+            status, time.time() - start_time, {}, 0, 0,
+            self.obj_coeffs @ X_sol + self.obj_con if feasible else None, None, None, None, progress,
+        ))
+        if not feasible:
+            raise RuntimeError(
+                f"The decomposition did not find a feasible solution in {settings.DECOMPOSITION_MAX_ITERATIONS} "
+                f"iterations: the coupling constraints are violated by {artificial_use:.2e}"
+            )
+
+        print(
+            f"Completed solve in {time.time() - start_time:.2f}s ({iteration + 1} decomposition iterations, "
+            f"{n_props} block solutions), collecting results...\n",
+            flush=True,
+        )
+        return X_sol, self.obj_coeffs @ X_sol + self.obj_con
@@ -0,0 +1,137 @@
+# Copyright 2022 Fjalar J. de Haan and Brett A. Bryan at Deakin University
+#
+# This file is part of LUTO 2.0.
+#
+# LUTO 2.0 is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# LUTO 2.0 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# LUTO 2.0. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+HiGHS backend for the LUTO solver, for runs without a Gurobi licence.
+"""
+
+import numpy as np
+import highspy
+import luto.settings as settings
+
+from typing import Optional
+from gurobipy import GRB
+
+from luto.solvers.solver import MatrixLutoSolver
+from luto.solvers.telemetry import get_solve_record
+
+
+
+def set_highs_options(highs: highspy.Highs, overrides: Optional[dict] = None):
+    """
+    Maps the Gurobi parameters in `settings` onto their HiGHS equivalents, with the settings in
+    `overrides` ({setting name: value}) changed.
+    """
+    params = {
+        setting: (overrides or {}).get(setting, getattr(settings, setting))
+        for setting in (
+            "VERBOSE", "SOLVE_METHOD", "CROSSOVER", "PRESOLVE", "FEASIBILITY_TOLERANCE",
+            "OPTIMALITY_TOLERANCE", "BARRIER_CONVERGENCE_TOLERANCE", "THREADS",
+        )
+    }
+    highs.setOptionValue("output_flag", params["VERBOSE"] == 1)
+    highs.setOptionValue("solver", {0: "simplex", 1: "simplex", 2: "ipm"}.get(params["SOLVE_METHOD"], "choose"))
+    if params["SOLVE_METHOD"] in (0, 1):
+        highs.setOptionValue("simplex_strategy", 4 if params["SOLVE_METHOD"] == 0 else 1)
+    highs.setOptionValue("run_crossover", "off" if params["CROSSOVER"] == 0 else "on")
+    highs.setOptionValue("presolve", "off" if params["PRESOLVE"] == 0 else "choose")
+    highs.setOptionValue("primal_feasibility_tolerance", params["FEASIBILITY_TOLERANCE"])
+    highs.setOptionValue("dual_feasibility_tolerance", params["OPTIMALITY_TOLERANCE"])
+    highs.setOptionValue("ipm_optimality_tolerance", params["BARRIER_CONVERGENCE_TOLERANCE"])
+    highs.setOptionValue("threads", params["THREADS"])
+
+
+class HighsLutoSolver(MatrixLutoSolver):
+    """
+    Solves the formulation of `LutoSolver` with HiGHS, passing it as one row-wise LP at every solve.
+    """
+
+    def _init_model(self):
+        super()._init_model()
+        self.highs = highspy.Highs()
+        set_highs_options(self.highs)
+
+    def _get_lp(self) -> highspy.HighsLp:
+        """
+        Assembles the formulation into a HiGHS LP.
+        """
+        A, senses, rhs = self.get_lp_rows()
+        obj_coeffs, lb, ub, obj_con = self.get_lp_columns()
+
+        lp = highspy.HighsLp()
+        lp.num_col_ = self.ncols
+        lp.num_row_ = A.shape[0]
+        lp.col_cost_ = obj_coeffs
+        lp.col_lower_ = lb
+        lp.col_upper_ = ub
+        lp.row_lower_ = np.where(senses == GRB.LESS_EQUAL, -highspy.kHighsInf, rhs)
+        lp.row_upper_ = np.where(senses == GRB.GREATER_EQUAL, highspy.kHighsInf, rhs)
+        lp.offset_ = obj_con
+        lp.sense_ = highspy.ObjSense.kMinimize if settings.OBJECTIVE == "mincost" else highspy.ObjSense.kMaximize
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+        lp.a_matrix_.num_col_ = self.ncols
+        lp.a_matrix_.num_row_ = A.shape[0]
+        lp.a_matrix_.start_ = A.indptr
+        lp.a_matrix_.index_ = A.indices
+        lp.a_matrix_.value_ = A.data
+        return lp
+
+    def get_reduced_costs(self) -> np.ndarray:
+        return np.array(self.highs.getSolution().col_dual) / (self.col_scale * self.obj_scale)
+
+    def get_duals(self) -> dict[str, np.ndarray]:
+        row_dual = np.array(self.highs.getSolution().row_dual)
+        families = self.constraint_families.values()
+        row_scale = np.concatenate([family.row_scale for family in families])
+        duals = np.split(row_dual * row_scale / self.obj_scale, np.cumsum([family.rhs.size for family in families])[:-1])
+        return dict(zip(self.constraint_families, duals))
+
+    def _write_model_file(self, path: str) -> np.ndarray:
+        self.highs.passModel(self._get_lp())
+        self.highs.writeModel(path)
+        return np.arange(self.ncols)
+
+    def _optimize(self) -> tuple[np.ndarray, float]:
+        self.highs.passModel(self._get_lp())
+
+        # The run time of a Highs object accumulates over its runs
+        start_time = self.highs.getRunTime()
+        self.highs.run()
+        runtime = self.highs.getRunTime() - start_time
+
+        status = self.highs.getModelStatus()
+        info = self.highs.getInfo()
+        solved = status == highspy.HighsModelStatus.kOptimal
+
+        # HiGHS has no callbacks for the phases of the solve, so only the totals are recorded
+        self.telemetry['solves'].append(get_solve_record(
+            self.highs.modelStatusToString(status), runtime, {}, info.ipm_iteration_count,
+            info.simplex_iteration_count, info.objective_function_value / self.obj_scale if solved else None,
+            info.max_primal_infeasibility, info.max_dual_infeasibility, None, [],
+        ))
+        if not solved:
+            raise RuntimeError(f"HiGHS did not solve the model to optimality: {self.highs.modelStatusToString(status)}")
+
+        print(
+            f"Completed solve in {runtime:.2f}s ({info.simplex_iteration_count:,} simplex and "
+            f"{info.ipm_iteration_count:,} barrier iterations), collecting results...\n",
+            flush=True,
+        )
+        return (
+            np.array(self.highs.getSolution().col_value) * self.col_scale,
+            info.objective_function_value / self.obj_scale,
+        )
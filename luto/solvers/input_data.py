@@ -1,7 +1,10 @@
+import operator
+import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from functools import cached_property
-from typing import Any, Optional
+from typing import Any, Callable, NamedTuple, Optional
 import numpy as np
 
 from luto import settings
@@ -18,13 +21,18 @@ import luto.economics.agricultural.transitions as ag_transition
 import luto.economics.agricultural.water as ag_water
 import luto.economics.agricultural.biodiversity as ag_biodiversity
 
-import luto.economics.non_agricultural.water as non_ag_water
 import luto.economics.non_agricultural.biodiversity as non_ag_biodiversity
-import luto.economics.non_agricultural.cost as non_ag_cost
-import luto.economics.non_agricultural.ghg as non_ag_ghg
-import luto.economics.non_agricultural.quantity as non_ag_quantity
+import luto.economics.non_agricultural.matrices as non_ag_matrices
 import luto.economics.non_agricultural.transitions as non_ag_transition
-import luto.economics.non_agricultural.revenue as non_ag_revenue
+
+
+def lu2cells(x_lr: np.ndarray) -> list[np.ndarray]:
+    """
+    Return, for each row l of the (land use x cell) exclude matrix `x_lr`, the indices of the
+    cells where that land use is allowed, using a single `np.nonzero` over the whole matrix.
+    """
+    lu_idx, cell_idx = np.nonzero(x_lr)
+    return np.split(cell_idx, np.cumsum(np.bincount(lu_idx, minlength=x_lr.shape[0]))[:-1])
 
 
 @dataclass
@@ -71,6 +79,8 @@ class SolverInputData:
     limits: dict                            # Targets to use.
     desc2aglu: dict                         # Map of agricultural land use descriptions to codes.
     resmult: float                          # Resolution factor multiplier from data.RESMULT
+    real_area_r: np.ndarray                 # Area of each cell (ha), from data.REAL_AREA
+    cell_count_r: np.ndarray                # Number of cells each cell stands for: one, or more for super-cells (see luto.solvers.aggregation)
 
     @property
     def n_ag_lms(self):
@@ -125,11 +135,10 @@ class SolverInputData:
     @cached_property
     def ag_lu2cells(self):
         # Make an index of each cell permitted to transform to each land use / land management combination
-        return {
-            (m, j): np.where(self.ag_x_mrj[m, :, j])[0]
-            for j in range(self.n_ag_lus)
-            for m in range(self.n_ag_lms)
-        }
+        return dict(zip(
+            [(m, j) for m in range(self.n_ag_lms) for j in range(self.n_ag_lus)],
+            lu2cells(self.ag_x_mrj.transpose(0, 2, 1).reshape(-1, self.ncells)),
+        ))
 
     @cached_property
     def cells2ag_lu(self) -> dict[int, list[tuple[int, int]]]:
@@ -143,7 +152,7 @@ class SolverInputData:
 
     @cached_property
     def non_ag_lu2cells(self) -> dict[int, np.ndarray]:
-        return {k: np.where(self.non_ag_x_rk[:, k])[0] for k in range(self.n_non_ag_lus)}
+        return dict(enumerate(lu2cells(self.non_ag_x_rk.T)))
 
     @cached_property
     def cells2non_ag_lu(self) -> dict[int, list[int]]:
@@ -154,46 +163,139 @@ class SolverInputData:
                 cells2non_ag_lu[r].append(k)
 
         return dict(cells2non_ag_lu) 
-    
+
+
+# Solver inputs are classified by what triggers their recalculation between timeseries steps:
+#   - run-invariant:    depend only on the loaded Data; calculated once and reused for every step.
+#   - lumap-dependent:  depend on the base year land-use map but not on the target year; reused
+#                       for as long as the base year land-use map is unchanged.
+#   - year-dependent:   depend on the target year (price/cost/yield multipliers, climate change
+#                       impacts, carbon prices, base year dvars, etc.); recalculated every step.
+# Only the first two groups are listed; every other input in SolverInputData is year-dependent. Year-dependent
+# inputs that depend on nothing but the target year are listed in TARGET_YEAR_INPUTS below and can be
+# precomputed for a batch of upcoming target years with `precompute_target_year_inputs`.
+RUN_INVARIANT_INPUTS = (
+    'ag_b_mrj',                             # Biodiversity scores do not change with year
+    'ag_wyield_hist_mrj',                   # Water yield part of ag_w_mrj based on historical water yield layers
+    'non_ag_t_rk',                          # No transition costs between non-agricultural land uses
+    'water_yield_outside_study_area',       # Historical water yield from outside LUTO study area
+    'water_yield_RR_BASE_YR',               # Water net yield for the BASE_YR
+    'economic_BASE_YR_prices',              # Median commodity prices of the BASE_YR
+)
+
+# Map of lumap-dependent input to the axis indexing cells. Inputs whose getter accepts a `cells` argument
+# are patched row by row for the cells whose land-use or land management changed; the others (cell axis
+# None) are recalculated in full.
+LUMAP_DEPENDENT_INPUTS = {
+    'ag_x_mrj': 1,                          # Exclude matrices before land use culling (culling depends on the year)
+    'ag_ghg_t_mrj': 1,                      # GHG emissions released by transitions from the base year land-use
+    'ag_t_base_mrj': 1,                     # Transition matrices before the year-dependent multipliers are applied
+    'non_ag_b_rk': None,                    # Depends on ag_b_mrj and the base year land-use only
+}
+
+# Recalculate lumap-dependent inputs in full instead of patching them if more than this share of cells changed
+MAX_SHARE_OF_CHANGED_CELLS_TO_PATCH = 0.5
+
+
+def get_run_invariant_input(data: Data, name: str, get_func: Callable, *args):
+    """
+    Return the run-invariant solver input `name`. It is calculated by `get_func(data, *args)`
+    the first time it is requested and reused from `data.SOLVER_INPUT_CACHE` afterwards.
+    """
+    if name not in RUN_INVARIANT_INPUTS:
+        raise KeyError(f"'{name}' is not a run-invariant solver input.")
+
+    if name not in data.SOLVER_INPUT_CACHE:
+        data.SOLVER_INPUT_CACHE[name] = get_func(data, *args)
+    return data.SOLVER_INPUT_CACHE[name]
+
+
+def get_lumap_dependent_input(data: Data, name: str, base_year: int, get_func: Callable, *args):
+    """
+    Return the lumap-dependent solver input `name` for the land-use and land management maps of `base_year`.
+
+    The input is calculated by `get_func(data, *args)` the first time it is requested. Afterwards, only the
+    rows of cells whose land-use or land management changed since the cached copy are recalculated by
+    `get_func(data, *args, cells=changed_cells)` and patched into a copy of the cached input. Inputs
+    that can not be patched, or where most cells changed, are recalculated in full.
+    """
+    if name not in LUMAP_DEPENDENT_INPUTS:
+        raise KeyError(f"'{name}' is not a lumap-dependent solver input.")
+
+    lumap = data.lumaps[base_year]
+    lmmap = data.lmmaps[base_year]
+    cell_axis = LUMAP_DEPENDENT_INPUTS[name]
+    cached = data.SOLVER_INPUT_CACHE.get(name)
+
+    if cached is None:
+        output = get_func(data, *args)
+    else:
+        cached_lumap, cached_lmmap, output = cached
+        changed_cells = np.flatnonzero((cached_lumap != lumap) | (cached_lmmap != lmmap))
+
+        if changed_cells.size == 0:
+            return output
+        elif cell_axis is None or changed_cells.size > MAX_SHARE_OF_CHANGED_CELLS_TO_PATCH * lumap.size:
+            output = get_func(data, *args)
+        else:
+            output = patch_cell_rows(output, get_func(data, *args, cells=changed_cells), changed_cells, cell_axis)
+
+    data.SOLVER_INPUT_CACHE[name] = (lumap.copy(), lmmap.copy(), output)
+    return output
+
+
+def patch_cell_rows(arr: np.ndarray|dict, rows: np.ndarray|dict, cells: np.ndarray, cell_axis: int) -> np.ndarray|dict:
+    """
+    Return a copy of `arr` (or of each array in the dict `arr`) with the entries of `cells`
+    along `cell_axis` replaced by `rows`.
+    """
+    if isinstance(arr, dict):
+        return {key: patch_cell_rows(arr[key], rows[key], cells, cell_axis) for key in arr}
+
+    arr = arr.copy()
+    arr[(slice(None),) * cell_axis + (cells,)] = rows
+    return arr
+
+
 def get_ag_c_mrj(data: Data, target_index):
     print('Getting agricultural cost matrices...', flush = True)
     output = ag_cost.get_cost_matrices(data, target_index)
     return output.astype(np.float32)
 
 
-def get_non_ag_c_rk(data: Data, ag_c_mrj: np.ndarray, lumap: np.ndarray, target_year):
-    print('Getting non-agricultural cost matrices...', flush = True)
-    output = non_ag_cost.get_cost_matrix(data, ag_c_mrj, lumap, target_year)
-    return output.astype(np.float32)
-
-
 def get_ag_r_mrj(data: Data, target_index):
     print('Getting agricultural revenue matrices...', flush = True)
     output = ag_revenue.get_rev_matrices(data, target_index)
     return output.astype(np.float32)
 
 
-def get_non_ag_r_rk(data: Data, ag_r_mrj: np.ndarray, base_year: int, target_year: int):
-    print('Getting non-agricultural revenue matrices...', flush = True)
-    output = non_ag_revenue.get_rev_matrix(data, target_year, ag_r_mrj, data.lumaps[base_year])
-    return output.astype(np.float32)
-
-
 def get_ag_g_mrj(data: Data, target_index):
     print('Getting agricultural GHG emissions matrices...', flush = True)
     output = ag_ghg.get_ghg_matrices(data, target_index)
     return output.astype(np.float32)
 
 
-def get_non_ag_g_rk(data: Data, ag_g_mrj, base_year):
-    print('Getting non-agricultural GHG emissions matrices...', flush = True)
-    output = non_ag_ghg.get_ghg_matrix(data, ag_g_mrj, data.lumaps[base_year])
+def get_ag_w_mrj(data: Data, target_index, water_dr_yield: Optional[np.ndarray] = None, water_sr_yield: Optional[np.ndarray] = None):
+    print('Getting agricultural water net yield matrices based on historical water yield layers ...', flush = True)
+    output = ag_water.get_water_net_yield_matrices(data, target_index, water_dr_yield, water_sr_yield)
     return output.astype(np.float32)
 
 
-def get_ag_w_mrj(data: Data, target_index, water_dr_yield: Optional[np.ndarray] = None, water_sr_yield: Optional[np.ndarray] = None):
+def get_ag_wyield_hist_mrj(data: Data):
+    print('Getting agricultural water yield matrices based on historical water yield layers...', flush = True)
+    output = ag_water.get_wyield_matrices(data, 0, data.WATER_YIELD_HIST_DR, data.WATER_YIELD_HIST_SR)
+    return output.astype(np.float32)
+
+
+def get_ag_wreq_mrj(data: Data, target_index):
+    print('Getting agricultural water requirement matrices...', flush = True)
+    output = ag_water.get_wreq_matrices(data, target_index)
+    return output.astype(np.float32)
+
+
+def get_ag_w_mrj_from_hist_yield(ag_wyield_hist_mrj: np.ndarray, ag_wreq_mrj: np.ndarray):
     print('Getting agricultural water net yield matrices based on historical water yield layers ...', flush = True)
-    output = ag_water.get_water_net_yield_matrices(data, target_index, water_dr_yield, water_sr_yield)
+    output = ag_wyield_hist_mrj - ag_wreq_mrj
     return output.astype(np.float32)
 
 
@@ -212,20 +314,6 @@ def get_ag_b_mrj(data: Data):
     return output.astype(np.float32)
 
 
-def get_non_ag_w_rk(
-    data: Data, 
-    ag_w_mrj: np.ndarray, 
-    base_year, 
-    target_year, 
-    water_dr_yield: Optional[np.ndarray] = None, 
-    water_sr_yield: Optional[np.ndarray] = None
-    ):
-    print('Getting non-agricultural water requirement matrices...', flush = True)
-    yr_idx = target_year - data.YR_CAL_BASE
-    output = non_ag_water.get_w_net_yield_matrix(data, ag_w_mrj, data.lumaps[base_year], yr_idx, water_dr_yield, water_sr_yield)
-    return output.astype(np.float32)
-
-
 def get_non_ag_b_rk(data: Data, ag_b_mrj: np.ndarray, base_year):
     print('Getting non-agricultural biodiversity requirement matrices...', flush = True)
     output = non_ag_biodiversity.get_breq_matrix(data, ag_b_mrj, data.lumaps[base_year])
@@ -238,25 +326,49 @@ def get_ag_q_mrp(data: Data, target_index):
     return output.astype(np.float32)
 
 
-def get_non_ag_q_crk(data: Data, ag_q_mrp: np.ndarray, base_year: int):
-    print('Getting non-agricultural production quantity matrices...', flush = True)
-    output = non_ag_quantity.get_quantity_matrix(data, ag_q_mrp, data.lumaps[base_year])
-    return output.astype(np.float32)
+def get_non_ag_matrices(
+    data: Data,
+    base_year: int,
+    target_year: int,
+    ag_c_mrj: np.ndarray,
+    ag_r_mrj: np.ndarray,
+    ag_g_mrj: np.ndarray,
+    ag_w_mrj: np.ndarray,
+    ag_q_mrp: np.ndarray,
+):
+    print('Getting non-agricultural cost, revenue, GHG emissions, water net yield and production quantity matrices...', flush = True)
+    ag_matrices = {'ag_c_mrj': ag_c_mrj, 'ag_r_mrj': ag_r_mrj, 'ag_g_mrj': ag_g_mrj, 'ag_w_mrj': ag_w_mrj, 'ag_q_mrp': ag_q_mrp}
+    output = non_ag_matrices.get_non_ag_matrices(
+        data,
+        target_year - data.YR_CAL_BASE,
+        data.lumaps[base_year],
+        ag_matrices,
+        data.WATER_YIELD_HIST_DR,                   # Non-ag water net yields are based on historical water yield layers
+        data.WATER_YIELD_HIST_SR,
+    )
+    return {name: matrix.astype(np.float32) for name, matrix in output.items()}
 
 
-def get_ag_ghg_t_mrj(data: Data, base_year):
+def get_ag_ghg_t_mrj(data: Data, base_year, cells: Optional[np.ndarray] = None):
     print('Getting agricultural transitions GHG emissions...', flush = True)
-    output = ag_ghg.get_ghg_transition_penalties(data, data.lumaps[base_year])
+    output = ag_ghg.get_ghg_transition_penalties(data, data.lumaps[base_year], cells)
     return output.astype(np.float32)
 
 
+def get_ag_t_base_mrj(data: Data, base_year, cells: Optional[np.ndarray] = None):
+    print('Getting agricultural transition base matrices...', flush = True)
+    return ag_transition.get_transition_base_matrices(data, data.lumaps[base_year], data.lmmaps[base_year], cells)
+
+
 def get_ag_t_mrj(data: Data, target_index, base_year):
     print('Getting agricultural transition cost matrices...', flush = True)
     
+    # Only the lumap-dependent part is reused; the multipliers and water license costs change every year
     ag_t_mrj = ag_transition.get_transition_matrices(
         data, 
         target_index, 
-        base_year
+        base_year,
+        base_matrices=get_lumap_dependent_input(data, 'ag_t_base_mrj', base_year, get_ag_t_base_mrj, base_year),
     ).astype(np.float32)
     # Transition costs occures if the base year is not the target year
     return ag_t_mrj if (base_year - data.YR_CAL_BASE != target_index) else np.zeros_like(ag_t_mrj)
@@ -292,9 +404,9 @@ def get_non_ag_t_rk(data: Data, base_year):
     return output.astype(np.float32)
 
 
-def get_ag_x_mrj(data: Data, base_year):
+def get_ag_x_mrj(data: Data, base_year, cells: Optional[np.ndarray] = None):
     print('Getting agricultural exclude matrices...', flush = True)
-    output = ag_transition.get_exclude_matrices(data, data.lumaps[base_year])
+    output = ag_transition.get_exclude_matrices(data, data.lumaps[base_year], cells)
     return output
 
 
@@ -445,6 +557,7 @@ def get_commodity_prices(data: Data) -> np.ndarray:
     Get the prices of commodities in the base year. These prices will be used as multiplier
     to weight deviatios of commodity production from the target.
     '''
+    print('Getting base year commodity prices...', flush = True)
     
     commodity_lookup = {
         ('P1','BEEF'): 'beef meat',
@@ -488,6 +601,7 @@ def get_limits(
     limits = {}
 
     limits['water'] = ag_water.get_water_net_yield_limit_values(data)
+    limits['water_region_matrix'] = ag_water.get_water_region_matrix(data)[1]
 
     if settings.GHG_EMISSIONS_LIMITS == 'on':
         limits['ghg_ub'] = ag_ghg.get_ghg_limits(data, yr_cal)
@@ -503,90 +617,225 @@ def get_limits(
     return limits
 
 
+class InputRef(NamedTuple):
+    """
+    Placeholder for the output of another task in `run_input_tasks`, used as a task argument.
+    """
+    name: str
+
+
+def run_input_tasks(tasks: dict[str, tuple[Callable, tuple]], n_threads: int) -> tuple[dict[str, Any], dict[str, float]]:
+    """
+    Run the solver input tasks on a thread pool and return their outputs and timings.
+
+    Parameters:
+    - tasks: Map of task name to (function, arguments). Arguments given as `InputRef(name)` are
+      replaced by the output of the named task, which must appear earlier in `tasks`.
+    - n_threads: Number of worker threads (1 runs the tasks sequentially in the given order).
+
+    Returns:
+    - outputs: Map of task name to its output.
+    - timings: Map of task name to its run time in seconds, excluding time spent waiting on dependencies.
+
+    Notes:
+        Tasks are started in the order given. Because a task's dependencies are always submitted before
+        it, they have already been started when the task waits on them, so the pool cannot deadlock.
+    """
+    futures = {}
+    timings = {}
+
+    def run_task(name, func, args):
+        args = [futures[arg.name].result() if isinstance(arg, InputRef) else arg for arg in args]
+        start_time = time.time()
+        output = func(*args)
+        timings[name] = time.time() - start_time
+        return output
+
+    with ThreadPoolExecutor(max_workers=max(n_threads, 1)) as pool:
+        for name, (func, args) in tasks.items():
+            if not all(arg.name in futures for arg in args if isinstance(arg, InputRef)):
+                raise ValueError(f"Task '{name}' depends on a task that is not defined before it.")
+            futures[name] = pool.submit(run_task, name, func, args)
+
+        outputs = {name: future.result() for name, future in futures.items()}
+
+    return outputs, timings
+
+
+def get_ag_x_mrj_culled(data: Data, base_year: int, ag_c_mrj: np.ndarray, ag_t_mrj: np.ndarray, ag_r_mrj: np.ndarray):
+    # Copy the cached exclude matrices because the land use culling modifies them in place
+    ag_x_mrj = get_lumap_dependent_input(data, 'ag_x_mrj', base_year, get_ag_x_mrj, base_year).copy()
+    land_use_culling.apply_agricultural_land_use_culling(ag_x_mrj, ag_c_mrj, ag_t_mrj, ag_r_mrj)
+    return ag_x_mrj
+
+
+def get_ag_matrices(data: Data, target_index) -> dict[str, np.ndarray]:
+    """
+    Return the agricultural quantity, cost, revenue, GHG and water requirement matrices of `target_index`.
+
+    The matrices are built together within `ag_quantity.shared_yields`, so the livestock yield potentials
+    and crop quantities (and their climate change impacts) are evaluated once per (lu, lm) and shared by
+    all five builders.
+    """
+    with ag_quantity.shared_yields(data, target_index):
+        return {
+            'ag_q_mrp': get_ag_q_mrp(data, target_index),
+            'ag_c_mrj': get_ag_c_mrj(data, target_index),
+            'ag_r_mrj': get_ag_r_mrj(data, target_index),
+            'ag_g_mrj': get_ag_g_mrj(data, target_index),
+            'ag_wreq_mrj': get_ag_wreq_mrj(data, target_index),
+        }
+
+
+# Map of inputs that only depend on the target year to their getter `get_func(data, target_index)`.
+TARGET_YEAR_INPUTS = {
+    'ag_matrices': get_ag_matrices,
+}
+
+
+def precompute_target_year_inputs(data: Data, target_years: list[int], pool: ThreadPoolExecutor):
+    """
+    Submit the calculation of all TARGET_YEAR_INPUTS for each of `target_years` to `pool`.
+
+    The futures are stored in `data.PRECOMPUTED_INPUTS` by (name, target_year) and handed over
+    to `get_input_data` when the year is solved. Years already submitted are skipped.
+    """
+    for target_year in target_years:
+        for name, get_func in TARGET_YEAR_INPUTS.items():
+            if (name, target_year) not in data.PRECOMPUTED_INPUTS:
+                data.PRECOMPUTED_INPUTS[name, target_year] = pool.submit(get_func, data, target_year - data.YR_CAL_BASE)
+
+
+def get_target_year_input(data: Data, name: str, target_year: int):
+    """
+    Return the input `name` for `target_year`, taken from the precomputed inputs if it was submitted
+    by `precompute_target_year_inputs` (waiting for it if it is still running), or calculated now otherwise.
+    """
+    future = data.PRECOMPUTED_INPUTS.pop((name, target_year), None)
+    if future is not None:
+        return future.result()
+    return TARGET_YEAR_INPUTS[name](data, target_year - data.YR_CAL_BASE)
+
+
 def get_input_data(data: Data, base_year: int, target_year: int) -> SolverInputData:
     """
     Using the given Data object, prepare a SolverInputData object for the solver.
-    """
 
+    Independent matrices are calculated concurrently on `settings.INPUT_DATA_THREADS` threads.
+    """
+    start_time = time.time()
     target_index = target_year - data.YR_CAL_BASE
     
-    ag_c_mrj = get_ag_c_mrj(data, target_index)
-    ag_r_mrj = get_ag_r_mrj(data, target_index)
-    ag_t_mrj = get_ag_t_mrj(data, target_index, base_year)
-    ag_to_non_ag_t_rk = get_ag_to_non_ag_t_rk(data, target_index, base_year)
-    
-    non_ag_c_rk = get_non_ag_c_rk(data, ag_c_mrj, data.lumaps[base_year], target_year)
-    non_ag_r_rk = get_non_ag_r_rk(data, ag_r_mrj, base_year, target_year)
-    non_ag_t_rk = get_non_ag_t_rk(data, base_year)
-    non_ag_to_ag_t_mrj = get_non_ag_to_ag_t_mrj(data, base_year, target_index)
-    
-    ag_man_c_mrj = get_ag_man_c_mrj(data, target_index, ag_c_mrj)
-    ag_man_r_mrj = get_ag_man_r_mrj(data, target_index, ag_r_mrj)
-    ag_man_t_mrj = get_ag_man_t_mrj(data, target_index, ag_t_mrj)
-    
-    ag_obj_mrj, non_ag_obj_rk,  ag_man_objs=get_economic_mrj(
-        ag_c_mrj,
-        ag_r_mrj,
-        ag_t_mrj,
-        ag_to_non_ag_t_rk,
-        non_ag_c_rk,
-        non_ag_r_rk,
-        non_ag_t_rk,
-        non_ag_to_ag_t_mrj,
-        ag_man_c_mrj,
-        ag_man_r_mrj,
-        ag_man_t_mrj
-    )
-    
-    economic_base_sum = get_base_yr_economy_sum(data, base_year, ag_obj_mrj, non_ag_obj_rk,  ag_man_objs)
+    # Each task is `name: (function, arguments)`; InputRef(name) arguments are outputs of earlier tasks.
+    tasks = {
+        # Agricultural quantity, cost, revenue, GHG and water requirement matrices from shared yields
+        'ag_matrices': (get_target_year_input, (data, 'ag_matrices', target_year)),
+        'ag_c_mrj': (operator.getitem, (InputRef('ag_matrices'), 'ag_c_mrj')),
+        'ag_r_mrj': (operator.getitem, (InputRef('ag_matrices'), 'ag_r_mrj')),
+        'ag_g_mrj': (operator.getitem, (InputRef('ag_matrices'), 'ag_g_mrj')),
+        'ag_q_mrp': (operator.getitem, (InputRef('ag_matrices'), 'ag_q_mrp')),
+        'ag_wreq_mrj': (operator.getitem, (InputRef('ag_matrices'), 'ag_wreq_mrj')),
+        'ag_wyield_hist_mrj': (get_run_invariant_input, (data, 'ag_wyield_hist_mrj', get_ag_wyield_hist_mrj)),
+        'ag_w_mrj': (get_ag_w_mrj_from_hist_yield, (InputRef('ag_wyield_hist_mrj'), InputRef('ag_wreq_mrj'))),     # Calculate water net yield matrices based on historical water yield layers
+
+        # Non-agricultural cost, revenue, GHG, water and quantity matrices from shared exclusions
+        'non_ag_matrices': (get_non_ag_matrices, (data, base_year, target_year, *(InputRef(name) for name in (
+            'ag_c_mrj', 'ag_r_mrj', 'ag_g_mrj', 'ag_w_mrj', 'ag_q_mrp'
+        )))),
+
+        # Economic matrices
+        'ag_t_mrj': (get_ag_t_mrj, (data, target_index, base_year)),
+        'ag_to_non_ag_t_rk': (get_ag_to_non_ag_t_rk, (data, target_index, base_year)),
+        'non_ag_t_rk': (get_run_invariant_input, (data, 'non_ag_t_rk', get_non_ag_t_rk, base_year)),
+        'non_ag_to_ag_t_mrj': (get_non_ag_to_ag_t_mrj, (data, base_year, target_index)),
+        'ag_man_c_mrj': (get_ag_man_c_mrj, (data, target_index, InputRef('ag_c_mrj'))),
+        'ag_man_r_mrj': (get_ag_man_r_mrj, (data, target_index, InputRef('ag_r_mrj'))),
+        'ag_man_t_mrj': (get_ag_man_t_mrj, (data, target_index, InputRef('ag_t_mrj'))),
+        'non_ag_c_rk': (operator.getitem, (InputRef('non_ag_matrices'), 'non_ag_c_rk')),
+        'non_ag_r_rk': (operator.getitem, (InputRef('non_ag_matrices'), 'non_ag_r_rk')),
+        'economic_contr_mrj': (get_economic_mrj, tuple(InputRef(name) for name in (
+            'ag_c_mrj', 'ag_r_mrj', 'ag_t_mrj', 'ag_to_non_ag_t_rk', 'non_ag_c_rk', 'non_ag_r_rk',
+            'non_ag_t_rk', 'non_ag_to_ag_t_mrj', 'ag_man_c_mrj', 'ag_man_r_mrj', 'ag_man_t_mrj'
+        ))),
+        'economic_base_sum': (
+            lambda economic_contr_mrj: get_base_yr_economy_sum(data, base_year, *economic_contr_mrj),
+            (InputRef('economic_contr_mrj'),)
+        ),
+
+        # Agricultural matrices
+        'ag_b_mrj': (get_run_invariant_input, (data, 'ag_b_mrj', get_ag_b_mrj)),
+        'ag_x_mrj': (get_ag_x_mrj_culled, (data, base_year, InputRef('ag_c_mrj'), InputRef('ag_t_mrj'), InputRef('ag_r_mrj'))),
+        'ag_ghg_t_mrj': (get_lumap_dependent_input, (data, 'ag_ghg_t_mrj', base_year, get_ag_ghg_t_mrj, base_year)),
+
+        # Non-agricultural matrices
+        'non_ag_g_rk': (operator.getitem, (InputRef('non_ag_matrices'), 'non_ag_g_rk')),
+        'non_ag_w_rk': (operator.getitem, (InputRef('non_ag_matrices'), 'non_ag_w_rk')),
+        'non_ag_b_rk': (get_lumap_dependent_input, (data, 'non_ag_b_rk', base_year, get_non_ag_b_rk, InputRef('ag_b_mrj'), base_year)),
+        'non_ag_x_rk': (get_non_ag_x_rk, (data, InputRef('ag_x_mrj'), base_year)),
+        'non_ag_q_crk': (operator.getitem, (InputRef('non_ag_matrices'), 'non_ag_q_crk')),
+        'non_ag_lb_rk': (get_non_ag_lb_rk, (data, base_year)),
+
+        # Agricultural management matrices
+        'ag_man_g_mrj': (get_ag_man_g_mrj, (data, target_index, InputRef('ag_g_mrj'))),
+        'ag_man_q_mrp': (get_ag_man_q_mrj, (data, target_index, InputRef('ag_q_mrp'))),
+        'ag_man_w_mrj': (get_ag_man_w_mrj, (data, target_index)),
+        'ag_man_b_mrj': (get_ag_man_b_mrj, (data, target_index, InputRef('ag_b_mrj'))),
+        'ag_man_limits': (get_ag_man_limits, (data, target_index)),
+        'ag_man_lb_mrj': (get_ag_man_lb_mrj, (data, base_year)),
+
+        # Water yields, prices and limits
+        'water_yield_outside_study_area': (get_run_invariant_input, (data, 'water_yield_outside_study_area', get_w_outside_luto, data.YR_CAL_BASE)),  # Use the water net yield outside LUTO study area for the YR_CAL_BASE year
+        'water_yield_RR_BASE_YR': (get_run_invariant_input, (data, 'water_yield_RR_BASE_YR', get_w_RR_BASE_YR)),                                     # Calculate water net yield for the BASE_YR (2010) based on historical water yield layers
+        'economic_BASE_YR_prices': (get_run_invariant_input, (data, 'economic_BASE_YR_prices', get_commodity_prices)),
+        'economic_target_yr_carbon_price': (get_target_yr_carbon_price, (data, target_year)),
+        'limits': (get_limits, (data, target_year)),
+    }
 
-    ag_g_mrj = get_ag_g_mrj(data, target_index)
-    ag_q_mrp = get_ag_q_mrp(data, target_index)
-    ag_w_mrj = get_ag_w_mrj(data, target_index, data.WATER_YIELD_HIST_DR, data.WATER_YIELD_HIST_SR)     # Calculate water net yield matrices based on historical water yield layers
-    ag_b_mrj = get_ag_b_mrj(data)
-    ag_x_mrj = get_ag_x_mrj(data, base_year)
+    outputs, timings = run_input_tasks(tasks, settings.INPUT_DATA_THREADS)
 
-    land_use_culling.apply_agricultural_land_use_culling(
-        ag_x_mrj, ag_c_mrj, ag_t_mrj, ag_r_mrj
-    )
+    print(f'Solver input data prepared in {time.time() - start_time:.1f} seconds. Time per matrix (seconds):', flush = True)
+    for name, seconds in sorted(timings.items(), key=lambda item: item[1], reverse=True):
+        print(f'    {name:<35}{seconds:>8.2f}', flush = True)
 
     return SolverInputData(
         base_year=base_year,
         target_year=target_year,
         
-        ag_g_mrj=ag_g_mrj,
-        ag_w_mrj=ag_w_mrj,
-        ag_b_mrj=ag_b_mrj,
-        ag_x_mrj=ag_x_mrj,
-        ag_q_mrp=ag_q_mrp,
+        ag_g_mrj=outputs['ag_g_mrj'],
+        ag_w_mrj=outputs['ag_w_mrj'],
+        ag_b_mrj=outputs['ag_b_mrj'],
+        ag_x_mrj=outputs['ag_x_mrj'],
+        ag_q_mrp=outputs['ag_q_mrp'],
         
-        ag_ghg_t_mrj=get_ag_ghg_t_mrj(data, base_year),
-        non_ag_g_rk=get_non_ag_g_rk(data, ag_g_mrj, base_year),
-        non_ag_w_rk=get_non_ag_w_rk(data, ag_w_mrj, base_year, target_year, data.WATER_YIELD_HIST_DR, data.WATER_YIELD_HIST_SR),  # Calculate non-ag water requirement matrices based on historical water yield layers
-        non_ag_b_rk=get_non_ag_b_rk(data, ag_b_mrj, base_year),
-        non_ag_x_rk=get_non_ag_x_rk(data, ag_x_mrj, base_year),
-        non_ag_q_crk=get_non_ag_q_crk(data, ag_q_mrp, base_year),
-        non_ag_lb_rk=get_non_ag_lb_rk(data, base_year),
+        ag_ghg_t_mrj=outputs['ag_ghg_t_mrj'],
+        non_ag_g_rk=outputs['non_ag_g_rk'],
+        non_ag_w_rk=outputs['non_ag_w_rk'],
+        non_ag_b_rk=outputs['non_ag_b_rk'],
+        non_ag_x_rk=outputs['non_ag_x_rk'],
+        non_ag_q_crk=outputs['non_ag_q_crk'],
+        non_ag_lb_rk=outputs['non_ag_lb_rk'],
         
-        ag_man_g_mrj=get_ag_man_g_mrj(data, target_index, ag_g_mrj),
-        ag_man_q_mrp=get_ag_man_q_mrj(data, target_index, ag_q_mrp),
-        ag_man_w_mrj=get_ag_man_w_mrj(data, target_index),
-        ag_man_b_mrj=get_ag_man_b_mrj(data, target_index, ag_b_mrj),
-        ag_man_limits=get_ag_man_limits(data, target_index),                            
-        ag_man_lb_mrj=get_ag_man_lb_mrj(data, base_year),
+        ag_man_g_mrj=outputs['ag_man_g_mrj'],
+        ag_man_q_mrp=outputs['ag_man_q_mrp'],
+        ag_man_w_mrj=outputs['ag_man_w_mrj'],
+        ag_man_b_mrj=outputs['ag_man_b_mrj'],
+        ag_man_limits=outputs['ag_man_limits'],                            
+        ag_man_lb_mrj=outputs['ag_man_lb_mrj'],
         
-        water_yield_outside_study_area=get_w_outside_luto(data, data.YR_CAL_BASE),      # Use the water net yield outside LUTO study area for the YR_CAL_BASE year
-        water_yield_RR_BASE_YR=get_w_RR_BASE_YR(data),                                  # Calculate water net yield for the BASE_YR (2010) based on historical water yield layers
+        water_yield_outside_study_area=outputs['water_yield_outside_study_area'],
+        water_yield_RR_BASE_YR=outputs['water_yield_RR_BASE_YR'],
         
-        economic_contr_mrj=(ag_obj_mrj, non_ag_obj_rk,  ag_man_objs),
-        economic_base_sum=economic_base_sum,
-        economic_BASE_YR_prices=get_commodity_prices(data),
-        economic_target_yr_carbon_price=get_target_yr_carbon_price(data, target_year), 
+        economic_contr_mrj=tuple(outputs['economic_contr_mrj']),
+        economic_base_sum=outputs['economic_base_sum'],
+        economic_BASE_YR_prices=outputs['economic_BASE_YR_prices'],
+        economic_target_yr_carbon_price=outputs['economic_target_yr_carbon_price'], 
         
         offland_ghg=data.OFF_LAND_GHG_EMISSION_C[target_index],
         lu2pr_pj=data.LU2PR,
         pr2cm_cp=data.PR2CM,
-        limits=get_limits(data, target_year),
+        limits=outputs['limits'],
         desc2aglu=data.DESC2AGLU,
         resmult=data.RESMULT,
+        real_area_r=data.REAL_AREA,
+        cell_count_r=np.ones(data.NCELLS),
     )
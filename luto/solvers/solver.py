@@ -18,38 +18,71 @@
 Provides minimalist Solver class and pure helper functions.
 """
 
+import os
+import json
+import time
 import numpy as np
 import gurobipy as gp
+from scipy import sparse
 import luto.settings as settings
 
-from collections import defaultdict
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from typing import Optional
 from gurobipy import GRB
 
 from luto import tools
 from luto.solvers.input_data import SolverInputData
-from luto.settings import AG_MANAGEMENTS, AG_MANAGEMENTS_REVERSIBLE
+from luto.solvers.telemetry import GurobiTelemetryCallback
+from luto.settings import AG_MANAGEMENTS_REVERSIBLE
 from luto.ag_managements import AG_MANAGEMENTS_TO_LAND_USES
 from luto.settings import NON_AG_LAND_USES, NON_AG_LAND_USES_REVERSIBLE
 
 
 
-# Set Gurobi environment.
-gurenv = gp.Env(logfilename="gurobi.log", empty=True)  # (empty = True)
-gurenv.setParam("Method", settings.SOLVE_METHOD)
-gurenv.setParam("OutputFlag", settings.VERBOSE)
-gurenv.setParam("Presolve", settings.PRESOLVE)
-gurenv.setParam("Aggregate", settings.AGGREGATE)
-gurenv.setParam("OptimalityTol", settings.OPTIMALITY_TOLERANCE)
-gurenv.setParam("FeasibilityTol", settings.FEASIBILITY_TOLERANCE)
-gurenv.setParam("BarConvTol", settings.BARRIER_CONVERGENCE_TOLERANCE)
-gurenv.setParam("ScaleFlag", settings.SCALE_FLAG)
-gurenv.setParam("NumericFocus", settings.NUMERIC_FOCUS)
-gurenv.setParam("Threads", settings.THREADS)
-gurenv.setParam("BarHomogeneous", settings.BARHOMOGENOUS)
-gurenv.setParam("Crossover", settings.CROSSOVER)
-gurenv.start()
+# Gurobi parameters and the settings they are taken from
+GUROBI_PARAMS = {
+    "Method": "SOLVE_METHOD",
+    "OutputFlag": "VERBOSE",
+    "Presolve": "PRESOLVE",
+    "Aggregate": "AGGREGATE",
+    "OptimalityTol": "OPTIMALITY_TOLERANCE",
+    "FeasibilityTol": "FEASIBILITY_TOLERANCE",
+    "BarConvTol": "BARRIER_CONVERGENCE_TOLERANCE",
+    "ScaleFlag": "SCALE_FLAG",
+    "NumericFocus": "NUMERIC_FOCUS",
+    "Threads": "THREADS",
+    "BarHomogeneous": "BARHOMOGENOUS",
+    "Crossover": "CROSSOVER",
+}
+
+# Gurobi environment, started on first use so that runs with the HiGHS backend do not need a Gurobi licence
+gurenv = None
+
+
+def get_gurobi_env(overrides: Optional[dict] = None, logfilename: str = "gurobi.log") -> gp.Env:
+    """
+    Return the Gurobi environment, starting it with the parameters in `settings` on first use.
+    With `overrides` ({setting name: value}), a new environment is started with those settings changed.
+    """
+    global gurenv
+    if gurenv is not None and overrides is None:
+        return gurenv
+
+    env = gp.Env(logfilename=logfilename, empty=True)  # (empty = True)
+    for param, setting in GUROBI_PARAMS.items():
+        env.setParam(param, (overrides or {}).get(setting, getattr(settings, setting)))
+    env.start()
+
+    if overrides is None:
+        gurenv = env
+    return env
+
+# Land management names used in the names of the decision variables
+LM_NAMES = ('dry', 'irr')
+
+# When a constraint family is updated in place, its changed coefficients are set one by one with `chgCoeff` if they are
+# at most this share of the family's nonzeros; otherwise the rows of the family are removed and re-added in one call.
+MAX_CHGCOEFF_SHARE = 0.01
 
 
 @dataclass
@@ -64,9 +97,107 @@ class SolverSolution:
     obj_val: dict[str, float]
 
 
+@dataclass
+class VarFamily:
+    """
+    A family of decision variables over a flattened index set. The variables occupy the contiguous
+    block `cols` of `LutoSolver.X`, and the index of each variable is held in the parallel arrays below.
+    """
+    cols: slice                             # Position of the family in `LutoSolver.X`
+    r: np.ndarray                           # Cell of each variable
+    m: Optional[np.ndarray] = None          # Land management of each variable (agricultural families only)
+    j: Optional[np.ndarray] = None          # Agricultural land use of each variable (agricultural families only)
+    j_idx: Optional[np.ndarray] = None      # Position of `j` in `am2j[am]` (agricultural management families only)
+    k: Optional[np.ndarray] = None          # Non-agricultural land use of each variable (non-agricultural family only)
+
+    @property
+    def size(self):
+        return self.r.shape[0]
+
+    @property
+    def col_idx(self):
+        return np.arange(self.cols.start, self.cols.stop)
+
+    def get_keys(self, n_lus: int, ncells: int) -> np.ndarray:
+        """
+        Return an integer identifying the (m, j, r) or (k, r) index of each variable.
+        """
+        lm = self.m if self.m is not None else np.zeros_like(self.r)
+        lu = self.j if self.j is not None else self.k
+        return (lm.astype(np.int64) * n_lus + lu) * ncells + self.r
+
+
+@dataclass
+class ConstraintFamily:
+    """
+    A family of constraints `A @ LutoSolver.X <sense> rhs`, kept so that it can be updated in place between years.
+    """
+    A: sparse.csr_array                     # Coefficients over the columns of `LutoSolver.X`
+    sense: str                              # GRB.LESS_EQUAL, GRB.GREATER_EQUAL or GRB.EQUAL
+    rhs: np.ndarray
+    row_keys: Optional[np.ndarray] = None   # Key of each row, for families whose rows come and go with the variables
+    constrs: Optional[gp.MConstr] = None    # The rows in the Gurobi model
+    row_scale: Optional[np.ndarray] = None  # Scale of each row in the model (see `settings.LP_SCALING`)
+
+
+def match_keys(old_keys: np.ndarray, new_keys: np.ndarray) -> np.ndarray:
+    """
+    Return the position in `old_keys` of each of `new_keys`, or -1 where it is not in `old_keys`.
+    """
+    if old_keys.size == 0:
+        return np.full(new_keys.size, -1)
+    order = np.argsort(old_keys, kind='stable')
+    pos = np.searchsorted(old_keys[order], new_keys).clip(max=old_keys.size - 1)
+    return np.where(old_keys[order][pos] == new_keys, order[pos], -1)
+
+
+def group_by(values: np.ndarray, n_groups: int) -> list[np.ndarray]:
+    """
+    Return, for each g in range(n_groups), the positions in `values` where `values == g`.
+    """
+    order = np.argsort(values, kind='stable')
+    bounds = np.searchsorted(values[order], np.arange(n_groups + 1))
+    return [order[bounds[g]:bounds[g + 1]] for g in range(n_groups)]
+
+
+def get_power_of_two(magnitudes) -> np.ndarray:
+    """
+    Return the power of two nearest to each of `magnitudes`, or one where it is zero or not finite.
+    Scaling by powers of two only changes the exponents of the coefficients, so it is exact.
+    """
+    magnitudes = np.asarray(magnitudes, dtype=np.float64)
+    valid = (magnitudes > 0) & np.isfinite(magnitudes)
+    return np.where(valid, np.exp2(np.round(np.log2(np.where(valid, magnitudes, 1.0)))), 1.0)
+
+
+def get_row_max(A: sparse.csr_array) -> np.ndarray:
+    """
+    Return the largest absolute coefficient of each row of `A`, or zero for empty rows.
+    """
+    row_max = np.zeros(A.shape[0])
+    nonempty = np.diff(A.indptr) > 0
+    if nonempty.any():
+        row_max[nonempty] = np.maximum.reduceat(np.abs(A.data), A.indptr[:-1][nonempty])
+    return row_max
+
+
+def add_var_block(blocks: list, lb: np.ndarray, ub: np.ndarray, get_names) -> slice:
+    """
+    Append a block of variables to `blocks` and return its position among all blocks.
+    `get_names` is only called when `settings.NAME_DECISION_VARIABLES` is on.
+    """
+    start = sum(block_lb.size for block_lb, _, _ in blocks)
+    names = get_names() if settings.NAME_DECISION_VARIABLES else None
+    blocks.append((lb, ub, names))
+    return slice(start, start + lb.size)
+
+
 class LutoSolver:
     """
     Class responsible for grouping the Gurobi model, relevant input data, and its variables.
+
+    The formulation is kept as sparse matrices over the columns of `X` (see `constraint_families`),
+    so that other backends (e.g. `HighsLutoSolver`) only need to replace the methods that talk to the model.
     """
 
     def __init__(
@@ -80,35 +211,64 @@ class LutoSolver:
         self.final_target_year = final_target_year
         self._input_data = input_data
         self.d_c = d_c
-        self.gurobi_model = gp.Model(f"LUTO {settings.VERSION}", env=gurenv)
+        self._init_model()
 
         # Initialise variable stores
-        self.X_ag_dry_vars_jr = None
-        self.X_ag_irr_vars_jr = None
-        self.X_non_ag_vars_kr = None
-        self.X_ag_man_dry_vars_jr = None
-        self.X_ag_man_irr_vars_jr = None
+        self.X = None                   # All decision variables of the model, as a single MVar
+        self.ncols = 0                  # Number of columns of `X`
+        self.var_lb = None              # Bounds of the columns of `X`, before pruning
+        self.var_ub = None
+        self.pruned = None              # Columns fixed at zero by `prune`, or None
+        self.ag_vars = None             # Agricultural land-use variables, flattened over the feasible (m, j, r)
+        self.non_ag_vars = None         # Non-agricultural land-use variables, flattened over the feasible (k, r)
+        self.ag_man_vars = {}           # Agricultural management variables, flattened over the feasible (m, j_idx, r)
+        self.V_cols = None
+        self.E_cols = None
         self.V = None
         self.E = None
 
+        # Scales of the columns and the objective in the model (see `settings.LP_SCALING`); the rows are
+        # scaled per constraint family. The units of the deviation penalties are set at formulation.
+        self.col_scale = None
+        self.obj_scale = 1.0
+        self.deviation_units = None
+
         # Initialise constraint lookups
-        self.cell_usage_constraint_r = {}
-        self.ag_management_constraints_r = defaultdict(list)
-        self.adoption_limit_constraints = []
+        self.constraint_families: dict[str, ConstraintFamily] = {}
+        self.cell_usage_constraints = None
+        self.ag_management_constraints = None
+        self.adoption_limit_constraints = None
         self.demand_penalty_constraints = []
-        self.water_limit_constraints = []
-        self.ghg_emissions_expr = None
+        self.water_limit_constraints = None
+        self.demand_q_matrix = None
+        self.ghg_emissions_coeffs = None
         self.ghg_emissions_limit_constraint_ub = None
         self.ghg_emissions_limit_constraint_lb = None
-        self.biodiversity_expr = None
+        self.biodiversity_coeffs = None
         self.biodiversity_limit_constraint = None
 
+        # Values of the columns of `X` in the last solve
+        self.X_sol = None
+
+        # Solution (and basis, if the solve produced one) of the last solve, used to warm start the next year
+        self.warm_start = None
+
+        # Solution, dual prices and reduced costs of the last solve, used to prune the next year's variables
+        self.pruning_start = None
+
+        # Phase timings, model size and solve records of the year last formulated or updated (see `luto.solvers.telemetry`)
+        self.telemetry = None
+
+
+    def _init_model(self):
+        self.gurobi_model = gp.Model(f"LUTO {settings.VERSION}", env=get_gurobi_env())
 
     def formulate(self):
         """
         Performs the initial formulation of the model - setting up decision variables,
         constraints, and the objective.
         """
+        start_time = time.time()
         print("Setting up the model...")
 
         print("Adding the decision variables...")
@@ -120,120 +280,262 @@ class LutoSolver:
         print(f"Adding the objective function - {settings.OBJECTIVE}...", flush=True)
         self._setup_objective()
 
+        self._start_telemetry('formulate', time.time() - start_time)
+
+    def _start_telemetry(self, phase: str, seconds: float):
+        """
+        Starts the telemetry of the year just formulated or updated, with the time `phase` took.
+        """
+        self.telemetry = {
+            'base_year': int(self._input_data.base_year),
+            'target_year': int(self._input_data.target_year),
+            'solver': settings.SOLVER,
+            'phases': {phase: seconds},
+            'model': {},
+            'solves': [],
+            'objective': None,
+        }
+
+
 
+    def _get_var_blocks(self) -> tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """
+        Sets up the variable families for the current input data and returns the lower bounds,
+        upper bounds and (if `settings.NAME_DECISION_VARIABLES` is on) names of all their columns.
+        """
+        blocks = []
+        self._setup_x_vars(blocks)
+        self._setup_ag_management_variables(blocks)
+        self._setup_deviation_penalties(blocks)
+
+        lb, ub, names = zip(*blocks)
+        names = np.concatenate(names) if settings.NAME_DECISION_VARIABLES else None
+        self.ncols = sum(block_lb.size for block_lb in lb)
+        self.var_lb, self.var_ub = np.concatenate(lb), np.concatenate(ub)
+        self.pruned = None
+        self.col_scale = self._get_col_scale()
+        return self.var_lb, self.var_ub, names
+
+    def _get_col_scale(self) -> np.ndarray:
+        """
+        Returns the scale of each column of `self.X`; the variable in the model is the column divided by its scale.
+        The land-use variables are shares of a cell and are not scaled. With `settings.LP_SCALING` on, the demand
+        deviations are measured in units of the demand for their commodity and the GHG deviation in units of the GHG
+        target. These units are fixed when the model is formulated, as the in-place updates of the constraint
+        families assume that the columns keep their scales.
+        """
+        col_scale = np.ones(self.ncols)
+        if not settings.LP_SCALING:
+            return col_scale
+
+        if self.deviation_units is None:
+            self.deviation_units = {
+                'V': get_power_of_two(np.abs(self.d_c)),
+                'E': get_power_of_two(np.abs(self._input_data.limits.get("ghg_ub", 1.0))),
+            }
+        if self.V_cols is not None:
+            col_scale[self.V_cols] = self.deviation_units['V']
+        if self.E_cols is not None:
+            col_scale[self.E_cols] = self.deviation_units['E']
+        return col_scale
 
     def _setup_vars(self):
-        self._setup_x_vars()
-        self._setup_ag_management_variables()
-        self._setup_deviation_penalties()
+        """
+        Adds all decision variables with a single `addMVar` call. Each variable family then
+        refers to its block of columns in `self.X`.
+        """
+        self._add_vars(*self._get_var_blocks())
+
+    def _add_vars(self, lb: np.ndarray, ub: np.ndarray, names: Optional[np.ndarray]):
+        self.X = self.gurobi_model.addMVar(
+            lb.size, lb=lb / self.col_scale, ub=ub / self.col_scale, name=names.tolist() if names is not None else "",
+        )
+
+        self.V = self.X[self.V_cols] if self.V_cols is not None else None
+        self.E = self.X[self.E_cols] if self.E_cols is not None else None
 
     def _setup_constraints(self):
-        self._add_cell_usage_constraints()                              
-        self._add_agricultural_management_constraints()                 
-        self._add_agricultural_management_adoption_limit_constraints()  
-        self._add_demand_penalty_constraints()                          
+        self._add_cell_usage_constraints()
+        self._add_agricultural_management_constraints()
+        self._add_agricultural_management_adoption_limit_constraints()
+        self._add_demand_penalty_constraints()
         self._add_water_usage_limit_constraints() if settings.WATER_LIMITS == 'on' else print('  ...TURNING OFF water usage constraints ...')
-        self._add_ghg_emissions_limit_constraints()                     
+        self._add_ghg_emissions_limit_constraints()
         self._add_biodiversity_limit_constraints()
 
 
-    def _setup_x_vars(self):
+    def _setup_x_vars(self, blocks: list):
         """
         Sets up the 'x' variables, responsible for managing how cells are used.
         """
-        self.X_ag_dry_vars_jr = np.zeros(
-            (self._input_data.n_ag_lus, self._input_data.ncells), dtype=object
-        )
-        self.X_ag_irr_vars_jr = np.zeros(
-            (self._input_data.n_ag_lus, self._input_data.ncells), dtype=object
-        )
-        self.X_non_ag_vars_kr = np.zeros(
-            (self._input_data.n_non_ag_lus, self._input_data.ncells), dtype=object
+        # Agricultural variables for every allowed (m, j, r); np.nonzero returns them sorted by m, then j, then r
+        m, j, r = np.nonzero(self._input_data.ag_x_mrj.transpose(0, 2, 1))
+        cols = add_var_block(
+            blocks, np.zeros(r.size), np.ones(r.size),
+            lambda: [f"X_ag_{LM_NAMES[m_]}_{j_}_{r_}" for m_, j_, r_ in zip(m, j, r)],
         )
+        self.ag_vars = VarFamily(cols, r, m=m, j=j)
 
-        for j in range(self._input_data.n_ag_lus):
-            dry_lu_cells = self._input_data.ag_lu2cells[0, j]
-            for r in dry_lu_cells:
-                self.X_ag_dry_vars_jr[j, r] = self.gurobi_model.addVar(
-                    ub=1, name=f"X_ag_dry_{j}_{r}"
-                )
-
-            irr_lu_cells = self._input_data.ag_lu2cells[1, j]
-            for r in irr_lu_cells:
-                self.X_ag_irr_vars_jr[j, r] = self.gurobi_model.addVar(
-                    ub=1, name=f"X_ag_irr_{j}_{r}"
-                )
-
-        for k, non_ag_lu_desc in enumerate(NON_AG_LAND_USES):
-            if not NON_AG_LAND_USES[non_ag_lu_desc]:
-                continue
+        # Non-agricultural variables for every allowed (k, r) of the enabled land uses
+        non_ag_enabled_k = np.array([NON_AG_LAND_USES[lu] for lu in NON_AG_LAND_USES], dtype=bool)
+        non_ag_reversible_k = np.array([NON_AG_LAND_USES_REVERSIBLE[lu] for lu in NON_AG_LAND_USES], dtype=bool)
 
-            lu_cells = self._input_data.non_ag_lu2cells[k]
-            for r in lu_cells:
-                x_lb = (
-                    0 if NON_AG_LAND_USES_REVERSIBLE[non_ag_lu_desc]
-                    else self._input_data.non_ag_lb_rk[r, k]
-                )
-                self.X_non_ag_vars_kr[k, r] = self.gurobi_model.addVar(
-                    lb=x_lb, ub=self._input_data.non_ag_x_rk[r, k], name=f"X_non_ag_{k}_{r}",
-                )
+        k, r = np.nonzero(self._input_data.non_ag_x_rk.T * non_ag_enabled_k[:, np.newaxis])
+        x_lb = np.where(non_ag_reversible_k[k], 0, self._input_data.non_ag_lb_rk[r, k])
+        cols = add_var_block(
+            blocks, x_lb, self._input_data.non_ag_x_rk[r, k],
+            lambda: [f"X_non_ag_{k_}_{r_}" for k_, r_ in zip(k, r)],
+        )
+        self.non_ag_vars = VarFamily(cols, r, k=k)
 
-    def _setup_ag_management_variables(self):
+    def _setup_ag_management_variables(self, blocks: list):
         """
         Create extra variables for alternative agricultural management options
         (e.g. Asparagopsis taxiformis)
         """
-        # Prepare the variable matrices as zeros
-        self.X_ag_man_dry_vars_jr = {
-            am: np.zeros((len(am_j_list), self._input_data.ncells), dtype=object)
-            for am, am_j_list in self._input_data.am2j.items()
-        }
-        self.X_ag_man_irr_vars_jr = {
-            am: np.zeros((len(am_j_list), self._input_data.ncells), dtype=object)
-            for am, am_j_list in self._input_data.am2j.items()
-        }
-
+        self.ag_man_vars = {}
         for am, am_j_list in self._input_data.am2j.items():
-            if not AG_MANAGEMENTS[am]:
-                continue
-
             # Get snake_case version of the AM name for the variable name
             am_name = tools.am_name_snake_case(am)
 
-            for j_idx, j in enumerate(am_j_list):
-                # Create variable for all eligible cells - all lower bounds are zero
-                dry_lu_cells = self._input_data.ag_lu2cells[0, j]
-                for r in dry_lu_cells:
-                    dry_x_lb = 0 if AG_MANAGEMENTS_REVERSIBLE[am] else self._input_data.ag_man_lb_mrj[am][0, r, j]
-                    dry_var_name = f"X_ag_man_dry_{am_name}_{j}_{r}"
-
-                    self.X_ag_man_dry_vars_jr[am][j_idx, r] = self.gurobi_model.addVar(
-                        lb=dry_x_lb, ub=1, name=dry_var_name,
-                    )               
-
-                irr_lu_cells = self._input_data.ag_lu2cells[1, j]
-                for r in irr_lu_cells:
-                    irr_x_lb = 0 if AG_MANAGEMENTS_REVERSIBLE[am] else self._input_data.ag_man_lb_mrj[am][1, r, j]
-                    irr_var_name = f"X_ag_man_irr_{am_name}_{j}_{r}"
+            # Create variable for all eligible cells of the land uses the option applies to
+            am_j = np.array(am_j_list, dtype=int)
+            m, j_idx, r = np.nonzero(self._input_data.ag_x_mrj[:, :, am_j].transpose(0, 2, 1))
+            j = am_j[j_idx]
 
-                    self.X_ag_man_irr_vars_jr[am][j_idx, r] = self.gurobi_model.addVar(
-                        lb=irr_x_lb, ub=1, name=irr_var_name,
-                    )
-                 
+            x_lb = (
+                np.zeros(r.size) if AG_MANAGEMENTS_REVERSIBLE[am]
+                else self._input_data.ag_man_lb_mrj[am][m, r, j]
+            )
+            cols = add_var_block(
+                blocks, x_lb, np.ones(r.size),
+                lambda: [f"X_ag_man_{LM_NAMES[m_]}_{am_name}_{j_}_{r_}" for m_, j_, r_ in zip(m, j, r)],
+            )
+            self.ag_man_vars[am] = VarFamily(cols, r, m=m, j=j, j_idx=j_idx)
 
-    def _setup_deviation_penalties(self):
+    def _setup_deviation_penalties(self, blocks: list):
         """
         Decision variables, V and E, for soft constraints.
         1) [V] Penalty vector for demand, each one conrespondes a commodity, that minimises the deviations from demand.
         2) [E] A single penalty scalar for GHG emissions, minimises its deviation from the target.
         """
+        self.V_cols = self.E_cols = None
+
         if settings.DEMAND_CONSTRAINT_TYPE == "soft":
-            self.V = self.gurobi_model.addMVar(self.ncms, name="V")
-            
+            self.V_cols = add_var_block(
+                blocks, np.zeros(self.ncms), np.full(self.ncms, np.inf), lambda: [f"V[{c}]" for c in range(self.ncms)]
+            )
+
         if settings.GHG_CONSTRAINT_TYPE == "soft":
-            self.E = self.gurobi_model.addVar(name="E")
+            self.E_cols = add_var_block(blocks, np.zeros(1), np.full(1, np.inf), lambda: ["E"])
+
+
+
+    @property
+    def x_var_families(self) -> list[VarFamily]:
+        """
+        The 'x' variable families, in the order of their columns in `self.X`.
+        """
+        return [self.ag_vars, self.non_ag_vars, *self.ag_man_vars.values()]
+
+    def _get_var_coeffs(self, ag_mrj: np.ndarray, non_ag_rk: np.ndarray, ag_man_mrj: dict) -> np.ndarray:
+        """
+        Gathers a coefficient for every column of `self.X` from the agricultural (m, r, j), non-agricultural (r, k)
+        and agricultural management (m, r, j_idx) matrices. The deviation penalty columns get zero coefficients.
+        """
+        coeffs = np.zeros(self.ncols)
+        coeffs[self.ag_vars.cols] = ag_mrj[self.ag_vars.m, self.ag_vars.r, self.ag_vars.j]
+        coeffs[self.non_ag_vars.cols] = non_ag_rk[self.non_ag_vars.r, self.non_ag_vars.k]
+        for am, am_vars in self.ag_man_vars.items():
+            coeffs[am_vars.cols] = ag_man_mrj[am][am_vars.m, am_vars.r, am_vars.j_idx]
+        return coeffs
+
+    def _set_constraint_family(
+        self, name: str, A: sparse.csr_array, sense: str, rhs: np.ndarray, row_keys: Optional[np.ndarray] = None
+    ):
+        """
+        Adds the constraints `A @ self.X <sense> rhs` to the model, or, if the family `name` is already in the model,
+        updates its coefficients and right-hand sides in place. Rows are matched by position, or by `row_keys`
+        for families whose rows come and go with the variables; unmatched rows are removed or added.
+        The rows are scaled in the model (see `_get_row_scale`), the family keeps them unscaled.
+        """
+        A = sparse.csr_array(A)
+        row_scale = self._get_row_scale(A)
+        model_A, model_rhs = self._get_model_matrix(A, row_scale), rhs * row_scale
+        if name not in self.constraint_families:
+            constrs = self.gurobi_model.addMConstr(model_A, self.X, sense, model_rhs)
+            self.constraint_families[name] = ConstraintFamily(A, sense, rhs, row_keys, constrs, row_scale)
+            return constrs
+
+        family = self.constraint_families[name]
+        constrs, old_A, old_row_scale = family.constrs, family.A, family.row_scale
+
+        if row_keys is not None:
+            # Keep the rows whose key is still present, remove the others and add the new ones
+            old_rows = match_keys(family.row_keys, row_keys)
+            kept = old_rows >= 0
+            removed = np.setdiff1d(np.arange(family.row_keys.size), old_rows[kept])
+            added = np.flatnonzero(~kept)
+
+            added_constrs = self.gurobi_model.addMConstr(model_A[added], self.X, sense, model_rhs[added])
+            self.gurobi_model.remove(constrs[removed])
+
+            # Position of each row among the old rows followed by the added rows; the added rows already have their new coefficients
+            rows = np.where(kept, old_rows, family.row_keys.size + np.cumsum(~kept) - 1)
+            constrs = gp.hstack((constrs, added_constrs))[rows]
+            old_A = sparse.vstack((old_A, A[added]), format='csr')[rows]
+            old_row_scale = np.concatenate((old_row_scale, row_scale[added]))[rows]
+
+        elif old_A.shape != A.shape:
+            self.gurobi_model.remove(constrs)
+            constrs = self.gurobi_model.addMConstr(model_A, self.X, sense, model_rhs)
+            self.constraint_families[name] = ConstraintFamily(A, sense, rhs, row_keys, constrs, row_scale)
+            return constrs
+
+        # Change the coefficients that differ from the current ones in the model, or rebuild the rows if too many differ
+        changed = (model_A - self._get_model_matrix(old_A, old_row_scale)).tocoo()
+        changed_rows, changed_cols = changed.row[changed.data != 0], changed.col[changed.data != 0]
+
+        if changed_rows.size > MAX_CHGCOEFF_SHARE * max(A.nnz, 1):
+            self.gurobi_model.remove(constrs)
+            constrs = self.gurobi_model.addMConstr(model_A, self.X, sense, model_rhs)
+        else:
+            for constr, var, coeff in zip(
+                constrs[changed_rows].tolist(), self.X[changed_cols].tolist(), np.ravel(model_A[changed_rows, changed_cols]).tolist()
+            ):
+                self.gurobi_model.chgCoeff(constr, var, coeff)
+            constrs.RHS = model_rhs
+
+        self.constraint_families[name] = ConstraintFamily(A, sense, rhs, row_keys, constrs, row_scale)
+        return constrs
+
+    def _get_row_scale(self, A: sparse.csr_array) -> np.ndarray:
+        """
+        Returns the scale of each row of the constraint family `A`: with `settings.LP_SCALING` on, the power of two
+        that brings its largest coefficient over the scaled columns nearest to one.
+        """
+        if not settings.LP_SCALING:
+            return np.ones(A.shape[0])
+        return 1 / get_power_of_two(get_row_max(sparse.csr_array(A @ sparse.diags_array(self.col_scale))))
+
+    def _get_model_matrix(self, A: sparse.csr_array, row_scale: np.ndarray) -> sparse.csr_array:
+        """
+        Returns the coefficients in the model of the rows `A`, scaled by `row_scale` and over the scaled columns.
+        """
+        if not settings.LP_SCALING:
+            return A
+        return sparse.csr_array(sparse.diags_array(row_scale) @ A @ sparse.diags_array(self.col_scale))
+
+    def _get_row_matrix(self, data, rows, cols, n_rows: int) -> sparse.csr_array:
+        """
+        Assembles a constraint family over the columns of `self.X` from (data, (rows, cols)) triplets.
+        Duplicated entries are summed.
+        """
+        return sparse.csr_array(
+            (np.asarray(data, dtype=np.float64), (np.asarray(rows), np.asarray(cols))),
+            shape=(n_rows, self.ncols),
+        )
 
-        
 
     def _setup_objective(self):
         """
@@ -244,98 +546,80 @@ class LutoSolver:
         # Get the objective values matrices for each sector
         ag_obj_mrj, non_ag_obj_rk, ag_man_objs = self._input_data.economic_contr_mrj
 
-        # Production costs + transition costs for all agricultural land uses.
-        ag_obj_contr = gp.quicksum(
-            ag_obj_mrj[0, self._input_data.ag_lu2cells[0, j], j]
-            @ self.X_ag_dry_vars_jr[j, self._input_data.ag_lu2cells[0, j]]
-            + ag_obj_mrj[1, self._input_data.ag_lu2cells[1, j], j]
-            @ self.X_ag_irr_vars_jr[j, self._input_data.ag_lu2cells[1, j]]
-            for j in range(self._input_data.n_ag_lus)
-        )
+        # Production costs + transition costs for all agricultural, agricultural management and non-agricultural variables
+        self.obj_economy_coeffs = self._get_var_coeffs(ag_obj_mrj, non_ag_obj_rk, ag_man_objs)
 
-        # Effects on production costs + transition costs for alternative agr. management options
-        ag_man_obj_contr = gp.quicksum(
-            ag_man_objs[am][0, self._input_data.ag_lu2cells[0, j], j_idx]
-            @ self.X_ag_man_dry_vars_jr[am][j_idx, self._input_data.ag_lu2cells[0, j]]
-            + ag_man_objs[am][1, self._input_data.ag_lu2cells[1, j], j_idx]
-            @ self.X_ag_man_irr_vars_jr[am][j_idx, self._input_data.ag_lu2cells[1, j]]
-            for am, am_j_list in self._input_data.am2j.items()
-            for j_idx, j in enumerate(am_j_list)
-        )
+        # Objective coefficients of every column; the deviation penalties are weighted by prices
+        obj_coeffs = self.obj_economy_coeffs * settings.SOLVE_ECONOMY_WEIGHT
+        if settings.DEMAND_CONSTRAINT_TYPE == "soft":
+            obj_coeffs[self.V_cols] = -self._input_data.economic_BASE_YR_prices * (1 - settings.SOLVE_ECONOMY_WEIGHT)
+        if settings.GHG_CONSTRAINT_TYPE == "soft":
+            obj_coeffs[self.E_cols] = -self._input_data.economic_target_yr_carbon_price * (1 - settings.SOLVE_ECONOMY_WEIGHT)
 
-        # Production costs + transition costs for all non-agricultural land uses.
-        non_ag_obj_contr = gp.quicksum(
-            non_ag_obj_rk[:, k][self._input_data.non_ag_lu2cells[k]]
-            @ self.X_non_ag_vars_kr[k, self._input_data.non_ag_lu2cells[k]]
-            for k in range(self._input_data.n_non_ag_lus)
+        # Set the objective function, scaled (with settings.LP_SCALING on) to a largest coefficient near one
+        self.obj_coeffs = obj_coeffs
+        self.obj_scale = (
+            1 / get_power_of_two(np.abs(obj_coeffs * self.col_scale).max(initial=0)) if settings.LP_SCALING else 1.0
         )
-        
-        # Get the objective values for each sector
-        self.obj_economy = ag_obj_contr + ag_man_obj_contr + non_ag_obj_contr - self._input_data.economic_base_sum
-        self.obj_demand = self.V * self._input_data.economic_BASE_YR_prices         if settings.DEMAND_CONSTRAINT_TYPE == "soft" else 0
-        self.obj_ghg = self.E * self._input_data.economic_target_yr_carbon_price    if settings.GHG_CONSTRAINT_TYPE == "soft" else 0
-
-        # Set the objective function
-        sense = GRB.MINIMIZE if settings.OBJECTIVE == "mincost" else GRB.MAXIMIZE
-        
-        objective = self.obj_economy *  settings.SOLVE_ECONOMY_WEIGHT \
-            - (gp.quicksum(self.obj_demand) +  self.obj_ghg) * (1 - settings.SOLVE_ECONOMY_WEIGHT)  
-                 
-        self.gurobi_model.setObjective(objective, sense)  
-        
-        
-    def _add_cell_usage_constraints(self, cells: Optional[np.array] = None):
+        self._set_objective(obj_coeffs, -self._input_data.economic_base_sum * settings.SOLVE_ECONOMY_WEIGHT)
+
+    def _set_objective(self, obj_coeffs: np.ndarray, obj_con: float):
+        self.X.Obj = obj_coeffs * self.col_scale * self.obj_scale
+        self.gurobi_model.ObjCon = obj_con * self.obj_scale
+        self.gurobi_model.ModelSense = GRB.MINIMIZE if settings.OBJECTIVE == "mincost" else GRB.MAXIMIZE
+
+
+    def _add_cell_usage_constraints(self):
         """
         Constraint that all of every cell is used for some land use.
-        If `cells` is provided, only adds constraints for the given cells
         """
         print('  ...cell usage constraints...')
 
-        if cells is None:
-            cells = np.array(range(self._input_data.ncells))
-
-        x_ag_dry_vars = self.X_ag_dry_vars_jr[:, cells]
-        x_ag_irr_vars = self.X_ag_irr_vars_jr[:, cells]
-        x_non_ag_vars = self.X_non_ag_vars_kr[:, cells]
-
-        # Create an array indexed by cell that contains the sums of each cell's variables.
-        # Then, loop through the array and add the constraint that each expression must equal 1.
-        X_sum_r = (
-            x_ag_dry_vars.sum(axis=0)
-            + x_ag_irr_vars.sum(axis=0)
-            + x_non_ag_vars.sum(axis=0)
+        # One row per cell summing all agricultural and non-agricultural variables of the cell
+        families = [self.ag_vars, self.non_ag_vars]
+        A = self._get_row_matrix(
+            np.ones(sum(f.size for f in families)),
+            np.concatenate([f.r for f in families]),
+            np.concatenate([f.col_idx for f in families]),
+            self._input_data.ncells,
+        )
+        self.cell_usage_constraints = self._set_constraint_family(
+            'cell_usage', A, GRB.EQUAL, np.ones(self._input_data.ncells)
         )
-        for r, expr in zip(cells, X_sum_r):
-            self.cell_usage_constraint_r[r] = self.gurobi_model.addConstr(expr == 1)
 
-    def _add_agricultural_management_constraints(
-        self, cells: Optional[np.array] = None
-    ):
+    def _get_ag_cols(self, m: np.ndarray, j: np.ndarray, r: np.ndarray) -> np.ndarray:
+        """
+        Return the columns in `self.X` of the agricultural variables of the given (m, j, r).
+        """
+        n_ag_lus, ncells = self._input_data.n_ag_lus, self._input_data.ncells
+        ag_keys = (self.ag_vars.m * n_ag_lus + self.ag_vars.j) * ncells + self.ag_vars.r     # Sorted, see `_setup_x_vars`
+        keys = (m * n_ag_lus + j) * ncells + r
+        return self.ag_vars.cols.start + np.searchsorted(ag_keys, keys)
+
+    def _add_agricultural_management_constraints(self):
         """
         Constraint handling alternative agricultural management options:
         Ag. man. variables cannot exceed the value of the agricultural variable.
         """
         print('  ...agricultural management constraints...')
 
-        for am, am_j_list in self._input_data.am2j.items():
-            for j_idx, j in enumerate(am_j_list):
-                if cells is not None:
-                    lm0_r_vals = [r for r in cells if self._input_data.ag_x_mrj[0, r, j]]
-                    lm1_r_vals = [r for r in cells if self._input_data.ag_x_mrj[1, r, j]]
-                else:
-                    lm0_r_vals = self._input_data.ag_lu2cells[0, j]
-                    lm1_r_vals = self._input_data.ag_lu2cells[1, j]
-
-                for r in lm0_r_vals:
-                    constr = self.gurobi_model.addConstr(
-                        self.X_ag_man_dry_vars_jr[am][j_idx, r] <= self.X_ag_dry_vars_jr[j, r]
-                    )
-                    self.ag_management_constraints_r[r].append(constr)
-                for r in lm1_r_vals:
-                    constr = self.gurobi_model.addConstr(
-                        self.X_ag_man_irr_vars_jr[am][j_idx, r] <= self.X_ag_irr_vars_jr[j, r]
-                    )
-                    self.ag_management_constraints_r[r].append(constr)
+        # One row per agricultural management variable: X_ag_man[m, j, r] - X_ag[m, j, r] <= 0
+        am_cols = np.concatenate([am_vars.col_idx for am_vars in self.ag_man_vars.values()] + [np.zeros(0, dtype=int)])
+        ag_cols = np.concatenate(
+            [self._get_ag_cols(am_vars.m, am_vars.j, am_vars.r) for am_vars in self.ag_man_vars.values()] + [np.zeros(0, dtype=int)]
+        )
+        rows = np.arange(am_cols.size)
+
+        A = self._get_row_matrix(
+            np.concatenate([np.ones(rows.size), -np.ones(rows.size)]),
+            np.concatenate([rows, rows]),
+            np.concatenate([am_cols, ag_cols]),
+            rows.size,
+        )
+        # The rows follow the agricultural management variables between years, so they are keyed by their column
+        self.ag_management_constraints = self._set_constraint_family(
+            'ag_management', A, GRB.LESS_EQUAL, np.zeros(rows.size), row_keys=am_cols
+        )
 
     def _add_agricultural_management_adoption_limit_constraints(self):
         """
@@ -343,23 +627,73 @@ class LutoSolver:
         """
         print('  ...agricultural management adoption constraints...')
 
+        # Sum of all usage of the AM option must be less than the limit, with one row per (am, j); usage is counted in cells
+        ag_vars_j = group_by(self.ag_vars.j, self._input_data.n_ag_lus)
+        cell_count_r = self._input_data.cell_count_r
+        data, rows, cols = [], [], []
+        n_rows = 0
         for am, am_j_list in self._input_data.am2j.items():
+            am_vars = self.ag_man_vars[am]
+            data.append(cell_count_r[am_vars.r])
+            rows.append(n_rows + am_vars.j_idx)
+            cols.append(am_vars.col_idx)
+
             for j_idx, j in enumerate(am_j_list):
                 adoption_limit = self._input_data.ag_man_limits[am][j]
+                data.append(-adoption_limit * cell_count_r[self.ag_vars.r[ag_vars_j[j]]])
+                rows.append(np.full(ag_vars_j[j].size, n_rows + j_idx))
+                cols.append(self.ag_vars.cols.start + ag_vars_j[j])
+
+            n_rows += len(am_j_list)
 
-                # Sum of all usage of the AM option must be less than the limit
-                ag_man_vars_sum = gp.quicksum(
-                    self.X_ag_man_dry_vars_jr[am][j_idx, :]
-                ) + gp.quicksum(self.X_ag_man_irr_vars_jr[am][j_idx, :])
+        A = self._get_row_matrix(
+            np.concatenate(data + [np.zeros(0)]), np.concatenate(rows + [np.zeros(0, dtype=int)]), np.concatenate(cols + [np.zeros(0, dtype=int)]), n_rows
+        )
+        self.adoption_limit_constraints = self._set_constraint_family('adoption_limit', A, GRB.LESS_EQUAL, np.zeros(n_rows))
 
-                all_vars_sum = gp.quicksum(self.X_ag_dry_vars_jr[j, :]) + gp.quicksum(
-                    self.X_ag_irr_vars_jr[j, :]
-                )
-                constr = self.gurobi_model.addConstr(
-                    ag_man_vars_sum <= adoption_limit * all_vars_sum
-                )
+    def _get_demand_q_matrix(self) -> sparse.csr_array:
+        """
+        Returns the (c, X) matrix mapping every variable to the quantity it produces of each commodity.
+        """
+        lu2pr_pj = self._input_data.lu2pr_pj.astype(bool)
+        pr2cm_cp = self._input_data.pr2cm_cp.astype(bool)
+
+        data, rows, cols = [], [], []
+
+        def add_terms(q_v, p, v_cols):
+            # Add the quantities of product `p` to the commodities made from it
+            nonzero = q_v != 0
+            for c in np.flatnonzero(pr2cm_cp[:, p]):
+                data.append(q_v[nonzero])
+                rows.append(np.full(nonzero.sum(), c))
+                cols.append(v_cols[nonzero])
+
+        # Quantities in PR/p representation, by the land use that produces each product
+        ag_vars_j = group_by(self.ag_vars.j, self._input_data.n_ag_lus)
+        for p in range(self._input_data.nprs):
+            for j in np.flatnonzero(lu2pr_pj[p]):
+                v = ag_vars_j[j]
+                q_v = self._input_data.ag_q_mrp[self.ag_vars.m[v], self.ag_vars.r[v], p]
+                add_terms(q_v, p, self.ag_vars.cols.start + v)
 
-                self.adoption_limit_constraints.append(constr)
+        # Repeat to get contributions of alternative agr. management options
+        for am, am_vars in self.ag_man_vars.items():
+            am_vars_j = group_by(am_vars.j, self._input_data.n_ag_lus)
+            for p in range(self._input_data.nprs):
+                for j in np.flatnonzero(lu2pr_pj[p]):
+                    v = am_vars_j[j]
+                    q_v = self._input_data.ag_man_q_mrp[am][am_vars.m[v], am_vars.r[v], p]
+                    add_terms(q_v, p, am_vars.cols.start + v)
+
+        # Non-agricultural commodity contributions
+        for c in range(self.ncms):
+            q_v = self._input_data.non_ag_q_crk[c, self.non_ag_vars.r, self.non_ag_vars.k]
+            nonzero = q_v != 0
+            data.append(q_v[nonzero])
+            rows.append(np.full(nonzero.sum(), c))
+            cols.append(self.non_ag_vars.col_idx[nonzero])
+
+        return self._get_row_matrix(np.concatenate(data), np.concatenate(rows), np.concatenate(cols), self.ncms)
 
     def _add_demand_penalty_constraints(self):
         """
@@ -367,177 +701,63 @@ class LutoSolver:
         """
         print('  ...demand constraints...')
 
-        # Quantities in PR/p representation by land-management (dry/irr).
-        ag_q_dry_p = [
-            gp.quicksum(self._input_data.ag_q_mrp[0, :, p] * self.X_dry_pr[p])
-            for p in range(self._input_data.nprs)
-        ]
-        ag_q_irr_p = [
-            gp.quicksum(self._input_data.ag_q_mrp[1, :, p] * self.X_irr_pr[p])
-            for p in range(self._input_data.nprs)
-        ]
-
-        # Transform quantities to CM/c representation by land management (dry/irr).
-        ag_q_dry_c = [
-            gp.quicksum(
-                ag_q_dry_p[p]
-                for p in range(self._input_data.nprs)
-                if self._input_data.pr2cm_cp[c, p]
-            )
-            for c in range(self.ncms)
-        ]
-        ag_q_irr_c = [
-            gp.quicksum(
-                ag_q_irr_p[p]
-                for p in range(self._input_data.nprs)
-                if self._input_data.pr2cm_cp[c, p]
-            )
-            for c in range(self.ncms)
-        ]
-
-        # Repeat to get contributions of alternative agr. management options
-        # Convert variables to PR/p representation
-        for am, am_j_list in self._input_data.am2j.items():
-            X_ag_man_dry_pr = np.zeros(
-                (self._input_data.nprs, self._input_data.ncells), dtype=object
-            )
-            X_ag_man_irr_pr = np.zeros(
-                (self._input_data.nprs, self._input_data.ncells), dtype=object
-            )
-
-            for j_idx, j in enumerate(am_j_list):
-                for p in self._input_data.j2p[j]:
-                    if self._input_data.lu2pr_pj[p, j]:
-                        X_ag_man_dry_pr[p, :] = self.X_ag_man_dry_vars_jr[am][j_idx, :]
-                        X_ag_man_irr_pr[p, :] = self.X_ag_man_irr_vars_jr[am][j_idx, :]
-
-            ag_man_q_dry_p = [
-                gp.quicksum(
-                    self._input_data.ag_man_q_mrp[am][0, :, p] * X_ag_man_dry_pr[p, :]
-                )
-                for p in range(self._input_data.nprs)
-            ]
-            ag_man_q_irr_p = [
-                gp.quicksum(
-                    self._input_data.ag_man_q_mrp[am][1, :, p] * X_ag_man_irr_pr[p, :]
-                )
-                for p in range(self._input_data.nprs)
-            ]
-
-            ag_man_q_dry_c = [
-                gp.quicksum(
-                    ag_man_q_dry_p[p]
-                    for p in range(self._input_data.nprs)
-                    if self._input_data.pr2cm_cp[c, p]
-                )
-                for c in range(self.ncms)
-            ]
-            ag_man_q_irr_c = [
-                gp.quicksum(
-                    ag_man_q_irr_p[p]
-                    for p in range(self._input_data.nprs)
-                    if self._input_data.pr2cm_cp[c, p]
-                )
-                for c in range(self.ncms)
-            ]
-
-            # Add to original agricultural variable commodity sums
-            for c in range(self.ncms):
-                ag_q_dry_c[c] += ag_man_q_dry_c[c]
-                ag_q_irr_c[c] += ag_man_q_irr_c[c]
-
-        # Calculate non-agricultural commodity contributions
-        non_ag_q_c = [
-            gp.quicksum(
-                gp.quicksum(
-                    self._input_data.non_ag_q_crk[c, :, k] * self.X_non_ag_vars_kr[k, :]
-                )
-                for k in range(self._input_data.n_non_ag_lus)
-            )
-            for c in range(self.ncms)
-        ]
-
         # Total quantities in CM/c representation.
-        self.total_q_exprs_c = [
-            ag_q_dry_c[c] + ag_q_irr_c[c] + non_ag_q_c[c] for c in range(self.ncms)
-        ]
+        self.demand_q_matrix = self._get_demand_q_matrix()
 
         if settings.DEMAND_CONSTRAINT_TYPE == "soft":
-            upper_bound_constraints = self.gurobi_model.addConstrs(
-                (self.d_c[c] - self.total_q_exprs_c[c]) <= self.V[c]
-                for c in range(self.ncms)
+            # (d_c - q_c) <= V_c and (q_c - d_c) <= V_c
+            V_matrix = self._get_row_matrix(np.ones(self.ncms), np.arange(self.ncms), np.arange(self.V_cols.start, self.V_cols.stop), self.ncms)
+            upper_bound_constraints = self._set_constraint_family(
+                'demand_ub', -self.demand_q_matrix - V_matrix, GRB.LESS_EQUAL, -self.d_c
             )
-            lower_bound_constraints = self.gurobi_model.addConstrs(
-                (self.total_q_exprs_c[c] - self.d_c[c]) <= self.V[c]
-                for c in range(self.ncms)
+            lower_bound_constraints = self._set_constraint_family(
+                'demand_lb', self.demand_q_matrix - V_matrix, GRB.LESS_EQUAL, self.d_c
             )
 
-            self.demand_penalty_constraints.extend(upper_bound_constraints.values())
-            self.demand_penalty_constraints.extend(lower_bound_constraints.values())
+            self.demand_penalty_constraints = [upper_bound_constraints, lower_bound_constraints]
 
         elif settings.DEMAND_CONSTRAINT_TYPE == "hard":
-            quantity_meets_demand_constraints = self.gurobi_model.addConstrs(
-                (self.total_q_exprs_c[c] >= self.d_c[c]) for c in range(self.ncms)
-            )
-            self.demand_penalty_constraints.extend(
-                quantity_meets_demand_constraints.values()
+            quantity_meets_demand_constraints = self._set_constraint_family(
+                'demand', self.demand_q_matrix, GRB.GREATER_EQUAL, self.d_c
             )
+            self.demand_penalty_constraints = [quantity_meets_demand_constraints]
 
         else:
             raise ValueError(
                 'DEMAND_CONSTRAINT_TYPE not specified in settings, needs to be "hard" or "soft"'
             )
 
-        
+
 
     def _add_water_usage_limit_constraints(self):
         """
         Adds constraints to handle water usage limits.
-        If `cells` is provided, only adds constraints for regions containing at least one of the
-        provided cells.
         """
 
         print(f'  ...water net yield constraints by {settings.WATER_REGION_DEF}...')
 
-        # Ensure water use remains below limit for each region
-        for region, (reg_name, limit_hist_level, ind) in self._input_data.limits["water"].items():
-
-            ag_contr = gp.quicksum(
-                gp.quicksum(
-                    self._input_data.ag_w_mrj[0, ind, j] * self.X_ag_dry_vars_jr[j, ind]
-                )  # Dryland agriculture contribution
-                + gp.quicksum(
-                    self._input_data.ag_w_mrj[1, ind, j] * self.X_ag_irr_vars_jr[j, ind]
-                )  # Irrigated agriculture contribution
-                for j in range(self._input_data.n_ag_lus)
-            )
-
-            ag_man_contr = gp.quicksum(
-                gp.quicksum(
-                    self._input_data.ag_man_w_mrj[am][0, ind, j_idx]
-                    * self.X_ag_man_dry_vars_jr[am][j_idx, ind]
-                )  # Dryland alt. ag. management contributions
-                + gp.quicksum(
-                    self._input_data.ag_man_w_mrj[am][1, ind, j_idx]
-                    * self.X_ag_man_irr_vars_jr[am][j_idx, ind]
-                )  # Irrigated alt. ag. management contributions
-                for am, am_j_list in self._input_data.am2j.items()
-                for j_idx in range(len(am_j_list))
-            )
+        w_coeffs = self._get_var_coeffs(
+            self._input_data.ag_w_mrj, self._input_data.non_ag_w_rk, self._input_data.ag_man_w_mrj
+        )
+        x_cols = np.concatenate([f.col_idx for f in self.x_var_families])
+        x_cells = np.concatenate([f.r for f in self.x_var_families])
+
+        # A single sparse product maps every variable onto the region of its cell: row i of
+        # `region_matrix` holds the water coefficients of the variables falling in the i-th region.
+        region_matrix = (
+            self._input_data.limits["water_region_matrix"][:, x_cells] @ sparse.diags_array(w_coeffs[x_cols])
+        ).tocoo()
+        region_matrix = self._get_row_matrix(
+            region_matrix.data, region_matrix.row, x_cols[region_matrix.col], region_matrix.shape[0]
+        )
 
-            non_ag_contr = gp.quicksum(
-                gp.quicksum(
-                    self._input_data.non_ag_w_rk[ind, k] * self.X_non_ag_vars_kr[k, ind]
-                )  # Non-agricultural contribution
-                for k in range(self._input_data.n_non_ag_lus)
-            )
+        # Ensure water use remains below limit for each region
+        water_yield_constraints = []
+        for region, (reg_name, limit_hist_level, _) in self._input_data.limits["water"].items():
 
             # Get the water yield outside the study area in the Base Year (2010) of the whole simulation
             outside_luto_study_contr = self._input_data.water_yield_outside_study_area[region]
 
-            # Sum of all water yield contributions
-            w_net_yield_region = ag_contr + ag_man_contr + non_ag_contr + outside_luto_study_contr
-            
             # Under River Regions, we need to update the water constraint when the wny_hist_level < wny_BASE_YR_level
             if settings.WATER_REGION_DEF == 'Drainage Division':
                 water_yield_constraint = limit_hist_level
@@ -546,88 +766,77 @@ class LutoSolver:
                 water_yield_constraint = min(limit_hist_level, wny_BASE_YR_level)
             else:
                 raise ValueError(f"Unknown choice for `WATER_REGION_DEF` setting: must be either 'River Region' or 'Drainage Division'")
-        
-            # Add the constraint that the water yield in the region must be greater than the limit
-            constr = self.gurobi_model.addConstr(w_net_yield_region >= water_yield_constraint)
-            self.water_limit_constraints.append(constr)
-            
+
+            # The water yield in the region (inside plus outside the study area) must be greater than the limit
+            water_yield_constraints.append(water_yield_constraint - outside_luto_study_contr)
+
             # Report on the water yield in the region
             if settings.VERBOSE == 1:
                 print(f"    ...net water yield in {reg_name} >= {limit_hist_level:.2f} ML")
             if water_yield_constraint != limit_hist_level:
                 print(f"        ... updating water constraint to >= {water_yield_constraint:.2f} ML")
 
-
-    def _get_total_ghg_emissions_expr(self) -> gp.LinExpr:
-        # Pre-calculate the coefficients for each variable,
-        # both for regular culture and alternative agr. management options
-        g_dry_coeff = (
-            self._input_data.ag_g_mrj[0, :, :] + self._input_data.ag_ghg_t_mrj[0, :, :]
-        )
-        g_irr_coeff = (
-            self._input_data.ag_g_mrj[1, :, :] + self._input_data.ag_ghg_t_mrj[1, :, :]
+        self.water_limit_constraints = self._set_constraint_family(
+            'water', region_matrix, GRB.GREATER_EQUAL, np.array(water_yield_constraints, dtype=np.float64)
         )
-        ag_contr = gp.quicksum(
-            gp.quicksum(
-                g_dry_coeff[:, j] * self.X_ag_dry_vars_jr[j, :]
-            )  # Dryland agriculture contribution
-            + gp.quicksum(
-                g_irr_coeff[:, j] * self.X_ag_irr_vars_jr[j, :]
-            )  # Irrigated agriculture contribution
-            for j in range(self._input_data.n_ag_lus)
-        )
-        ag_man_contr = gp.quicksum(
-            gp.quicksum(
-                self._input_data.ag_man_g_mrj[am][0, :, j_idx]
-                * self.X_ag_man_dry_vars_jr[am][j_idx, :]
-            )  # Dryland alt. ag. management contributions
-            + gp.quicksum(
-                self._input_data.ag_man_g_mrj[am][1, :, j_idx]
-                * self.X_ag_man_irr_vars_jr[am][j_idx, :]
-            )  # Irrigated alt. ag. management contributions
-            for am, am_j_list in self._input_data.am2j.items()
-            for j_idx in range(len(am_j_list))
-        )
-        non_ag_contr = gp.quicksum(
-            gp.quicksum(
-                self._input_data.non_ag_g_rk[:, k] * self.X_non_ag_vars_kr[k, :]
-            )  # Non-agricultural contribution
-            for k in range(self._input_data.n_non_ag_lus)
+
+
+    def _get_total_ghg_emissions_coeffs(self) -> np.ndarray:
+        """
+        Returns the GHG emissions of every column of `self.X`; the off-land emissions are a constant on top.
+        """
+        return self._get_var_coeffs(
+            self._input_data.ag_g_mrj + self._input_data.ag_ghg_t_mrj,
+            self._input_data.non_ag_g_rk,
+            self._input_data.ag_man_g_mrj,
         )
-        return ag_contr + ag_man_contr + non_ag_contr + self._input_data.offland_ghg
 
 
     def _add_ghg_emissions_limit_constraints(self):
         """
         Add either hard or soft GHG constraints depending on settings.GHG_CONSTRAINT_TYPE
         """
+        self.ghg_emissions_coeffs = None
+        self.ghg_emissions_limit_constraint_ub = None
+        self.ghg_emissions_limit_constraint_lb = None
+
         if settings.GHG_EMISSIONS_LIMITS != "on":
             print('...GHG emissions constraints TURNED OFF ...')
             return
-        
+
         ghg_limit_ub = self._input_data.limits["ghg_ub"]
         ghg_limit_lb = self._input_data.limits["ghg_lb"]
-        self.ghg_emissions_expr = self._get_total_ghg_emissions_expr()
-        
+        self.ghg_emissions_coeffs = self._get_total_ghg_emissions_coeffs()
+        ghg_matrix = sparse.csr_array(self.ghg_emissions_coeffs[np.newaxis, :])
+        offland_ghg = self._input_data.offland_ghg
+
         if settings.GHG_CONSTRAINT_TYPE == 'hard':
             print(f"...GHG emissions reduction target")
             print(f'    ...GHG emissions reduction target UB: {ghg_limit_ub:,.0f} tCO2e')
-            self.ghg_emissions_limit_constraint_ub = self.gurobi_model.addConstr(
-                self.ghg_emissions_expr <= ghg_limit_ub
+            self.ghg_emissions_limit_constraint_ub = self._set_constraint_family(
+                'ghg_ub', ghg_matrix, GRB.LESS_EQUAL, np.atleast_1d(ghg_limit_ub - offland_ghg)
             )
             print(f'    ...GHG emissions reduction target LB: {ghg_limit_lb:,.0f} tCO2e')
-            self.ghg_emissions_limit_constraint_lb = self.gurobi_model.addConstr(
-                self.ghg_emissions_expr >= ghg_limit_lb
+            self.ghg_emissions_limit_constraint_lb = self._set_constraint_family(
+                'ghg_lb', ghg_matrix, GRB.GREATER_EQUAL, np.atleast_1d(ghg_limit_lb - offland_ghg)
             )
         elif settings.GHG_CONSTRAINT_TYPE == 'soft':
             print(f"  ...GHG emissions reduction target: {ghg_limit_ub:,.0f} tCO2e")
-            self.gurobi_model.addConstr(self.ghg_emissions_expr - ghg_limit_ub <= self.E)
-            self.gurobi_model.addConstr(ghg_limit_ub - self.ghg_emissions_expr <= self.E)
+            E_matrix = self._get_row_matrix([1], [0], [self.E_cols.start], 1)
+            self.ghg_emissions_limit_constraint_ub = self._set_constraint_family(
+                'ghg_ub', ghg_matrix - E_matrix, GRB.LESS_EQUAL, np.atleast_1d(ghg_limit_ub - offland_ghg)
+            )
+            self.ghg_emissions_limit_constraint_lb = self._set_constraint_family(
+                'ghg_lb', -ghg_matrix - E_matrix, GRB.LESS_EQUAL, np.atleast_1d(offland_ghg - ghg_limit_ub)
+            )
         else:
             raise ValueError("Unknown choice for `GHG_CONSTRAINT_TYPE` setting: must be either 'hard' or 'soft'")
 
 
     def _add_biodiversity_limit_constraints(self):
+        self.biodiversity_coeffs = None
+        self.biodiversity_limit_constraint = None
+
         if settings.BIODIVERSITY_LIMITS != "on":
             print('  ...biodiversity constraints TURNED OFF ...')
             return
@@ -637,307 +846,437 @@ class LutoSolver:
         # Returns biodiversity limits. Note that the biodiversity limits is 0 if BIODIVERSITY_LIMITS != "on".
         biodiversity_limits = self._input_data.limits["biodiversity"]
 
-        ag_contr = gp.quicksum(
-            gp.quicksum(
-                self._input_data.ag_b_mrj[0, :, :][:, j] * self.X_ag_dry_vars_jr[j, :]
-            )  # Dryland agriculture contribution
-            + gp.quicksum(
-                self._input_data.ag_b_mrj[1, :, :][:, j] * self.X_ag_irr_vars_jr[j, :]
-            )  # Irrigated agriculture contribution
-            for j in range(self._input_data.n_ag_lus)
+        self.biodiversity_coeffs = self._get_var_coeffs(
+            self._input_data.ag_b_mrj, self._input_data.non_ag_b_rk, self._input_data.ag_man_b_mrj
         )
 
-        ag_man_contr = gp.quicksum(
-            gp.quicksum(
-                self._input_data.ag_man_b_mrj[am][0, :, j_idx]
-                * self.X_ag_man_dry_vars_jr[am][j_idx, :]
-            )  # Dryland alt. ag. management contributions
-            + gp.quicksum(
-                self._input_data.ag_man_b_mrj[am][1, :, j_idx]
-                * self.X_ag_man_irr_vars_jr[am][j_idx, :]
-            )  # Irrigated alt. ag. management contributions
-            for am, am_j_list in self._input_data.am2j.items()
-            for j_idx in range(len(am_j_list))
+        print(f"    ...biodiversity target score: {biodiversity_limits:,.0f}")
+        self.biodiversity_limit_constraint = self._set_constraint_family(
+            'biodiversity', sparse.csr_array(self.biodiversity_coeffs[np.newaxis, :]), GRB.GREATER_EQUAL, np.atleast_1d(biodiversity_limits)
         )
 
-        non_ag_contr = gp.quicksum(
-            gp.quicksum(
-                self._input_data.non_ag_b_rk[:, k] * self.X_non_ag_vars_kr[k, :]
-            )  # Non-agricultural contribution
-            for k in range(self._input_data.n_non_ag_lus)
+
+    def write_model(self, path: str):
+        """
+        Writes the model to `{path}.mps`, and to `{path}_vars.npz` the index of each of its columns: the variable
+        family (an index into `family_names`), and the land management, cell and land use of the variable
+        (the commodity for the demand deviations V; -1 where not applicable). The model is written as it is handed
+        to the solver, i.e. scaled with `settings.LP_SCALING` on.
+        """
+        model_cols = self._write_model_file(f"{path}.mps")
+
+        family_names = ['ag', 'non_ag', *self.ag_man_vars, 'V', 'E']
+        family = np.full(self.ncols, -1, dtype=np.int8)
+        lm, r, lu = (np.full(self.ncols, -1) for _ in range(3))
+        for code, var_family in enumerate(self.x_var_families):
+            family[var_family.cols] = code
+            lm[var_family.cols] = var_family.m if var_family.m is not None else -1
+            r[var_family.cols] = var_family.r
+            lu[var_family.cols] = var_family.j if var_family.j is not None else var_family.k
+        if self.V_cols is not None:
+            family[self.V_cols] = family_names.index('V')
+            lu[self.V_cols] = np.arange(self.ncms)
+        if self.E_cols is not None:
+            family[self.E_cols] = family_names.index('E')
+
+        order = np.argsort(model_cols)
+        np.savez_compressed(
+            f"{path}_vars.npz",
+            family_names=np.array(family_names),
+            family=family[order],
+            lm=lm[order],
+            r=r[order],
+            lu=lu[order],
+            ag_shape=np.array([self._input_data.n_ag_lms, self._input_data.ncells, self._input_data.n_ag_lus]),
+            non_ag_shape=np.array([self._input_data.ncells, self._input_data.n_non_ag_lus]),
         )
 
-        self.biodiversity_expr = ag_contr + ag_man_contr + non_ag_contr
+    def _write_model_file(self, path: str) -> np.ndarray:
+        """
+        Writes the model to `path` and returns the column in the file of each column of `self.X`.
+        """
+        self.gurobi_model.write(path)
+        return np.fromiter((var.index for var in self.X.tolist()), dtype=np.int64, count=self.ncols)
 
-        print(f"    ...biodiversity target score: {biodiversity_limits:,.0f}")
-        self.biodiversity_limit_constraint = self.gurobi_model.addConstr(
-            self.biodiversity_expr >= biodiversity_limits
-        )
+    def map_columns(self, other: "LutoSolver", cell_map: np.ndarray) -> np.ndarray:
+        """
+        Return the column of `other` of each column of `self.X` with the same index, where the cells of this
+        solver are the cells `cell_map` of `other` (-1 for cells it does not have), or -1 where `other` has no
+        such variable. The deviation penalties are matched by position.
+        """
+        other_cols = np.full(self.ncols, -1)
+        n_lus = max(self._input_data.n_ag_lus, self._input_data.n_non_ag_lus)
+        for family, other_family in zip(self.x_var_families, other.x_var_families):
+            mapped = cell_map[family.r] >= 0
+            keys = replace(family, r=cell_map[family.r]).get_keys(n_lus, other._input_data.ncells)
+            other_pos = match_keys(other_family.get_keys(n_lus, other._input_data.ncells), keys[mapped])
+            other_cols[family.col_idx[mapped]] = np.where(other_pos >= 0, other_family.cols.start + other_pos, -1)
+        for cols, other_cols_ in ((self.V_cols, other.V_cols), (self.E_cols, other.E_cols)):
+            if cols is not None and other_cols_ is not None:
+                other_cols[cols] = np.arange(other_cols_.start, other_cols_.stop)
+        return other_cols
+
+    def prune(self, pruned: np.ndarray):
+        """
+        Fixes the variables of the columns `pruned` (a mask over `self.X`) at zero for the next solve, on top of
+        those already pruned. Variables with a positive lower bound are kept. After solving, `solve` adds back the
+        pruned variables whose reduced costs show that they would improve the objective, so the solution is
+        still optimal.
+        """
+        if self.pruned is not None:
+            pruned = pruned | self.pruned
+        self.pruned = pruned & (self.var_lb == 0)
+        self._set_upper_bounds(np.where(self.pruned, 0, self.var_ub))
+        print(f"    ...pruned {self.pruned.sum():,} of {self.ncols:,} variables", flush=True)
 
+    def _set_upper_bounds(self, ub: np.ndarray):
+        self.X.UB = ub / self.col_scale
 
-    def update_formulation(
-        self,
-        input_data: SolverInputData,
-        d_c: np.array,
-        old_ag_x_mrj: np.ndarray,
-        old_ag_man_lb_mrj: dict,
-        old_non_ag_x_rk: np.ndarray,
-        old_non_ag_lb_rk: np.ndarray,
-        old_lumap: np.array,
-        current_lumap: np.array,
-        old_lmmap: np.array,
-        current_lmmap: np.array,
-    ):
+    def get_reduced_costs(self) -> np.ndarray:
+        """
+        Return the reduced cost of every column of `self.X` in the last solve.
+        """
+        return self.X.RC / (self.col_scale * self.obj_scale)
+
+    def get_duals(self) -> dict[str, np.ndarray]:
+        """
+        Return the dual prices of the rows of every constraint family in the last solve.
+        """
+        return {
+            name: family.constrs.Pi * family.row_scale / self.obj_scale
+            for name, family in self.constraint_families.items()
+        }
+
+    def set_start(self, x: np.ndarray, duals: dict[str, np.ndarray]):
+        """
+        Sets a primal and dual start for the next solve (e.g. mapped from a solve at a coarser resolution).
+        """
+        # Gurobi ignores starts of variables and constraints that are still pending, e.g. right after `formulate`
+        self.gurobi_model.update()
+        self.X.PStart = x / self.col_scale
+        for name, family in self.constraint_families.items():
+            family.constrs.DStart = duals[name] * self.obj_scale / family.row_scale
+
+    def update_formulation(self, input_data: SolverInputData, d_c: np.array):
         """
         Dynamically updates the existing formulation based on new input data and demands.
+
+        Only the variables whose (m, j, r) / (k, r) index entered or left the feasible set are added or
+        removed; bounds, objective coefficients, constraint coefficients and right-hand sides are changed
+        in place, so that Gurobi's model survives between years.
         """
+        start_time = time.time()
         self._input_data = input_data
         self.d_c = d_c
 
         print('Updating variables...', flush=True)
-        updated_cells = self._update_variables(
-            old_ag_x_mrj,
-            old_ag_man_lb_mrj,
-            old_non_ag_x_rk,
-            old_non_ag_lb_rk,
-            old_lumap,
-            current_lumap,
-            old_lmmap,
-            current_lmmap,
-        )
+        old_cols = self._update_variables()
+        old_A = {name: family.A for name, family in self.constraint_families.items()}
+        old_obj_coeffs = np.zeros(self.ncols)
+        old_obj_coeffs[old_cols >= 0] = self.obj_coeffs[old_cols[old_cols >= 0]]
+
         print('Updating constraints...', flush=True)
-        self._update_constraints(updated_cells)
+        self._setup_constraints()
 
         print('Updating objective function...', flush=True)
         self._setup_objective()
 
-    def _update_variables(
-        self,
-        old_ag_x_mrj: np.ndarray,
-        old_ag_man_lb_mrj: dict,
-        old_non_ag_x_rk: np.ndarray,
-        old_non_ag_lb_rk: np.ndarray,
-        old_lumap: np.array,
-        current_lumap: np.array,
-        old_lmmap: np.array,
-        current_lmmap: np.array,
-    ):
+        if settings.REDUCED_COST_PRUNING and self.pruning_start is not None:
+            self._prune_by_reduced_costs(old_cols, old_A, old_obj_coeffs)
+
+        if settings.TIMESERIES_WARM_START == 'simplex' and self.warm_start is not None:
+            self._set_warm_start(old_cols)
+
+        self._start_telemetry('update', time.time() - start_time)
+
+    def _save_warm_start(self, X_sol: np.ndarray):
         """
-        Updates the variables only for cells that have changed land use or land management.
-        Returns an array of cells that have been updated.
-        """
-        # metrics
-        num_cells_skipped = 0
-        updated_cells = []
-
-        for r in range(self._input_data.ncells):
-            old_j = old_lumap[r]
-            new_j = current_lumap[r]
-            old_m = old_lmmap[r]
-            new_m = current_lmmap[r]
-
-            if (
-                old_j == new_j
-                and old_m == new_m
-                and (old_ag_x_mrj[:, r, :] == self._input_data.ag_x_mrj[:, r, :]).all()
-                and (old_non_ag_x_rk[r, :] == self._input_data.non_ag_x_rk[r, :]).all()
-                and all(
-                    old_non_ag_lb_rk[r, k] == self._input_data.non_ag_lb_rk[r, k]
-                    for k, non_ag_desc in enumerate(NON_AG_LAND_USES) if not NON_AG_LAND_USES_REVERSIBLE[non_ag_desc]
-                )
-                and all(
-                    (old_ag_man_lb_mrj.get(am)[:, r, :] == self._input_data.ag_man_lb_mrj.get(am)[:, r, :]).all()
-                    for am in AG_MANAGEMENTS_TO_LAND_USES if not AG_MANAGEMENTS_REVERSIBLE[am]
-                )
-            ):
-                # cell has not changed between years. No need to update variables
-                num_cells_skipped += 1
+        Keeps the solution of the last solve, and its basis if it has one (i.e. unless it came from barrier
+        without crossover), so that the next year's solve can start from it.
+        """
+        families = self.constraint_families.items()
+        try:
+            vbasis = self.X.VBasis
+            cbasis = {name: family.constrs.CBasis for name, family in families}
+        except gp.GurobiError:
+            vbasis = cbasis = None
+
+        self.warm_start = {
+            'x': X_sol,
+            'pi': self.get_duals(),
+            'vbasis': vbasis,
+            'cbasis': cbasis,
+            'row_keys': {name: family.row_keys for name, family in families},
+        }
+
+    def _set_warm_start(self, old_cols: np.ndarray):
+        """
+        Sets the previous year's basis, or its primal and dual solution, as the start of the updated model (see
+        `_get_warm_start`) and switches it to dual simplex.
+        """
+        col_start, row_starts = self._get_warm_start(old_cols)
+
+        if self.warm_start['vbasis'] is not None:
+            self.X.VBasis = col_start
+            for name, row_start in row_starts.items():
+                self.constraint_families[name].constrs.CBasis = row_start
+            print("    ...warm starting dual simplex from the previous year's basis")
+        else:
+            self.X.PStart = col_start
+            for name, row_start in row_starts.items():
+                self.constraint_families[name].constrs.DStart = row_start
+            print("    ...warm starting dual simplex from the previous year's solution")
+
+        self.gurobi_model.Params.Method = 1
+
+    def _get_warm_start(self, old_cols: np.ndarray) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+        """
+        Maps the previous year's basis onto the updated model, or its primal and dual solution (scaled as the model)
+        if that solve left no basis. Returns the start of the columns, and of the rows of each constraint family
+        that was in the previous model. Variables and constraints that are new to the model start at their lower
+        bound and with a basic slack (or zero values).
+        """
+        start = self.warm_start
+
+        def carry_over(old_vals, old_idx, default):
+            vals = np.full(old_idx.size, default, dtype=old_vals.dtype)
+            vals[old_idx >= 0] = old_vals[old_idx[old_idx >= 0]]
+            return vals
+
+        old_rows = self._get_old_rows(old_cols, start)
+        if start['vbasis'] is not None:
+            col_start = carry_over(start['vbasis'], old_cols, -1)
+            row_starts = {name: carry_over(start['cbasis'][name], rows, 0) for name, rows in old_rows.items()}
+        else:
+            col_start = carry_over(start['x'], old_cols, 0) / self.col_scale
+            row_starts = {
+                name: carry_over(start['pi'][name], rows, 0) * self.obj_scale / self.constraint_families[name].row_scale
+                for name, rows in old_rows.items()
+            }
+        return col_start, row_starts
+
+    def _get_old_rows(self, old_cols: np.ndarray, start: dict) -> dict[str, np.ndarray]:
+        """
+        Returns, for each constraint family that was in the model at the solve `start` was saved from (see
+        `_save_warm_start`), the row in that solve of each of its rows, or -1 for new rows. Rows are matched
+        by position, or by their keys for families with `row_keys`.
+        """
+        kept = old_cols >= 0
+        new_cols = np.full(start['x'].size, -1)
+        new_cols[old_cols[kept]] = np.flatnonzero(kept)
+
+        old_rows = {}
+        for name, family in self.constraint_families.items():
+            if name not in start['pi']:
                 continue
+            if family.row_keys is None:
+                old_rows[name] = np.arange(family.A.shape[0])
+                old_rows[name][old_rows[name] >= start['pi'][name].size] = -1
+            else:
+                old_rows[name] = match_keys(new_cols[start['row_keys'][name]], family.row_keys)
+        return old_rows
 
-            # agricultural land usage
-            self.gurobi_model.remove(
-                list(self.X_ag_dry_vars_jr[:, r][np.where(self.X_ag_dry_vars_jr[:, r])])
-            )
-            self.gurobi_model.remove(
-                list(self.X_ag_irr_vars_jr[:, r][np.where(self.X_ag_irr_vars_jr[:, r])])
-            )
-            self.X_ag_dry_vars_jr[:, r] = np.zeros(self._input_data.n_ag_lus)
-            self.X_ag_irr_vars_jr[:, r] = np.zeros(self._input_data.n_ag_lus)
-            for j in range(self._input_data.n_ag_lus):
-                if self._input_data.ag_x_mrj[0, r, j]:
-                    self.X_ag_dry_vars_jr[j, r] = self.gurobi_model.addVar(
-                        ub=1, name=f"X_ag_dry_{j}_{r}"
-                    )
-
-                if self._input_data.ag_x_mrj[1, r, j]:
-                    self.X_ag_irr_vars_jr[j, r] = self.gurobi_model.addVar(
-                        ub=1, name=f"X_ag_irr_{j}_{r}"
-                    )
-
-            # non-agricultural land usage
-            self.gurobi_model.remove(
-                list(self.X_non_ag_vars_kr[:, r][np.where(self.X_non_ag_vars_kr[:, r])])
+    def _save_pruning_start(self, X_sol: np.ndarray):
+        """
+        Keeps the solution, dual prices and reduced costs of the last solve for `_prune_by_reduced_costs`.
+        """
+        self.pruning_start = {
+            'x': X_sol,
+            'pi': self.get_duals(),
+            'rc': self.get_reduced_costs(),
+            'row_keys': {name: family.row_keys for name, family in self.constraint_families.items()},
+        }
+
+    def _prune_by_reduced_costs(self, old_cols: np.ndarray, old_A: dict[str, sparse.csr_array], old_obj_coeffs: np.ndarray):
+        """
+        Prunes the variables that were zero in the previous year's solve and whose reduced cost then was worse
+        (lower when maximising, higher when minimising) by more than `settings.REDUCED_COST_PRUNING_SAFETY`
+        times the change of their coefficients between the years, weighted by the previous dual prices.
+
+        `old_A` and `old_obj_coeffs` are the previous year's constraint families and objective over the new columns.
+        """
+        start = self.pruning_start
+        kept = old_cols >= 0
+
+        # How far each variable's reduced cost is from making it worth using, in the previous solve
+        rc_gap = np.full(self.ncols, -np.inf)
+        rc_gap[kept] = start['rc'][old_cols[kept]] if settings.OBJECTIVE == "mincost" else -start['rc'][old_cols[kept]]
+        was_zero = np.zeros(self.ncols, dtype=bool)
+        was_zero[kept] = start['x'][old_cols[kept]] <= settings.FEASIBILITY_TOLERANCE
+
+        # Change of the reduced costs from the changes of the objective and of the constraint coefficients of each
+        # column (over the rows in both years), at the previous year's dual prices
+        coeff_change = np.abs(self.obj_coeffs - old_obj_coeffs)
+        for name, old_rows in self._get_old_rows(old_cols, start).items():
+            matched = old_rows >= 0
+            A = self.constraint_families[name].A[matched]
+            A_change = abs(A - old_A[name][old_rows[matched]])
+            coeff_change += A_change.T @ np.abs(start['pi'][name][old_rows[matched]])
+
+        tolerance = settings.OPTIMALITY_TOLERANCE / (self.col_scale * self.obj_scale)
+        pruned = was_zero & (rc_gap > settings.REDUCED_COST_PRUNING_SAFETY * coeff_change + tolerance)
+        for cols in (self.V_cols, self.E_cols):
+            if cols is not None:
+                pruned[cols] = False
+        print("Pruning variables by the previous year's reduced costs...", flush=True)
+        self.prune(pruned)
+
+    def _update_variables(self):
+        """
+        Matches the variable families of the new input data with the existing ones by their index. Variables that
+        left the feasible set are removed, new ones are added, and the bounds of all variables are set in place.
+        The stored constraint families are carried over to the new columns of `self.X`.
+
+        Returns the previous column of each new column of `self.X`, or -1 for added variables.
+        """
+        n_old = self.ncols
+        old_families = self.x_var_families
+        old_penalty_cols = [cols for cols in (self.V_cols, self.E_cols) if cols is not None]
+
+        lb, ub, names = self._get_var_blocks()
+        n_lus = max(self._input_data.n_ag_lus, self._input_data.n_non_ag_lus)
+
+        # Old column of each new column, or -1 for variables that did not exist before
+        old_cols = np.full(lb.size, -1)
+        for old_f, new_f in zip(old_families, self.x_var_families):
+            old_pos = match_keys(
+                old_f.get_keys(n_lus, self._input_data.ncells), new_f.get_keys(n_lus, self._input_data.ncells)
             )
-            self.X_non_ag_vars_kr[:, r] = np.zeros(self._input_data.n_non_ag_lus)
-            for k, non_ag_lu_desc in zip(range(self._input_data.n_non_ag_lus), NON_AG_LAND_USES):
-                if not NON_AG_LAND_USES[non_ag_lu_desc]:
-                    continue
-
-                if self._input_data.non_ag_x_rk[r, k]:
-                    x_lb = (
-                        0 if NON_AG_LAND_USES_REVERSIBLE[non_ag_lu_desc]
-                        else self._input_data.non_ag_lb_rk[r, k]
-                    )
-                    self.X_non_ag_vars_kr[k, r] = self.gurobi_model.addVar(
-                        lb=x_lb, ub=self._input_data.non_ag_x_rk[r, k], name=f"X_non_ag_{k}_{r}",
-                    )
-
-            # agricultural management
-            for am, am_j_list in self._input_data.am2j.items():
-                # remove old am variables
-                self.gurobi_model.remove(
-                    list(
-                        self.X_ag_man_dry_vars_jr[am][:, r][
-                            np.where(self.X_ag_man_dry_vars_jr[am][:, r])
-                        ]
-                    )
-                )
-                self.gurobi_model.remove(
-                    list(
-                        self.X_ag_man_irr_vars_jr[am][:, r][
-                            np.where(self.X_ag_man_irr_vars_jr[am][:, r])
-                        ]
-                    )
-                )
-                self.X_ag_man_dry_vars_jr[am][:, r] = np.zeros(len(am_j_list))
-                self.X_ag_man_irr_vars_jr[am][:, r] = np.zeros(len(am_j_list))
-
-            for m, j in self._input_data.cells2ag_lu[r]:
-                # replace am variables
-                for am in self._input_data.j2am[j]:
-                    if not AG_MANAGEMENTS[am]:
-                        continue
-
-                    # Get snake_case version of the AM name for the variable name
-                    am_name = am.lower().replace(" ", "_")
-
-                    x_lb = 0 if AG_MANAGEMENTS_REVERSIBLE[am] else self._input_data.ag_man_lb_mrj[am][m, r, j]
-                    m_str = 'dry' if m == 0 else 'irr'
-                    var_name = f"X_ag_man_{m_str}_{am_name}_{j}_{r}"
-
-                    j_idx = self._input_data.am2j[am].index(j)
-                    if m == 0:
-                        self.X_ag_man_dry_vars_jr[am][j_idx, r] = self.gurobi_model.addVar(
-                            lb=x_lb, ub=1, name=var_name,
-                        )
-                    else:
-                        self.X_ag_man_irr_vars_jr[am][j_idx, r] = self.gurobi_model.addVar(
-                            lb=x_lb, ub=1, name=var_name,
-                        )
-
-            updated_cells.append(r)
-
-        updated_cells = np.array(updated_cells)
-        print(f"    ...skipped {num_cells_skipped} cells, updated {len(updated_cells)} cells.\n")
-        return updated_cells
-
-    def _update_constraints(self, updated_cells: np.array):
-        if len(updated_cells) == 0:
-            print("No constraints need updating.")
-            return
+            old_cols[new_f.col_idx] = np.where(old_pos >= 0, old_f.cols.start + old_pos, -1)
+        for old_pc, new_pc in zip(old_penalty_cols, [cols for cols in (self.V_cols, self.E_cols) if cols is not None]):
+            old_cols[new_pc] = np.arange(old_pc.start, old_pc.stop)
+
+        kept = old_cols >= 0
+        removed = np.setdiff1d(np.arange(n_old), old_cols[kept])
+        self._replace_vars(lb, ub, names, old_cols, removed)
+
+        # Express the stored constraint families over the new columns; the removed columns drop out
+        new_cols = np.full(n_old, -1)
+        new_cols[old_cols[kept]] = np.flatnonzero(kept)
+        old_to_new = sparse.csr_array(
+            (np.ones(kept.sum()), (old_cols[kept], np.flatnonzero(kept))), shape=(n_old, self.ncols)
+        )
+        for family in self.constraint_families.values():
+            family.A = (family.A @ old_to_new).tocsr()
+            family.row_keys = new_cols[family.row_keys] if family.row_keys is not None else None
 
-        print('  ...removing existing constraints...\n')
-        for r in updated_cells:
-            self.gurobi_model.remove(self.cell_usage_constraint_r.pop(r, []))
-            self.gurobi_model.remove(self.ag_management_constraints_r.pop(r, []))
+        print(f"    ...kept {kept.sum()} variables, removed {removed.size}, added {(~kept).sum()}.\n")
+        return old_cols
 
-        self.gurobi_model.remove(self.adoption_limit_constraints)
-        self.gurobi_model.remove(self.demand_penalty_constraints)
-        if self.biodiversity_limit_constraint is not None:
-            self.gurobi_model.remove(self.biodiversity_limit_constraint)
-        if self.water_limit_constraints:
-            self.gurobi_model.remove(self.water_limit_constraints)
+    def _replace_vars(
+        self, lb: np.ndarray, ub: np.ndarray, names: Optional[np.ndarray], old_cols: np.ndarray, removed: np.ndarray
+    ):
+        """
+        Rearranges `self.X` so that its columns are the existing variables at `old_cols` (added where -1), removes
+        the variables at `removed`, and sets the bounds of all columns.
+        """
+        old_X = self.X
+        added = np.flatnonzero(old_cols < 0)
+        added_X = self.gurobi_model.addMVar(
+            added.size, lb=lb[added] / self.col_scale[added], ub=ub[added] / self.col_scale[added],
+            name=names[added].tolist() if names is not None else "",
+        )
+        self.X = gp.hstack((old_X, added_X))[np.where(old_cols >= 0, old_cols, old_X.shape[0] + np.cumsum(old_cols < 0) - 1)]
+        self.gurobi_model.remove(old_X[removed])
 
-        self.adoption_limit_constraints = []
-        self.demand_penalty_constraints = []
-        self.water_limit_constraints = []
-
-        if self.ghg_emissions_limit_constraint_ub is not None:
-            self.gurobi_model.remove(self.ghg_emissions_limit_constraint_ub)
-            self.ghg_emissions_limit_constraint_ub = None
-            
-        if self.ghg_emissions_limit_constraint_lb is not None:
-            self.gurobi_model.remove(self.ghg_emissions_limit_constraint_lb)
-            self.ghg_emissions_limit_constraint_lb = None
-
-        self._add_cell_usage_constraints(updated_cells)                 
-        self._add_agricultural_management_constraints(updated_cells)    
-        self._add_agricultural_management_adoption_limit_constraints()  
-        self._add_demand_penalty_constraints()                          
-        self._add_water_usage_limit_constraints() if settings.WATER_LIMITS == 'on' else print('  ...TURNING OFF water constraints...')
-        self._add_ghg_emissions_limit_constraints()                    
-        self._add_biodiversity_limit_constraints()                      
+        self.X.LB = lb / self.col_scale
+        self.X.UB = ub / self.col_scale
+        self.V = self.X[self.V_cols] if self.V_cols is not None else None
+        self.E = self.X[self.E_cols] if self.E_cols is not None else None
 
     def solve(self) -> SolverSolution:
         print("Starting solve...\n")
 
-        # Magic.
-        self.gurobi_model.optimize()
+        if settings.WRITE_SOLVER_MODELS:
+            model_dir = f"{settings.OUTPUT_DIR}/solver_models"
+            model_path = f"{model_dir}/luto_{self._input_data.base_year}_{self._input_data.target_year}"
+            os.makedirs(model_dir, exist_ok=True)
+            print(f"Writing the model to {model_path}.mps...", flush=True)
+            self.write_model(model_path)
+
+        families = self.constraint_families.values()
+        self.telemetry['model'] = {
+            'rows': sum(family.rhs.size for family in families),
+            'columns': self.ncols,
+            'nonzeros': sum(family.A.nnz for family in families),
+            'pruned': int(self.pruned.sum()) if self.pruned is not None else 0,
+        }
+        start_time = time.time()
 
-        print("Completed solve, collecting results...\n", flush=True)
+        # Magic.
+        try:
+            X_sol, obj_val = self._optimize()
+        except RuntimeError:
+            if self.pruned is None or not self.pruned.any():
+                raise
+            print("    ...the pruned model has no solution, solving again without pruning...", flush=True)
+            self.pruned = None
+            self._set_upper_bounds(self.var_ub)
+            X_sol, obj_val = self._optimize()
+
+        # Add back the pruned variables that price out and solve again, until none does
+        while self.pruned is not None and self.pruned.any():
+            # The optimality tolerance applies to the reduced costs in the (scaled) model
+            reduced_costs = self.get_reduced_costs()
+            tolerance = settings.OPTIMALITY_TOLERANCE / (self.col_scale * self.obj_scale)
+            if settings.OBJECTIVE == "mincost":
+                priced_out = self.pruned & (reduced_costs < -tolerance)
+            else:
+                priced_out = self.pruned & (reduced_costs > tolerance)
+            if not priced_out.any():
+                print(f"    ...none of the {self.pruned.sum():,} pruned variables prices out, the solution is optimal\n")
+                break
+            print(f"    ...{priced_out.sum():,} pruned variables price out, adding them back and solving again...", flush=True)
+            self.pruned &= ~priced_out
+            self._set_upper_bounds(np.where(self.pruned, 0, self.var_ub))
+            X_sol, obj_val = self._reoptimize()
+        self.X_sol = X_sol
+        self.telemetry['phases']['solve'] = time.time() - start_time
+        self.telemetry['objective'] = obj_val
+        start_time = time.time()
+
+        if settings.REDUCED_COST_PRUNING:
+            self._save_pruning_start(X_sol)
+
+        if settings.WRITE_SOLVER_MODELS:
+            # The objective of the pipeline's solve, for the objective drift reported by `luto.tools.solver_replay`
+            with open(f"{model_path}.json", "w") as f:
+                json.dump({
+                    'base_year': self._input_data.base_year,
+                    'target_year': self._input_data.target_year,
+                    'solver': settings.SOLVER,
+                    'objective': obj_val,
+                    'objective_scale': self.obj_scale,
+                    'settings': {setting: getattr(settings, setting) for setting in GUROBI_PARAMS.values()},
+                }, f, indent=2)
 
         prod_data = {}  # Dictionary that stores information about production and GHG emissions for the write module
+        if settings.TIMESERIES_WARM_START != 'cold':
+            self._save_warm_start(X_sol)
 
         # Collect optimised decision variables in one X_mrj Numpy array.
-        X_dry_sol_rj = np.zeros(
-            (self._input_data.ncells, self._input_data.n_ag_lus)
-        ).astype(np.float32)
-        X_irr_sol_rj = np.zeros(
-            (self._input_data.ncells, self._input_data.n_ag_lus)
-        ).astype(np.float32)
+        ag_X_mrj = np.zeros(
+            (self._input_data.n_ag_lms, self._input_data.ncells, self._input_data.n_ag_lus), dtype=np.float32
+        )
         non_ag_X_sol_rk = np.zeros(
-            (self._input_data.ncells, self._input_data.n_non_ag_lus)
-        ).astype(np.float32)
-        am_X_dry_sol_rj = {
-            am: np.zeros((self._input_data.ncells, self._input_data.n_ag_lus)).astype(np.float32)
-            for am in self._input_data.am2j
-        }
-        am_X_irr_sol_rj = {
-            am: np.zeros((self._input_data.ncells, self._input_data.n_ag_lus)).astype(np.float32)
+            (self._input_data.ncells, self._input_data.n_non_ag_lus), dtype=np.float32
+        )
+        am_X_sol_mrj = {
+            am: np.zeros((self._input_data.n_ag_lms, self._input_data.ncells, self._input_data.n_ag_lus), dtype=np.float32)
             for am in self._input_data.am2j
         }
 
-        # Get agricultural results
-        for j in range(self._input_data.n_ag_lus):
-            for r in self._input_data.ag_lu2cells[0, j]:
-                X_dry_sol_rj[r, j] = self.X_ag_dry_vars_jr[j, r].X
-            for r in self._input_data.ag_lu2cells[1, j]:
-                X_irr_sol_rj[r, j] = self.X_ag_irr_vars_jr[j, r].X
-
-        # Get non-agricultural results
-        for k, lu in zip(range(self._input_data.n_non_ag_lus), settings.NON_AG_LAND_USES):
-            if not settings.NON_AG_LAND_USES[lu]:
-                non_ag_X_sol_rk[:, k] = np.zeros(self._input_data.ncells)
-                continue
-
-            for r in self._input_data.non_ag_lu2cells[k]:
-                non_ag_X_sol_rk[r, k] = self.X_non_ag_vars_kr[k, r].X
-
-        # Get agricultural management results
-        for am, am_j_list in self._input_data.am2j.items():
-            for j_idx, j in enumerate(am_j_list):
-                for r in self._input_data.ag_lu2cells[0, j]:
-                    am_X_dry_sol_rj[am][r, j] = self.X_ag_man_dry_vars_jr[am][j_idx, r].X
-                for r in self._input_data.ag_lu2cells[1, j]:
-                    am_X_irr_sol_rj[am][r, j] = self.X_ag_man_irr_vars_jr[am][j_idx, r].X
+        # Get agricultural, non-agricultural and agricultural management results
+        ag_X_mrj[self.ag_vars.m, self.ag_vars.r, self.ag_vars.j] = X_sol[self.ag_vars.cols]
+        non_ag_X_sol_rk[self.non_ag_vars.r, self.non_ag_vars.k] = X_sol[self.non_ag_vars.cols]
+        for am, am_vars in self.ag_man_vars.items():
+            am_X_sol_mrj[am][am_vars.m, am_vars.r, am_vars.j] = X_sol[am_vars.cols]
 
         """Note that output decision variables are mostly 0 or 1 but in some cases they are somewhere in between which creates issues
             when converting to maps etc. as individual cells can have non-zero values for multiple land-uses and land management type.
             This code creates a boolean X_mrj output matrix and ensure that each cell has one and only one land-use and land management"""
 
         # Process agricultural land usage information
-        # Stack dryland and irrigated decision variables
-        ag_X_mrj = np.stack((X_dry_sol_rj, X_irr_sol_rj))  # Float32
         ag_X_mrj_processed = ag_X_mrj
 
         ## Note - uncomment the following block of code to revert the processed agricultural variables to be binary.
@@ -977,7 +1316,7 @@ class LutoSolver:
         # Repeat the steps for the regular agricultural management variables
         ag_man_X_mrj_processed = {}
         for am in self._input_data.am2j:
-            ag_man_processed = np.stack((am_X_dry_sol_rj[am], am_X_irr_sol_rj[am]))
+            ag_man_processed = am_X_sol_mrj[am]
 
             ## Note - uncomment the following block of code to revert the processed AM variables to be binary.
 
@@ -1012,31 +1351,22 @@ class LutoSolver:
         # Make ammaps (agricultural management maps) using the lumap and lmmap. There is a
         # separate ammap for each agricultural management option, because they can be stacked.
         ammaps = {am: np.zeros(self._input_data.ncells, dtype=np.int8) for am in AG_MANAGEMENTS_TO_LAND_USES}
-        for r in range(self._input_data.ncells):
-            cell_j = lumap[r]
-            cell_m = lmmap[r]
 
-            if cell_j >= settings.NON_AGRICULTURAL_LU_BASE_CODE:
-                # Non agricultural land use - no agricultural management option
-                continue
-
-            for am in self._input_data.j2am[cell_j]:
-                if cell_m == 0:
-                    am_var_val = am_X_dry_sol_rj[am][r, cell_j]
-                else:
-                    am_var_val = am_X_irr_sol_rj[am][r, cell_j]
-
-                if am_var_val >= settings.AGRICULTURAL_MANAGEMENT_USE_THRESHOLD:
-                    ammaps[am][r] = 1
+        # Non agricultural land uses have no agricultural management options
+        ag_cells = np.flatnonzero(lumap < settings.NON_AGRICULTURAL_LU_BASE_CODE)
+        for am, am_j_list in self._input_data.am2j.items():
+            am_cells = ag_cells[np.isin(lumap[ag_cells], am_j_list)]
+            am_var_vals = am_X_sol_mrj[am][lmmap[am_cells], am_cells, lumap[am_cells]]
+            ammaps[am][am_cells[am_var_vals >= settings.AGRICULTURAL_MANAGEMENT_USE_THRESHOLD]] = 1
 
         # # Process production amount for each commodity
-        prod_data["Production"] = [self.total_q_exprs_c[c].getValue() for c in range(self.ncms)]
-        if self.ghg_emissions_expr:
-            prod_data["GHG Emissions"] = self.ghg_emissions_expr.getValue()
-        if self.biodiversity_expr:
-            prod_data["Biodiversity"] = self.biodiversity_expr.getValue()
+        prod_data["Production"] = (self.demand_q_matrix @ X_sol).tolist()
+        if self.ghg_emissions_coeffs is not None:
+            prod_data["GHG Emissions"] = self.ghg_emissions_coeffs @ X_sol + self._input_data.offland_ghg
+        if self.biodiversity_coeffs is not None:
+            prod_data["Biodiversity"] = self.biodiversity_coeffs @ X_sol
 
-        return SolverSolution(
+        solution = SolverSolution(
             lumap=lumap,
             lmmap=lmmap,
             ammaps=ammaps,
@@ -1045,37 +1375,141 @@ class LutoSolver:
             ag_man_X_mrj=ag_man_X_mrj_processed,
             prod_data=prod_data,
             obj_val ={
-                'SUM': self.gurobi_model.ObjVal,
-                'Economy': self.obj_economy.getValue(),
-                'Demand': self.obj_demand.getValue().sum()      if settings.DEMAND_CONSTRAINT_TYPE == 'soft' else 0,
-                'GHG': self.obj_ghg.getValue()                  if settings.GHG_CONSTRAINT_TYPE == 'soft' else 0
+                'SUM': obj_val,
+                'Economy': self.obj_economy_coeffs @ X_sol - self._input_data.economic_base_sum,
+                'Demand': (X_sol[self.V_cols] * self._input_data.economic_BASE_YR_prices).sum()        if settings.DEMAND_CONSTRAINT_TYPE == 'soft' else 0,
+                'GHG': X_sol[self.E_cols].sum() * self._input_data.economic_target_yr_carbon_price     if settings.GHG_CONSTRAINT_TYPE == 'soft' else 0
             }
         )
+        self.telemetry['phases']['extract'] = time.time() - start_time
+        return solution
+
+    def _optimize(self) -> tuple[np.ndarray, float]:
+        """
+        Solves the model and returns the values of all decision variables and the objective value.
+        """
+        callback = GurobiTelemetryCallback(self.obj_scale)
+        self.gurobi_model.optimize(callback)
+        self.telemetry['solves'].append(callback.get_record(self.gurobi_model))
+        if self.gurobi_model.SolCount == 0:
+            raise RuntimeError(f"Gurobi did not solve the model to optimality: status {self.gurobi_model.Status}")
+
+        print(
+            f"Completed solve in {self.gurobi_model.Runtime:.2f}s ({self.gurobi_model.IterCount:,.0f} simplex and "
+            f"{self.gurobi_model.BarIterCount:,} barrier iterations), collecting results...\n",
+            flush=True,
+        )
+        return self.X.X * self.col_scale, self.gurobi_model.ObjVal / self.obj_scale
+
+    def _reoptimize(self) -> tuple[np.ndarray, float]:
+        """
+        Solves the model again after pruned variables were added back. Raising their upper bounds keeps the
+        basis of the last solve primal feasible, so primal simplex continues from it if there is one.
+        """
+        method = self.gurobi_model.Params.Method
+        try:
+            self.X.VBasis
+            self.gurobi_model.Params.Method = 0
+        except gp.GurobiError:
+            pass
+
+        try:
+            return self._optimize()
+        finally:
+            self.gurobi_model.Params.Method = method
 
     @property
     def ncms(self):
         return self.d_c.shape[0]  # Number of commodities.
 
-    @property
-    def X_dry_pr(self):
+
+class MatrixLutoSolver(LutoSolver):
+    """
+    Keeps the variable bounds, constraint families and objective as arrays and sparse matrices instead of
+    in a Gurobi model, for backends that are given the whole LP at every solve.
+    """
+
+    def _init_model(self):
+        self.gurobi_model = None
+
+        if settings.TIMESERIES_WARM_START != 'cold':
+            print("    ...warm starts are only available with Gurobi, every year is solved from scratch")
+
+        self.lb = None
+        self.ub = None
+        self.obj_coeffs = None
+        self.obj_con = 0.0
+
+    def _add_vars(self, lb: np.ndarray, ub: np.ndarray, names: Optional[np.ndarray]):
+        self.lb, self.ub = lb, ub
+
+    def _replace_vars(
+        self, lb: np.ndarray, ub: np.ndarray, names: Optional[np.ndarray], old_cols: np.ndarray, removed: np.ndarray
+    ):
+        self.lb, self.ub = lb, ub
+
+    def _set_constraint_family(
+        self, name: str, A: sparse.csr_array, sense: str, rhs: np.ndarray, row_keys: Optional[np.ndarray] = None
+    ):
         """
-        Transform agricultural decision vars from LU/j to PR/p representation.
+        Stores the constraints `A @ X <sense> rhs`; there are no constraint objects to return.
         """
-        return [
-            self.X_ag_dry_vars_jr[j, :]
-            for p in range(self._input_data.nprs)
-            for j in range(self._input_data.n_ag_lus)
-            if self._input_data.lu2pr_pj[p, j]
-        ]
+        A = sparse.csr_array(A)
+        self.constraint_families[name] = ConstraintFamily(
+            A, sense, np.asarray(rhs, dtype=np.float64), row_keys, row_scale=self._get_row_scale(A)
+        )
 
-    @property
-    def X_irr_pr(self):
+    def _set_objective(self, obj_coeffs: np.ndarray, obj_con: float):
+        self.obj_coeffs, self.obj_con = obj_coeffs, obj_con
+
+    def _set_upper_bounds(self, ub: np.ndarray):
+        self.ub = ub
+
+    def _reoptimize(self) -> tuple[np.ndarray, float]:
+        return self._optimize()
+
+    def set_start(self, x: np.ndarray, duals: dict[str, np.ndarray]):
+        print("    ...starts are only available with Gurobi, the model is solved from scratch")
+
+    def _save_warm_start(self, X_sol: np.ndarray):
+        pass
+
+    def get_lp_rows(self) -> tuple[sparse.csr_array, np.ndarray, np.ndarray]:
+        """
+        Returns the constraint families stacked into one row-wise matrix, and the sense and right-hand side of each row,
+        scaled as they are handed to the solver (see `settings.LP_SCALING`).
         """
-        Transform agricultural decision vars from LU/j to PR/p representation.
+        families = list(self.constraint_families.values())
+        A = sparse.vstack([self._get_model_matrix(family.A, family.row_scale) for family in families], format='csr')
+        senses = np.concatenate([np.full(family.rhs.size, family.sense) for family in families])
+        rhs = np.concatenate([family.rhs * family.row_scale for family in families])
+        return A, senses, rhs
+
+    def get_lp_columns(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, float]:
         """
-        return [
-            self.X_ag_irr_vars_jr[j, :]
-            for p in range(self._input_data.nprs)
-            for j in range(self._input_data.n_ag_lus)
-            if self._input_data.lu2pr_pj[p, j]
-        ]
+        Returns the objective coefficients and the lower and upper bounds of the columns, and the objective
+        constant, scaled as they are handed to the solver.
+        """
+        return (
+            self.obj_coeffs * self.col_scale * self.obj_scale,
+            self.lb / self.col_scale,
+            self.ub / self.col_scale,
+            self.obj_con * self.obj_scale,
+        )
+
+
+def get_solver(input_data: SolverInputData, d_c: np.array, final_target_year: int) -> LutoSolver:
+    """
+    Return a solver for the LP backend chosen by `settings.SOLVER`, or the decomposition solver
+    if `settings.DECOMPOSITION_BLOCKS` is above one.
+    """
+    if settings.DECOMPOSITION_BLOCKS > 1:
+        from luto.solvers.decomposition import DecomposedLutoSolver
+        return DecomposedLutoSolver(input_data, d_c, final_target_year)
+    elif settings.SOLVER == 'gurobi':
+        return LutoSolver(input_data, d_c, final_target_year)
+    elif settings.SOLVER == 'highs':
+        from luto.solvers.highs_solver import HighsLutoSolver  # highspy is only needed by this backend
+        return HighsLutoSolver(input_data, d_c, final_target_year)
+    else:
+        raise ValueError("Unknown choice for `SOLVER` setting: must be either 'gurobi' or 'highs'")
@@ -0,0 +1,214 @@
+# Copyright 2022 Fjalar J. de Haan and Brett A. Bryan at Deakin University
+#
+# This file is part of LUTO 2.0.
+#
+# LUTO 2.0 is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# LUTO 2.0 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# LUTO 2.0. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Structured telemetry of the solves. `LutoSolver.telemetry` holds, for the year last formulated or updated,
+the time spent in each phase, the size of the model and a record of every solve (phase times, iterations,
+residuals and objective progress); this module records the Gurobi solves and writes and summarises the years.
+"""
+
+import json
+import pandas as pd
+import gurobipy as gp
+
+from gurobipy import GRB
+
+
+# Phases of a solve; simplex after barrier is the crossover
+SOLVE_PHASES = ('presolve', 'barrier', 'crossover', 'simplex')
+
+
+def get_solve_record(
+    status, runtime: float, phase_times: dict, barrier_iterations: int, simplex_iterations: int, objective,
+    primal_violation, dual_violation, complementarity_violation, progress: list,
+) -> dict:
+    """
+    Return the record of one solve, with the same fields for every backend (None where a backend has no value).
+    """
+    return {
+        'status': status,
+        'runtime': float(runtime),
+        **{f"{phase}_time": phase_times.get(phase) for phase in SOLVE_PHASES},
+        'barrier_iterations': int(barrier_iterations),
+        'simplex_iterations': int(simplex_iterations),
+        'objective': objective,
+        'primal_violation': primal_violation,
+        'dual_violation': dual_violation,
+        'complementarity_violation': complementarity_violation,
+        'progress': progress,
+    }
+
+
+# The progress of barrier and simplex is recorded when they advanced by this many iterations, or this many seconds,
+# since their last record; every barrier iteration is recorded, simplex iterations are many and cheap
+PROGRESS_ITERATIONS = {'barrier': 1, 'simplex': 1000}
+PROGRESS_SECONDS = 1.0
+
+
+class GurobiTelemetryCallback:
+    """
+    Callback for `Model.optimize` that records when presolve, barrier and simplex run, and the iterations,
+    objectives and infeasibilities that barrier and simplex report along the way. The objectives are divided
+    by `objective_scale`, the scale of the objective in the model.
+
+    Whether simplex is the crossover of a barrier solve is only known after the solve (see `get_record`), as
+    the concurrent methods (Method -1, 3 and 4) run simplex alongside barrier.
+    """
+
+    def __init__(self, objective_scale: float = 1.0):
+        self.objective_scale = objective_scale
+        self.phase_starts = {}
+        self.progress = []
+        self.last_records = {}              # Iteration and time of the last progress record of barrier and simplex
+        self.last_barrier_time = None       # Time of the last barrier callback
+        self.simplex_resume_time = None     # Time of the first simplex callback after the last barrier callback
+
+    def __call__(self, model: gp.Model, where: int):
+        if where == GRB.Callback.PRESOLVE:
+            self.phase_starts.setdefault('presolve', model.cbGet(GRB.Callback.RUNTIME))
+            return
+        elif where == GRB.Callback.BARRIER:
+            algorithm, iteration = 'barrier', int(model.cbGet(GRB.Callback.BARRIER_ITRCNT))
+        elif where == GRB.Callback.SIMPLEX:
+            algorithm, iteration = 'simplex', int(model.cbGet(GRB.Callback.SPX_ITRCNT))
+        else:
+            return
+
+        runtime = model.cbGet(GRB.Callback.RUNTIME)
+        self.phase_starts.setdefault(algorithm, runtime)
+        resumed = False
+        if algorithm == 'barrier':
+            self.last_barrier_time = runtime
+        elif self.last_barrier_time is not None and (
+            self.simplex_resume_time is None or self.simplex_resume_time < self.last_barrier_time
+        ):
+            self.simplex_resume_time = runtime
+            resumed = True
+
+        last_record = self.last_records.get(algorithm)
+        if not resumed and last_record is not None and (
+            iteration - last_record[0] < PROGRESS_ITERATIONS[algorithm] and runtime - last_record[1] < PROGRESS_SECONDS
+        ):
+            return
+        self.last_records[algorithm] = (iteration, runtime)
+
+        if algorithm == 'barrier':
+            self.progress.append({
+                'time': runtime,
+                'phase': algorithm,
+                'iteration': iteration,
+                'primal_objective': model.cbGet(GRB.Callback.BARRIER_PRIMOBJ) / self.objective_scale,
+                'dual_objective': model.cbGet(GRB.Callback.BARRIER_DUALOBJ) / self.objective_scale,
+                'primal_infeasibility': model.cbGet(GRB.Callback.BARRIER_PRIMINF),
+                'dual_infeasibility': model.cbGet(GRB.Callback.BARRIER_DUALINF),
+            })
+        else:
+            self.progress.append({
+                'time': runtime,
+                'phase': algorithm,
+                'iteration': iteration,
+                'primal_objective': model.cbGet(GRB.Callback.SPX_OBJVAL) / self.objective_scale,
+                'dual_objective': None,
+                'primal_infeasibility': model.cbGet(GRB.Callback.SPX_PRIMINF),
+                'dual_infeasibility': model.cbGet(GRB.Callback.SPX_DUALINF),
+            })
+
+    def get_phase_starts(self, model: gp.Model) -> dict[str, float]:
+        """
+        Return when each phase of the solve of `model` started. Gurobi only counts the barrier iterations if barrier
+        solved the model; the simplex after its last iteration is then the crossover. Under the concurrent methods,
+        the time in which barrier and simplex ran side by side counts for the one that solved the model.
+        """
+        starts = {'presolve': self.phase_starts['presolve']} if 'presolve' in self.phase_starts else {}
+        concurrent_starts = [self.phase_starts[algorithm] for algorithm in ('barrier', 'simplex') if algorithm in self.phase_starts]
+        crossover_start = self.get_crossover_start(model)
+        if crossover_start is not None:
+            concurrent_starts = [start for start in concurrent_starts if start < crossover_start]
+            starts['crossover'] = crossover_start
+        if concurrent_starts:
+            starts['barrier' if model.BarIterCount > 0 else 'simplex'] = min(concurrent_starts)
+        return starts
+
+    def get_crossover_start(self, model: gp.Model):
+        """
+        Return when the crossover of the solve of `model` started, or None if there was none.
+        """
+        if model.BarIterCount > 0 and self.simplex_resume_time is not None and self.simplex_resume_time >= self.last_barrier_time:
+            return self.simplex_resume_time
+        return None
+
+    def get_record(self, model: gp.Model) -> dict:
+        """
+        Return the record of the solve of `model` that this callback was passed to. Each phase lasts until the
+        next one starts; the first one starts with the solve.
+        """
+        starts = sorted((start, phase) for phase, start in self.get_phase_starts(model).items())
+        ends = [start for start, _ in starts[1:]] + [model.Runtime]
+        phase_times = {phase: end - (start if i > 0 else 0.0) for i, ((start, phase), end) in enumerate(zip(starts, ends))}
+
+        crossover_start = self.get_crossover_start(model)
+        if crossover_start is not None:
+            for record in self.progress:
+                if record['phase'] == 'simplex' and record['time'] >= crossover_start:
+                    record['phase'] = 'crossover'
+
+        def get_quality(attr):
+            try:
+                return model.getAttr(attr)
+            except gp.GurobiError:
+                return None
+
+        return get_solve_record(
+            model.Status, model.Runtime, phase_times, model.BarIterCount, model.IterCount,
+            model.ObjVal / self.objective_scale if model.SolCount > 0 else None,
+            get_quality('ConstrVio'), get_quality('DualVio'), get_quality('ComplVio'), self.progress,
+        )
+
+
+def write_telemetry(telemetry: dict, path: str):
+    """
+    Write the telemetry of one year to `path` as JSON.
+    """
+    with open(path, 'w') as f:
+        json.dump(telemetry, f, indent=2)
+
+
+def summarise_telemetry(telemetry: dict[int, dict], path: str) -> pd.DataFrame:
+    """
+    Summarise the telemetry of every year, one row per year, into a CSV file at `path`, and print the summary.
+    The phase times and iterations are summed over the solves of a year; the residuals are those of its last solve.
+    """
+    records = []
+    for year, year_telemetry in sorted(telemetry.items()):
+        solves = year_telemetry['solves']
+        records.append({
+            'year': year,
+            **year_telemetry['model'],
+            **year_telemetry['phases'],
+            'solves': len(solves),
+            **{
+                key: sum(solve[key] or 0 for solve in solves)
+                for key in [f"{phase}_time" for phase in SOLVE_PHASES] + ['barrier_iterations', 'simplex_iterations']
+            },
+            'objective': year_telemetry['objective'],
+            **{key: solves[-1][key] if solves else None for key in ('primal_violation', 'dual_violation', 'complementarity_violation')},
+        })
+
+    summary = pd.DataFrame(records)
+    summary.to_csv(path, index=False)
+    print(f"Solver telemetry (written to {path}):")
+    print(summary.to_string(index=False), flush=True)
+    return summary
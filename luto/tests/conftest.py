@@ -0,0 +1,229 @@
+"""
+Shared fixtures for the solver tests: small synthetic solver inputs and tight solver settings.
+"""
+
+import os
+from functools import partial
+
+import numpy as np
+import pytest
+from scipy import sparse
+
+from luto import settings, simulation
+from luto.ag_managements import AG_MANAGEMENTS_TO_LAND_USES
+from luto.solvers import decomposition, solver
+from luto.solvers.input_data import SolverInputData
+from luto.solvers.solver import LutoSolver, SolverSolution
+
+N_AG_LMS = 2
+N_AG_LUS = 28
+N_NON_AG_LUS = 8
+N_WATER_REGIONS = 2
+
+
+def _get_desc2aglu() -> dict[str, int]:
+    """
+    Map the land uses with agricultural management options, padded with placeholders, to codes.
+    """
+    names = []
+    for am_lus in AG_MANAGEMENTS_TO_LAND_USES.values():
+        names += [lu for lu in am_lus if lu not in names]
+    names += [f"Land use {j}" for j in range(len(names), N_AG_LUS)]
+    return {lu: j for j, lu in enumerate(names[:N_AG_LUS])}
+
+
+def make_solver_input(seed: int, ncells: int = 8, ncms: int = 5) -> tuple[SolverInputData, np.ndarray]:
+    """
+    Return random solver input data for `ncells` cells and `ncms` commodities, and random demands.
+    Each land use makes the product of the same index (so `lu2pr_pj` is the identity), and each product
+    is a single commodity. Cells alternate between two water regions.
+    """
+    rng = np.random.default_rng(seed)
+    M, R, J, K, C = N_AG_LMS, ncells, N_AG_LUS, N_NON_AG_LUS, ncms
+    desc2aglu = _get_desc2aglu()
+    am2j = {am: [desc2aglu[lu] for lu in am_lus] for am, am_lus in AG_MANAGEMENTS_TO_LAND_USES.items()}
+
+    def rand(*shape):
+        return rng.random(shape)
+
+    ag_x_mrj = (rng.random((M, R, J)) < 0.35).astype(np.int8)
+    non_ag_x_rk = (rng.random((R, K)) < 0.5).astype(np.float32)
+    non_ag_x_rk[:, 0] = 1                   # Every cell has a land use
+
+    pr2cm_cp = np.zeros((C, J), dtype=bool)
+    pr2cm_cp[rng.integers(0, C, J), np.arange(J)] = True
+
+    region_r = np.arange(R) % N_WATER_REGIONS
+    water_region_matrix = sparse.csr_array((np.ones(R), (region_r, np.arange(R))), shape=(N_WATER_REGIONS, R))
+    water_limits = {
+        region: (f"Region {region}", -3.0, np.flatnonzero(region_r == region)) for region in range(N_WATER_REGIONS)
+    }
+
+    input_data = SolverInputData(
+        base_year=2010,
+        target_year=2011,
+        ag_g_mrj=rand(M, R, J),
+        ag_w_mrj=rand(M, R, J) - 0.3,
+        ag_b_mrj=rand(M, R, J),
+        ag_x_mrj=ag_x_mrj,
+        ag_q_mrp=rand(M, R, J),
+        ag_ghg_t_mrj=rand(M, R, J) * 0.1,
+        non_ag_g_rk=-rand(R, K),
+        non_ag_w_rk=rand(R, K),
+        non_ag_b_rk=rand(R, K),
+        non_ag_x_rk=non_ag_x_rk,
+        non_ag_q_crk=rand(C, R, K) * (rng.random((C, R, K)) < 0.2),
+        non_ag_lb_rk=rand(R, K) * 0.05,
+        ag_man_g_mrj={am: -rand(M, R, len(am_j)) * 0.1 for am, am_j in am2j.items()},
+        ag_man_q_mrp={am: rand(M, R, J) * 0.1 for am in am2j},
+        ag_man_w_mrj={am: rand(M, R, len(am_j)) * 0.1 for am, am_j in am2j.items()},
+        ag_man_b_mrj={am: rand(M, R, len(am_j)) * 0.1 for am, am_j in am2j.items()},
+        ag_man_limits={am: {j: 0.5 for j in am_j} for am, am_j in am2j.items()},
+        ag_man_lb_mrj={am: rand(M, R, J) * 0.01 for am in am2j},
+        water_yield_RR_BASE_YR={region: 1.0 for region in range(N_WATER_REGIONS)},
+        water_yield_outside_study_area={region: 0.5 for region in range(N_WATER_REGIONS)},
+        economic_contr_mrj=(
+            rand(M, R, J) * 10, rand(R, K) * 10, {am: rand(M, R, len(am_j)) for am, am_j in am2j.items()}
+        ),
+        economic_base_sum=3.0,
+        economic_BASE_YR_prices=rand(C) * 5,
+        economic_target_yr_carbon_price=2.0,
+        offland_ghg=np.array([1.5]),
+        lu2pr_pj=np.eye(J, dtype=bool),
+        pr2cm_cp=pr2cm_cp,
+        limits={
+            'water_region_matrix': water_region_matrix,
+            'water': water_limits,
+            'ghg_ub': 40.0,
+            'ghg_lb': -50.0,
+            'biodiversity': 1.0,
+        },
+        desc2aglu=desc2aglu,
+        resmult=1.0,
+        real_area_r=np.ones(R),
+        cell_count_r=np.ones(R),
+    )
+    return input_data, rand(C) * 2
+
+
+def solve_input(
+    input_data: SolverInputData, d_c: np.ndarray, luto_solver_cls: type = LutoSolver
+) -> tuple[LutoSolver, SolverSolution]:
+    """
+    Formulate and solve `input_data` with a `luto_solver_cls` for the target year 2011, and return the solver and
+    its solution.
+    """
+    luto_solver = luto_solver_cls(input_data, d_c, 2011)
+    luto_solver.formulate()
+    return luto_solver, luto_solver.solve()
+
+
+class RunData:
+    """
+    The parts of a `Data` object that the solve loops of `luto.simulation` use, with given solver input data and
+    demands for each target year.
+    """
+    YR_CAL_BASE = 2010
+
+    def __init__(self, path, input_data: dict[int, SolverInputData], d_c: dict[int, np.ndarray]):
+        self.path = str(path)
+        self.input_data = input_data
+        years = range(self.YR_CAL_BASE, max(input_data) + 1)
+        ncms = next(iter(d_c.values())).size
+        self.D_CY = np.array([d_c.get(yr, np.zeros(ncms)) for yr in years])
+        for yr in years:
+            os.makedirs(f"{self.path}/out_{yr}", exist_ok=True)
+
+        self.lumaps, self.lmmaps, self.ammaps = {}, {}, {}
+        self.ag_dvars, self.non_ag_dvars, self.ag_man_dvars = {}, {}, {}
+        self.obj_vals, self.solver_telemetry, self.prod_data = {}, {}, {}
+        self.PRECOMPUTED_INPUTS = {}
+        self.written_years = set()
+
+    def add_lumap(self, yr, lumap):
+        self.lumaps[yr] = lumap
+
+    def add_lmmap(self, yr, lmmap):
+        self.lmmaps[yr] = lmmap
+
+    def add_ammaps(self, yr, ammaps):
+        self.ammaps[yr] = ammaps
+
+    def add_ag_dvars(self, yr, ag_dvars):
+        self.ag_dvars[yr] = ag_dvars
+
+    def add_non_ag_dvars(self, yr, non_ag_dvars):
+        self.non_ag_dvars[yr] = non_ag_dvars
+
+    def add_ag_man_dvars(self, yr, ag_man_dvars):
+        self.ag_man_dvars[yr] = ag_man_dvars
+
+    def add_obj_vals(self, yr, obj_val):
+        self.obj_vals[yr] = obj_val
+
+    def add_solver_telemetry(self, yr, telemetry):
+        self.solver_telemetry[yr] = telemetry
+
+    def add_production_data(self, yr, data_type, prod_data):
+        self.prod_data.setdefault(yr, {})[data_type] = prod_data
+
+
+@pytest.fixture
+def run_data(solver_settings, tmp_path, monkeypatch):
+    """
+    Factory of `RunData` in a temporary output folder; the simulation reads its solver input data from it.
+    """
+    for name, value in {
+        'PRECOMPUTE_YEARS_AHEAD': 0,
+        'WRITE_DURING_RUN': False,
+        'CALC_BIODIVERSITY_CONTRIBUTION': False,
+        'COARSE_TO_FINE_RESFACTOR': settings.RESFACTOR,
+        'CELL_AGGREGATION': False,
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+    monkeypatch.setattr(simulation, 'get_input_data', lambda data, base, target: data.input_data[target])
+    return partial(RunData, tmp_path)
+
+
+@pytest.fixture
+def solver_input():
+    """
+    Factory of random solver input data, see `make_solver_input`.
+    """
+    return make_solver_input
+
+
+@pytest.fixture
+def solve():
+    """
+    Formulates and solves solver input data, see `solve_input`.
+    """
+    return solve_input
+
+
+@pytest.fixture
+def solver_settings(monkeypatch):
+    """
+    Settings for small, exactly solved test models; the Gurobi environment is restarted with them, without a log file.
+    """
+    for name, value in {
+        'VERBOSE': 0,
+        'THREADS': 1,
+        'SOLVE_METHOD': 1,
+        'PRESOLVE': -1,
+        'CROSSOVER': -1,
+        'FEASIBILITY_TOLERANCE': 1e-9,
+        'OPTIMALITY_TOLERANCE': 1e-9,
+        'NAME_DECISION_VARIABLES': True,
+        'LP_SCALING': False,
+        'DECOMPOSITION_BLOCKS': 0,
+        'REDUCED_COST_PRUNING': False,
+        'TIMESERIES_WARM_START': 'cold',
+        'WRITE_SOLVER_MODELS': False,
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+    monkeypatch.setattr(solver, 'gurenv', None)
+    get_gurobi_env = partial(solver.get_gurobi_env, logfilename="")
+    monkeypatch.setattr(solver, 'get_gurobi_env', get_gurobi_env)
+    monkeypatch.setattr(decomposition, 'get_gurobi_env', get_gurobi_env)
+    return settings
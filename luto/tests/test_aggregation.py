@@ -0,0 +1,111 @@
+"""
+Tests that solving on super-cells of identical cells gives the optimum over the cells.
+"""
+
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from luto import settings, simulation
+from luto.solvers.aggregation import CellAggregation, get_super_cells
+from luto.solvers.input_data import SolverInputData
+
+
+def _repeat_cells(input_data: SolverInputData, cells: np.ndarray) -> SolverInputData:
+    """
+    Return `input_data` over the cells `cells` of it, so that repeated cells are identical.
+    """
+    def take(arr, cell_axis):
+        return np.take(arr, cells, axis=cell_axis)
+
+    ag_economy_mrj, non_ag_economy_rk, ag_man_economy_mrj = input_data.economic_contr_mrj
+    water_region_matrix = input_data.limits['water_region_matrix'][:, cells]
+    return replace(
+        input_data,
+        ag_g_mrj=take(input_data.ag_g_mrj, 1),
+        ag_w_mrj=take(input_data.ag_w_mrj, 1),
+        ag_b_mrj=take(input_data.ag_b_mrj, 1),
+        ag_x_mrj=take(input_data.ag_x_mrj, 1),
+        ag_q_mrp=take(input_data.ag_q_mrp, 1),
+        ag_ghg_t_mrj=take(input_data.ag_ghg_t_mrj, 1),
+        non_ag_g_rk=take(input_data.non_ag_g_rk, 0),
+        non_ag_w_rk=take(input_data.non_ag_w_rk, 0),
+        non_ag_b_rk=take(input_data.non_ag_b_rk, 0),
+        non_ag_x_rk=take(input_data.non_ag_x_rk, 0),
+        non_ag_q_crk=take(input_data.non_ag_q_crk, 1),
+        non_ag_lb_rk=take(input_data.non_ag_lb_rk, 0),
+        ag_man_g_mrj={am: take(arr, 1) for am, arr in input_data.ag_man_g_mrj.items()},
+        ag_man_q_mrp={am: take(arr, 1) for am, arr in input_data.ag_man_q_mrp.items()},
+        ag_man_w_mrj={am: take(arr, 1) for am, arr in input_data.ag_man_w_mrj.items()},
+        ag_man_b_mrj={am: take(arr, 1) for am, arr in input_data.ag_man_b_mrj.items()},
+        ag_man_lb_mrj={am: take(arr, 1) for am, arr in input_data.ag_man_lb_mrj.items()},
+        economic_contr_mrj=(
+            take(ag_economy_mrj, 1),
+            take(non_ag_economy_rk, 0),
+            {am: take(arr, 1) for am, arr in ag_man_economy_mrj.items()},
+        ),
+        limits={
+            **input_data.limits,
+            'water_region_matrix': water_region_matrix,
+            'water': {
+                region: (name, limit, np.flatnonzero(water_region_matrix[[region]].toarray()))
+                for region, (name, limit, _) in input_data.limits['water'].items()
+            },
+        },
+        real_area_r=take(input_data.real_area_r, 0),
+        cell_count_r=take(input_data.cell_count_r, 0),
+    )
+
+
+@pytest.mark.parametrize("bound", [False, True])
+def test_aggregation_of_identical_cells_reproduces_the_optimum(solver_settings, solver_input, solve, monkeypatch, bound):
+    monkeypatch.setattr(settings, 'CELL_AGGREGATION_TOLERANCE', 0)
+    monkeypatch.setattr(settings, 'CELL_AGGREGATION_BOUND', bound)
+    input_data, d_c = solver_input(6, ncells=6)
+    cells = np.array([0, 3, 0, 1, 5, 3, 2, 4, 5, 0])
+    input_data = _repeat_cells(input_data, cells)
+
+    expected_super_cells = np.array([0, 1, 0, 2, 3, 1, 4, 5, 3, 0])
+    np.testing.assert_array_equal(get_super_cells(input_data, 0), expected_super_cells)
+
+    _, full_solution = solve(input_data, d_c)
+
+    cell_aggregation = CellAggregation()
+    aggregated_solver, aggregated_solution = solve(cell_aggregation.aggregate(input_data), d_c)
+    solution = cell_aggregation.disaggregate(aggregated_solver, aggregated_solution, d_c)
+
+    assert solution.obj_val['SUM'] == pytest.approx(full_solution.obj_val['SUM'], rel=1e-7, abs=1e-7)
+    assert solution.ag_X_mrj.shape == full_solution.ag_X_mrj.shape
+    np.testing.assert_array_equal(solution.ag_X_mrj[:, 0], solution.ag_X_mrj[:, 2])
+    np.testing.assert_array_equal(solution.non_ag_X_rk[4], solution.non_ag_X_rk[8])
+
+    record = aggregated_solver.telemetry['aggregation']
+    assert record['cells'] == cells.size and record['super_cells'] == 6
+    if bound:
+        assert record['objective_bound'] == pytest.approx(full_solution.obj_val['SUM'], rel=1e-6, abs=1e-6)
+    else:
+        assert record['objective_bound'] is None
+
+
+def test_aggregated_timeseries_matches_cold_solves(solver_input, solve, run_data, monkeypatch):
+    monkeypatch.setattr(settings, 'CELL_AGGREGATION', True)
+    monkeypatch.setattr(settings, 'CELL_AGGREGATION_TOLERANCE', 0)
+    monkeypatch.setattr(settings, 'REDUCED_COST_PRUNING', True)
+    monkeypatch.setattr(settings, 'TIMESERIES_WARM_START', 'simplex')
+
+    # The two years have different numbers of super-cells
+    cells = {2011: np.array([0, 3, 0, 1, 5, 3, 2, 4, 5, 0]), 2012: np.array([1, 1, 6, 2, 0, 4, 5, 3, 6, 1])}
+    input_data, d_c = {}, {}
+    for yr, yr_cells in cells.items():
+        yr_input_data, d_c[yr] = solver_input(yr, ncells=7)
+        input_data[yr] = _repeat_cells(yr_input_data, yr_cells)
+    data = run_data(input_data, d_c)
+
+    simulation.solve_timeseries(data, 2, 2010, 2012)
+
+    for yr in cells:
+        assert 'formulate' in data.solver_telemetry[yr]['phases']
+        _, cold_solution = solve(input_data[yr], d_c[yr])
+        assert data.obj_vals[yr]['SUM'] == pytest.approx(cold_solution.obj_val['SUM'], rel=1e-7, abs=1e-7)
+        assert data.solver_telemetry[yr]['aggregation']['super_cells'] == np.unique(cells[yr]).size
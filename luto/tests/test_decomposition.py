@@ -0,0 +1,72 @@
+"""
+Tests of the Dantzig-Wolfe decomposition of the LUTO LP over blocks of cells.
+"""
+
+import numpy as np
+import pytest
+
+from luto import settings
+from luto.solvers.decomposition import DecomposedLutoSolver
+
+
+@pytest.fixture
+def decomposition_settings(solver_settings, monkeypatch):
+    monkeypatch.setattr(settings, 'DECOMPOSITION_BLOCKS', 2)
+    monkeypatch.setattr(settings, 'DECOMPOSITION_WORKERS', 1)
+    monkeypatch.setattr(settings, 'DECOMPOSITION_MAX_ITERATIONS', 200)
+    return settings
+
+
+@pytest.mark.parametrize("demand_type", ['soft', 'hard'])
+def test_decomposition_matches_full_solve(decomposition_settings, solver_input, solve, monkeypatch, demand_type):
+    monkeypatch.setattr(settings, 'DEMAND_CONSTRAINT_TYPE', demand_type)
+    input_data, d_c = solver_input(5, ncells=12)
+
+    _, full_solution = solve(input_data, d_c)
+    decomposed_solver, decomposed_solution = solve(input_data, d_c, DecomposedLutoSolver)
+
+    assert decomposed_solver.telemetry['solves'][-1]['status'] == 'converged'
+    assert np.isclose(decomposed_solution.obj_val['SUM'], full_solution.obj_val['SUM'], rtol=1e-5, atol=1e-5)
+
+
+def test_decomposition_in_worker_processes_matches_serial(decomposition_settings, solver_input, solve, monkeypatch):
+    input_data, d_c = solver_input(5, ncells=12)
+    _, serial_solution = solve(input_data, d_c, DecomposedLutoSolver)
+
+    monkeypatch.setattr(settings, 'DECOMPOSITION_WORKERS', 2)
+    decomposed_solver, decomposed_solution = solve(input_data, d_c, DecomposedLutoSolver)
+
+    assert decomposed_solver.telemetry['solves'][-1]['status'] == 'converged'
+    assert np.isclose(decomposed_solution.obj_val['SUM'], serial_solution.obj_val['SUM'], rtol=1e-5, atol=1e-5)
+
+
+def test_decomposition_needs_an_iteration(decomposition_settings, solver_input, monkeypatch):
+    monkeypatch.setattr(settings, 'DECOMPOSITION_MAX_ITERATIONS', 0)
+    with pytest.raises(ValueError, match="DECOMPOSITION_MAX_ITERATIONS"):
+        DecomposedLutoSolver(*solver_input(5), 2011)
+
+
+def test_decomposition_stopped_with_artificial_variables_in_use_raises(decomposition_settings, solver_input, monkeypatch):
+    monkeypatch.setattr(settings, 'DECOMPOSITION_MAX_ITERATIONS', 1)
+    input_data, d_c = solver_input(5, ncells=12)
+
+    decomposed_solver = DecomposedLutoSolver(input_data, d_c, 2011)
+    decomposed_solver.formulate()
+    with pytest.raises(RuntimeError, match="did not find a feasible solution"):
+        decomposed_solver.solve()
+    assert decomposed_solver.telemetry['solves'][-1]['status'] == 'infeasible'
+    assert decomposed_solver.telemetry['solves'][-1]['objective'] is None
+
+
+def test_decomposition_stopped_before_convergence_records_gap(decomposition_settings, solver_input, solve, monkeypatch):
+    input_data, d_c = solver_input(5, ncells=12)
+    _, full_solution = solve(input_data, d_c)
+
+    monkeypatch.setattr(settings, 'DECOMPOSITION_MAX_ITERATIONS', 2)
+    decomposed_solver, decomposed_solution = solve(input_data, d_c, DecomposedLutoSolver)
+
+    record = decomposed_solver.telemetry['solves'][-1]
+    gap = float(record['status'].removeprefix("stopped at gap "))
+    assert gap > settings.DECOMPOSITION_GAP_TOLERANCE
+    assert record['objective'] == decomposed_solution.obj_val['SUM']
+    assert decomposed_solution.obj_val['SUM'] < full_solution.obj_val['SUM']
@@ -0,0 +1,60 @@
+"""
+Tests that the HiGHS backend solves the formulation of `LutoSolver` to the same optimum as Gurobi.
+"""
+
+import numpy as np
+import pytest
+
+from luto import settings
+from luto.solvers.solver import LutoSolver
+
+pytest.importorskip("highspy")
+from luto.solvers.highs_solver import HighsLutoSolver
+
+
+def _get_violation(luto_solver: LutoSolver, x: np.ndarray) -> float:
+    """
+    Return the largest violation of the bounds and constraint families of `luto_solver` by `x`.
+    """
+    violations = [np.max(luto_solver.var_lb - x), np.max(x - luto_solver.var_ub)]
+    for family in luto_solver.constraint_families.values():
+        slack = family.rhs - family.A @ x
+        violations.append(np.max({'<': -slack, '>': slack, '=': np.abs(slack)}[family.sense], initial=0))
+    return max(violations)
+
+
+@pytest.mark.parametrize("lp_scaling", [False, True])
+def test_highs_matches_gurobi(solver_settings, solver_input, monkeypatch, lp_scaling):
+    monkeypatch.setattr(settings, 'LP_SCALING', lp_scaling)
+    input_data, d_c = solver_input(3)
+
+    gurobi_solver = LutoSolver(input_data, d_c, 2011)
+    gurobi_solver.formulate()
+    gurobi_solution = gurobi_solver.solve()
+
+    highs_solver = HighsLutoSolver(input_data, d_c, 2011)
+    highs_solver.formulate()
+    highs_solution = highs_solver.solve()
+
+    assert highs_solver.ncols == gurobi_solver.ncols
+    assert np.isclose(highs_solution.obj_val['SUM'], gurobi_solution.obj_val['SUM'], rtol=1e-7, atol=1e-7)
+    assert _get_violation(gurobi_solver, highs_solver.X_sol) < 1e-7
+
+    # The objective of the HiGHS solution in the Gurobi model is the same
+    highs_objective = highs_solver.obj_coeffs @ highs_solver.X_sol + highs_solver.obj_con
+    gurobi_objective = gurobi_solver.obj_coeffs @ highs_solver.X_sol + gurobi_solver.gurobi_model.ObjCon / gurobi_solver.obj_scale
+    assert np.isclose(highs_objective, gurobi_objective)
+    assert np.isclose(highs_objective, gurobi_solution.obj_val['SUM'], rtol=1e-7, atol=1e-7)
+
+
+def test_highs_records_the_runtime_of_each_solve(solver_settings, solver_input):
+    input_data, d_c = solver_input(4)
+    highs_solver = HighsLutoSolver(input_data, d_c, 2011)
+    highs_solver.formulate()
+    for _ in range(2):
+        highs_solver.solve()
+
+    runtimes = [record['runtime'] for record in highs_solver.telemetry['solves']]
+    assert len(runtimes) == 2
+    assert np.isclose(sum(runtimes), highs_solver.highs.getRunTime())
+    assert runtimes[1] < highs_solver.highs.getRunTime()
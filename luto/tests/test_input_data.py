@@ -0,0 +1,146 @@
+"""
+Tests that the cached and vectorised builders of the solver input data give the same results as
+calculating them from scratch, cell by cell or region by region.
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from luto import settings
+import luto.economics.agricultural.transitions as ag_transitions
+import luto.economics.agricultural.water as ag_water
+import luto.solvers.input_data as input_data
+
+NCELLS = 50
+N_AG_LMS = 2
+N_AG_LUS = 28
+
+
+def _make_data(seed: int) -> SimpleNamespace:
+    """
+    Return the parts of a `Data` object used by the exclude matrices, with random exclusions and a
+    transition matrix where some transitions are not allowed.
+    """
+    rng = np.random.default_rng(seed)
+    ag_tmatrix = rng.random((N_AG_LUS, N_AG_LUS))
+    ag_tmatrix[rng.random((N_AG_LUS, N_AG_LUS)) < 0.3] = np.nan
+    lumap = rng.integers(0, N_AG_LUS, NCELLS)
+    return SimpleNamespace(
+        NCELLS=NCELLS,
+        N_AG_LUS=N_AG_LUS,
+        EXCLUDE=(rng.random((N_AG_LMS, NCELLS, N_AG_LUS)) < 0.7).astype(np.int8),
+        AG_TMATRIX=ag_tmatrix,
+        LUMAP=lumap,
+        EXCLUDE_MATRICES_CACHE={},
+        SOLVER_INPUT_CACHE={},
+        lumaps={2010: lumap},
+        lmmaps={2010: rng.integers(0, N_AG_LMS, NCELLS)},
+    )
+
+
+def _change_cells(data: SimpleNamespace, year: int, n_cells: int, seed: int):
+    """
+    Add land-use and land management maps for `year` with `n_cells` cells changed from the previous year;
+    some of the changed cells become non-agricultural.
+    """
+    rng = np.random.default_rng(seed)
+    lumap, lmmap = data.lumaps[year - 1].copy(), data.lmmaps[year - 1].copy()
+    cells = rng.choice(NCELLS, n_cells, replace=False)
+    lumap[cells] = rng.integers(0, N_AG_LUS, n_cells)
+    lumap[cells[::3]] = settings.NON_AGRICULTURAL_LU_BASE_CODE + 1
+    lmmap[cells[1::3]] = 1 - lmmap[cells[1::3]]
+    data.lumaps[year], data.lmmaps[year] = lumap, lmmap
+
+
+def test_exclude_matrices_cache_matches_calculation():
+    data = _make_data(0)
+    for year, n_cells in ((2011, 5), (2012, 40)):
+        _change_cells(data, year, n_cells, seed=year)
+
+    for _ in range(2):  # Calculated the first time, read from the cache the second time
+        for year, lumap in data.lumaps.items():
+            np.testing.assert_array_equal(
+                ag_transitions.get_exclude_matrices(data, lumap), ag_transitions.calc_exclude_matrices(data, lumap)
+            )
+    assert len(data.EXCLUDE_MATRICES_CACHE) == len(data.lumaps)
+
+    # Rows for a subset of cells are not cached
+    cells = np.array([3, 1, 4])
+    np.testing.assert_array_equal(
+        ag_transitions.get_exclude_matrices(data, data.LUMAP, cells),
+        ag_transitions.calc_exclude_matrices(data, data.LUMAP)[:, cells],
+    )
+    assert len(data.EXCLUDE_MATRICES_CACHE) == len(data.lumaps)
+
+
+def test_exclude_matrices_cache_evicts_oldest_lumaps():
+    data = _make_data(1)
+    lumaps = [np.roll(data.LUMAP, shift) for shift in range(ag_transitions.EXCLUDE_MATRICES_CACHE_SIZE + 2)]
+    for lumap in lumaps:
+        ag_transitions.get_exclude_matrices(data, lumap)
+
+    assert len(data.EXCLUDE_MATRICES_CACHE) == ag_transitions.EXCLUDE_MATRICES_CACHE_SIZE
+    assert ag_transitions.get_lumap_hash(lumaps[0]) not in data.EXCLUDE_MATRICES_CACHE
+    assert ag_transitions.get_lumap_hash(lumaps[-1]) in data.EXCLUDE_MATRICES_CACHE
+
+
+@pytest.mark.parametrize("n_changed_cells", [0, 4, 40])
+def test_lumap_dependent_input_patching_matches_recalculation(n_changed_cells):
+    data = _make_data(2)
+    _change_cells(data, 2011, n_changed_cells, seed=3)
+
+    for year in (2010, 2011):
+        output = input_data.get_lumap_dependent_input(data, 'ag_x_mrj', year, input_data.get_ag_x_mrj, year)
+        np.testing.assert_array_equal(output, ag_transitions.calc_exclude_matrices(data, data.lumaps[year]))
+
+    # The cached input is kept for the maps it was calculated for
+    cached_lumap, cached_lmmap, _ = data.SOLVER_INPUT_CACHE['ag_x_mrj']
+    np.testing.assert_array_equal(cached_lumap, data.lumaps[2011])
+    np.testing.assert_array_equal(cached_lmmap, data.lmmaps[2011])
+
+
+def test_patch_cell_rows_of_dict_inputs():
+    rng = np.random.default_rng(4)
+    arr = {'a': rng.random((2, NCELLS, 3)), 'b': rng.random((2, NCELLS, 3))}
+    cells = np.array([5, 0, 7])
+    rows = {key: rng.random((2, cells.size, 3)) for key in arr}
+
+    patched = input_data.patch_cell_rows(arr, rows, cells, cell_axis=1)
+
+    for key in arr:
+        expected = arr[key].copy()
+        for i, cell in enumerate(cells):
+            expected[:, cell] = rows[key][:, i]
+        np.testing.assert_array_equal(patched[key], expected)
+        assert not np.shares_memory(patched[key], arr[key])
+
+
+@pytest.mark.parametrize("region_def", ['River Region', 'Drainage Division'])
+def test_water_region_matrix_matches_per_region_sums(region_def):
+    rng = np.random.default_rng(5)
+    rivreg_id = rng.integers(0, 6, NCELLS)          # Cells in region 0 have no region name
+    draindiv_id = rng.integers(1, 4, NCELLS)
+    data = SimpleNamespace(
+        NCELLS=NCELLS,
+        WATER_REGION_MATRICES={},
+        RIVREG_LIMITS=None,
+        RIVREG_ID=rivreg_id,
+        RIVREG_DICT={5: 'E', 2: 'B', 1: 'A', 4: 'D', 7: 'G'},      # Region 7 has no cells
+        DRAINDIV_LIMITS=None,
+        DRAINDIV_ID=draindiv_id,
+        DRAINDIV_DICT={1: 'A', 2: 'B', 3: 'C'},
+    )
+    _, region_id, region_names = ag_water.get_water_region_definition(data, region_def)
+    arr_r = rng.random(NCELLS)
+    arr_rk = rng.random((NCELLS, 4))
+
+    region_ids, region_matrix = ag_water.get_water_region_matrix(data, region_def)
+
+    assert region_ids == list(region_names)
+    expected_r = [arr_r[np.flatnonzero(region_id == region)].sum() for region in region_ids]
+    expected_rk = [arr_rk[np.flatnonzero(region_id == region)].sum(axis=0) for region in region_ids]
+    np.testing.assert_allclose(region_matrix @ arr_r, expected_r)
+    np.testing.assert_allclose(region_matrix @ arr_rk, expected_rk)
+    assert ag_water.get_water_region_matrix(data, region_def)[1] is region_matrix
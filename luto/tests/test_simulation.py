@@ -0,0 +1,100 @@
+"""
+Tests of the solve loops of `luto.simulation`, on random solver input data for each year.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+import pytest
+
+from luto import settings, simulation
+
+
+def _make_run_data(run_data, solver_input, years):
+    input_data, d_c = {}, {}
+    for yr in years:
+        input_data[yr], d_c[yr] = solver_input(yr)
+    return run_data(input_data, d_c)
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason="The snapshot workers are forked")
+def test_snapshot_workers_match_serial_solves(run_data, solver_input, monkeypatch):
+    monkeypatch.setattr(settings, 'MODE', 'snapshot')
+    targets = [2011, 2012, 2013]
+    results = {}
+    for n_workers in (1, 2):
+        monkeypatch.setattr(settings, 'SNAPSHOT_WORKERS', n_workers)
+        data = _make_run_data(run_data, solver_input, targets)
+        simulation.solve_snapshots(data, 2010, targets)
+        results[n_workers] = data
+
+    serial, concurrent = results[1], results[2]
+    for target in targets:
+        assert concurrent.obj_vals[target]['SUM'] == pytest.approx(serial.obj_vals[target]['SUM'], rel=1e-9, abs=1e-9)
+        np.testing.assert_allclose(concurrent.ag_dvars[target], serial.ag_dvars[target], atol=1e-9)
+    assert simulation.snapshot_data is None
+
+    # Each worker wrote its own Gurobi log to the output folder
+    assert len([name for name in os.listdir(concurrent.path) if name.startswith('gurobi_')]) == 2
+
+
+class _WritePool(ThreadPoolExecutor):
+    """
+    Thread pool that keeps the futures it was given and whether it was shut down.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.futures = []
+        self.is_shut_down = False
+
+    def submit(self, *args, **kwargs):
+        self.futures.append(super().submit(*args, **kwargs))
+        return self.futures[-1]
+
+    def shutdown(self, *args, **kwargs):
+        self.is_shut_down = True
+        super().shutdown(*args, **kwargs)
+
+
+def test_failed_write_stops_the_timeseries(run_data, solver_input, monkeypatch):
+    monkeypatch.setattr(settings, 'WRITE_DURING_RUN', True)
+    pools = []
+
+    def make_pool(*args, **kwargs):
+        pools.append(_WritePool(*args, **kwargs))
+        return pools[-1]
+
+    monkeypatch.setattr(simulation, 'ThreadPoolExecutor', make_pool)
+
+    # The write of 2012 fails once 2013 is being solved, and before 2014 is
+    written, solving_2013 = [], threading.Event()
+
+    def write_output_single_year(data, yr, path_yr, yr_cal_sim_pre=None):
+        if yr == 2012:
+            solving_2013.wait()
+            raise OSError(f"Cannot write {path_yr}")
+        written.append(yr)
+
+    monkeypatch.setattr(simulation, 'write_output_single_year', write_output_single_year)
+
+    get_input_data = simulation.get_input_data
+
+    def get_input_data_after_writes(data, base, target):
+        if target == 2013:
+            solving_2013.set()
+            wait(pools[0].futures)
+        return get_input_data(data, base, target)
+
+    monkeypatch.setattr(simulation, 'get_input_data', get_input_data_after_writes)
+
+    data = _make_run_data(run_data, solver_input, range(2011, 2015))
+    with pytest.raises(OSError, match="out_2012"):
+        simulation.solve_timeseries(data, 4, 2010, 2014)
+
+    assert sorted(data.obj_vals) == [2011, 2012, 2013]
+    assert pools[0].is_shut_down
+    assert written[:2] == [2010, 2011] and not data.written_years
@@ -0,0 +1,349 @@
+"""
+Tests that the matrix formulation of `LutoSolver` builds the same LP as the per-variable formulation it
+replaced, and that updating it in place, or scaling it, does not change the LP or its solution.
+"""
+
+import dataclasses
+import itertools
+from typing import NamedTuple
+
+import numpy as np
+import pytest
+from gurobipy import GRB
+
+from luto import settings
+from luto.settings import AG_MANAGEMENTS_REVERSIBLE, NON_AG_LAND_USES, NON_AG_LAND_USES_REVERSIBLE
+from luto.solvers.solver import LutoSolver
+import luto.tools as tools
+
+
+class _Var(NamedTuple):
+    name: str
+    r: int
+    lb: float
+    ub: float
+    obj: float
+    q_c: np.ndarray
+    w: float
+    g: float
+    b: float
+
+
+def _get_reference_formulation(input_data, d_c) -> tuple[dict, float, list]:
+    """
+    Build the LP variable by variable, following the formulation that the sparse matrices replaced.
+
+    Returns ({variable name: (lb, ub, objective coefficient)}, objective constant, [({variable name: coefficient}, sense, rhs)]).
+    """
+    weight = settings.SOLVE_ECONOMY_WEIGHT
+    ag_obj_mrj, non_ag_obj_rk, ag_man_objs = input_data.economic_contr_mrj
+    pr2cm_cp = input_data.pr2cm_cp.astype(float)
+    lm_names = ('dry', 'irr')
+
+    def get_q_c(q_p, j):
+        return pr2cm_cp @ (input_data.lu2pr_pj[:, j] * q_p)
+
+    ag_vars, non_ag_vars, am_vars = {}, [], {}
+    for m, j in itertools.product(range(input_data.n_ag_lms), range(input_data.n_ag_lus)):
+        for r in np.flatnonzero(input_data.ag_x_mrj[m, :, j]):
+            ag_vars[m, j, r] = _Var(
+                f"X_ag_{lm_names[m]}_{j}_{r}", r, 0, 1, ag_obj_mrj[m, r, j] * weight,
+                get_q_c(input_data.ag_q_mrp[m, r], j), input_data.ag_w_mrj[m, r, j],
+                input_data.ag_g_mrj[m, r, j] + input_data.ag_ghg_t_mrj[m, r, j], input_data.ag_b_mrj[m, r, j],
+            )
+
+    for k, lu in enumerate(NON_AG_LAND_USES):
+        if not NON_AG_LAND_USES[lu]:
+            continue
+        for r in np.flatnonzero(input_data.non_ag_x_rk[:, k]):
+            lb = 0 if NON_AG_LAND_USES_REVERSIBLE[lu] else input_data.non_ag_lb_rk[r, k]
+            non_ag_vars.append(_Var(
+                f"X_non_ag_{k}_{r}", r, lb, input_data.non_ag_x_rk[r, k], non_ag_obj_rk[r, k] * weight,
+                input_data.non_ag_q_crk[:, r, k], input_data.non_ag_w_rk[r, k],
+                input_data.non_ag_g_rk[r, k], input_data.non_ag_b_rk[r, k],
+            ))
+
+    for am, am_j_list in input_data.am2j.items():
+        am_name = tools.am_name_snake_case(am)
+        for (j_idx, j), m in itertools.product(enumerate(am_j_list), range(input_data.n_ag_lms)):
+            for r in np.flatnonzero(input_data.ag_x_mrj[m, :, j]):
+                lb = 0 if AG_MANAGEMENTS_REVERSIBLE[am] else input_data.ag_man_lb_mrj[am][m, r, j]
+                am_vars[am, m, j, r] = _Var(
+                    f"X_ag_man_{lm_names[m]}_{am_name}_{j}_{r}", r, lb, 1, ag_man_objs[am][m, r, j_idx] * weight,
+                    get_q_c(input_data.ag_man_q_mrp[am][m, r], j), input_data.ag_man_w_mrj[am][m, r, j_idx],
+                    input_data.ag_man_g_mrj[am][m, r, j_idx], input_data.ag_man_b_mrj[am][m, r, j_idx],
+                )
+
+    x_vars = [*ag_vars.values(), *non_ag_vars, *am_vars.values()]
+    columns = {v.name: (v.lb, v.ub, v.obj) for v in x_vars}
+    rows = []
+
+    # Cell usage, agricultural management and adoption limits
+    for r in range(input_data.ncells):
+        rows.append(({v.name: 1 for v in [*ag_vars.values(), *non_ag_vars] if v.r == r}, '=', 1))
+    for (am, m, j, r), v in am_vars.items():
+        rows.append(({v.name: 1, ag_vars[m, j, r].name: -1}, '<', 0))
+    for am, am_j_list in input_data.am2j.items():
+        for j in am_j_list:
+            limit = input_data.ag_man_limits[am][j]
+            row = {v.name: 1 for (am_, _, j_, _), v in am_vars.items() if (am_, j_) == (am, j)}
+            row.update({v.name: -limit for (_, j_, _), v in ag_vars.items() if j_ == j})
+            rows.append((row, '<', 0))
+
+    # Demand
+    if settings.DEMAND_CONSTRAINT_TYPE == 'soft':
+        prices = input_data.economic_BASE_YR_prices
+        for c in range(d_c.size):
+            columns[f"V[{c}]"] = (0, np.inf, -prices[c] * (1 - weight))
+            rows.append(({**{v.name: -v.q_c[c] for v in x_vars}, f"V[{c}]": -1}, '<', -d_c[c]))
+            rows.append(({**{v.name: v.q_c[c] for v in x_vars}, f"V[{c}]": -1}, '<', d_c[c]))
+    else:
+        for c in range(d_c.size):
+            rows.append(({v.name: v.q_c[c] for v in x_vars}, '>', d_c[c]))
+
+    # Water
+    for region, (_, limit, ind) in input_data.limits['water'].items():
+        if settings.WATER_REGION_DEF == 'River Region':
+            limit = min(limit, input_data.water_yield_RR_BASE_YR[region])
+        outside = input_data.water_yield_outside_study_area[region]
+        rows.append(({v.name: v.w for v in x_vars if v.r in ind}, '>', limit - outside))
+
+    # GHG emissions
+    ghg_ub, ghg_lb = input_data.limits['ghg_ub'], input_data.limits['ghg_lb']
+    offland_ghg = input_data.offland_ghg.item()
+    ghg = {v.name: v.g for v in x_vars}
+    if settings.GHG_CONSTRAINT_TYPE == 'soft':
+        columns["E"] = (0, np.inf, -input_data.economic_target_yr_carbon_price * (1 - weight))
+        rows.append(({**ghg, "E": -1}, '<', ghg_ub - offland_ghg))
+        rows.append(({**{name: -g for name, g in ghg.items()}, "E": -1}, '<', offland_ghg - ghg_ub))
+    else:
+        rows.append((ghg, '<', ghg_ub - offland_ghg))
+        rows.append((ghg, '>', ghg_lb - offland_ghg))
+
+    # Biodiversity
+    rows.append(({v.name: v.b for v in x_vars}, '>', input_data.limits['biodiversity']))
+
+    return columns, -input_data.economic_base_sum * weight, rows
+
+
+def _get_model_formulation(luto_solver: LutoSolver) -> tuple[dict, float, list]:
+    """
+    Read the LP back from the Gurobi model, in the form of `_get_reference_formulation`.
+    """
+    model = luto_solver.gurobi_model
+    model.update()
+    columns = {var.VarName: (var.LB, var.UB, var.Obj) for var in model.getVars()}
+    rows = []
+    for constr in model.getConstrs():
+        expr = model.getRow(constr)
+        rows.append(({expr.getVar(i).VarName: expr.getCoeff(i) for i in range(expr.size())}, constr.Sense, constr.RHS))
+    return columns, model.ObjCon, rows
+
+
+def _get_canonical_rows(rows: list) -> list:
+    """
+    Return the rows as sorted, rounded tuples without zero coefficients, with '>' rows negated to '<'.
+    """
+    canonical = []
+    for coeffs, sense, rhs in rows:
+        sign = -1 if sense == '>' else 1
+        terms = tuple(sorted((name, round(sign * coeff, 8)) for name, coeff in coeffs.items() if coeff != 0))
+        canonical.append((terms, '=' if sense == '=' else '<', round(sign * rhs, 8)))
+    return sorted(canonical)
+
+
+def _assert_same_formulation(actual: tuple, expected: tuple):
+    actual_columns, actual_obj_con, actual_rows = actual
+    expected_columns, expected_obj_con, expected_rows = expected
+
+    assert actual_columns.keys() == expected_columns.keys()
+    names = list(expected_columns)
+    actual_lb_ub_obj = np.array([actual_columns[name] for name in names])
+    expected_lb_ub_obj = np.array([expected_columns[name] for name in names])
+    np.testing.assert_allclose(
+        np.minimum(actual_lb_ub_obj, GRB.INFINITY), np.minimum(expected_lb_ub_obj, GRB.INFINITY), rtol=1e-9, atol=1e-12
+    )
+    assert np.isclose(actual_obj_con, expected_obj_con)
+    assert _get_canonical_rows(actual_rows) == _get_canonical_rows(expected_rows)
+
+
+def _perturb(input_data, d_c, seed: int):
+    """
+    Return a copy of the input data with a few cells' exclusions and water yields changed, and changed demands.
+    """
+    rng = np.random.default_rng(seed)
+    ag_x_mrj = input_data.ag_x_mrj.copy()
+    flips = rng.integers(0, ag_x_mrj.size, 3)
+    ag_x_mrj.flat[flips] = 1 - ag_x_mrj.flat[flips]
+    ag_w_mrj = input_data.ag_w_mrj.copy()
+    ag_w_mrj[:, 0, :] += 1.0
+    input_data = dataclasses.replace(input_data, target_year=input_data.target_year + 1, ag_x_mrj=ag_x_mrj, ag_w_mrj=ag_w_mrj)
+    return input_data, d_c * 1.1
+
+
+@pytest.mark.parametrize("demand_type, ghg_type", list(itertools.product(['soft', 'hard'], ['soft', 'hard'])))
+def test_formulation_matches_per_variable_formulation(solver_settings, solver_input, monkeypatch, demand_type, ghg_type):
+    monkeypatch.setattr(settings, 'DEMAND_CONSTRAINT_TYPE', demand_type)
+    monkeypatch.setattr(settings, 'GHG_CONSTRAINT_TYPE', ghg_type)
+    input_data, d_c = solver_input(0)
+
+    luto_solver = LutoSolver(input_data, d_c, 2011)
+    luto_solver.formulate()
+
+    _assert_same_formulation(_get_model_formulation(luto_solver), _get_reference_formulation(input_data, d_c))
+    assert luto_solver.gurobi_model.ModelSense == GRB.MAXIMIZE
+
+
+@pytest.mark.parametrize("new_input", ['perturbed', 'random'])
+def test_update_formulation_matches_formulate(solver_settings, solver_input, new_input):
+    input_data, d_c = solver_input(0)
+    if new_input == 'perturbed':
+        new_input_data, new_d_c = _perturb(input_data, d_c, seed=1)
+    else:
+        new_input_data, new_d_c = solver_input(1)
+
+    updated_solver = LutoSolver(input_data, d_c, 2012)
+    updated_solver.formulate()
+    updated_solver.solve()
+    updated_solver.update_formulation(new_input_data, new_d_c)
+
+    fresh_solver = LutoSolver(new_input_data, new_d_c, 2012)
+    fresh_solver.formulate()
+
+    _assert_same_formulation(_get_model_formulation(updated_solver), _get_model_formulation(fresh_solver))
+    _assert_same_formulation(_get_model_formulation(updated_solver), _get_reference_formulation(new_input_data, new_d_c))
+
+
+def test_lp_scaling_keeps_solution_and_duals(solver_settings, solver_input, monkeypatch):
+    monkeypatch.setattr(settings, 'PRESOLVE', 0)    # Solve from the given basis
+    input_data, d_c = solver_input(2)
+    d_c = d_c * 1000                                # Demands far from one, so the deviation columns are scaled
+
+    solvers, solutions = {}, {}
+    for lp_scaling in (False, True):
+        monkeypatch.setattr(settings, 'LP_SCALING', lp_scaling)
+        solvers[lp_scaling] = LutoSolver(input_data, d_c, 2011)
+        solvers[lp_scaling].formulate()
+
+    # The LP is degenerate, so start the scaled model from the unscaled optimal basis to compare the same duals
+    unscaled, scaled = solvers[False], solvers[True]
+    solutions[False] = unscaled.solve()
+    scaled.gurobi_model.update()
+    scaled.X.VBasis = unscaled.X.VBasis
+    for name, family in scaled.constraint_families.items():
+        family.constrs.CBasis = unscaled.constraint_families[name].constrs.CBasis
+    monkeypatch.setattr(settings, 'LP_SCALING', True)
+    solutions[True] = scaled.solve()
+
+    assert not np.all(scaled.col_scale == 1) and scaled.obj_scale != 1
+    assert scaled.gurobi_model.IterCount == 0
+    assert np.isclose(solutions[True].obj_val['SUM'], solutions[False].obj_val['SUM'], rtol=1e-9)
+    np.testing.assert_allclose(scaled.X_sol, unscaled.X_sol, rtol=1e-7, atol=1e-9)
+    np.testing.assert_allclose(scaled.get_reduced_costs(), unscaled.get_reduced_costs(), rtol=1e-7, atol=1e-9)
+    scaled_duals, unscaled_duals = scaled.get_duals(), unscaled.get_duals()
+    assert scaled_duals.keys() == unscaled_duals.keys()
+    for name in unscaled_duals:
+        np.testing.assert_allclose(scaled_duals[name], unscaled_duals[name], rtol=1e-7, atol=1e-9, err_msg=name)
+
+
+def test_start_of_formulated_model_is_used(solver_settings, solver_input, monkeypatch):
+    monkeypatch.setattr(settings, 'PRESOLVE', 0)
+    input_data, d_c = solver_input(2)
+    cold_solver = LutoSolver(input_data, d_c, 2011)
+    cold_solver.formulate()
+    cold_solution = cold_solver.solve()
+
+    started_solver = LutoSolver(input_data, d_c, 2011)
+    started_solver.formulate()
+    started_solver.set_start(cold_solver.X_sol, cold_solver.get_duals())
+    started_solution = started_solver.solve()
+
+    assert np.isclose(started_solution.obj_val['SUM'], cold_solution.obj_val['SUM'])
+    assert started_solver.gurobi_model.IterCount < cold_solver.gurobi_model.IterCount / 2
+
+
+def test_reduced_cost_pruning_keeps_the_optimum(solver_settings, solver_input, solve, monkeypatch):
+    monkeypatch.setattr(settings, 'REDUCED_COST_PRUNING', True)
+    input_data, d_c = solver_input(6)
+    luto_solver, _ = solve(input_data, d_c)
+
+    new_input_data, new_d_c = _perturb(input_data, d_c, seed=7)
+    luto_solver.update_formulation(new_input_data, new_d_c)
+    pruned = luto_solver.pruned.copy()
+    assert pruned.any()
+    solution = luto_solver.solve()
+
+    # The pruned variables that price out were added back and the year solved again, until none did
+    assert len(luto_solver.telemetry['solves']) > 1
+    assert luto_solver.pruned.sum() < pruned.sum() and not (luto_solver.pruned & ~pruned).any()
+    tolerance = settings.OPTIMALITY_TOLERANCE / (luto_solver.col_scale * luto_solver.obj_scale)
+    assert (luto_solver.get_reduced_costs()[luto_solver.pruned] <= tolerance[luto_solver.pruned]).all()
+
+    _, cold_solution = solve(new_input_data, new_d_c)
+    assert solution.obj_val['SUM'] == pytest.approx(cold_solution.obj_val['SUM'], rel=1e-7, abs=1e-7)
+
+
+def _move_land_use(input_data, d_c):
+    """
+    Return a copy of the input data where a land use with agricultural management options becomes feasible in one
+    cell and infeasible in another, so that variables and agricultural management rows are added and removed,
+    and changed demands.
+    """
+    j = next(iter(input_data.am2j.values()))[0]
+    ag_x_mrj = input_data.ag_x_mrj.copy()
+    added, removed = np.flatnonzero(ag_x_mrj[0, :, j] == 0)[0], np.flatnonzero(ag_x_mrj[0, :, j] == 1)[0]
+    ag_x_mrj[0, added, j], ag_x_mrj[0, removed, j] = 1, 0
+    return dataclasses.replace(input_data, target_year=input_data.target_year + 1, ag_x_mrj=ag_x_mrj), d_c * 1.05
+
+
+@pytest.mark.parametrize("first_method", [1, 2])
+def test_warm_start_carries_the_previous_solve_over(solver_settings, solver_input, solve, monkeypatch, first_method):
+    monkeypatch.setattr(settings, 'TIMESERIES_WARM_START', 'simplex')
+    monkeypatch.setattr(settings, 'PRESOLVE', 0)
+    monkeypatch.setattr(settings, 'SOLVE_METHOD', first_method)
+    monkeypatch.setattr(settings, 'CROSSOVER', 0)        # Barrier then leaves no basis
+    input_data, d_c = solver_input(8, ncells=12)
+    luto_solver, _ = solve(input_data, d_c)
+
+    # The previous solve by variable name, and by the variable each agricultural management row is keyed by
+    start = luto_solver.warm_start
+    assert (start['vbasis'] is None) == (first_method == 2)
+    old_names = luto_solver.X.VarName
+    old_am_keys = old_names[start['row_keys']['ag_management']]
+    if first_method == 1:
+        old_cols = dict(zip(old_names, start['vbasis']))
+        old_am_rows = dict(zip(old_am_keys, start['cbasis']['ag_management']))
+    else:
+        old_cols = dict(zip(old_names, start['x']))
+        old_am_rows = dict(zip(old_am_keys, start['pi']['ag_management']))
+
+    new_input_data, new_d_c = _move_land_use(input_data, d_c)
+    warm_starts = []
+    _get_warm_start = luto_solver._get_warm_start
+
+    def get_warm_start(old_cols):
+        warm_starts.append(_get_warm_start(old_cols))
+        return warm_starts[-1]
+
+    monkeypatch.setattr(luto_solver, '_get_warm_start', get_warm_start)
+    luto_solver.update_formulation(new_input_data, new_d_c)
+    (col_start, row_starts), = warm_starts
+
+    luto_solver.gurobi_model.update()
+    names = luto_solver.X.VarName
+    am_keys = names[luto_solver.constraint_families['ag_management'].row_keys]
+    assert not set(names) <= set(old_names) and not set(old_names) <= set(names)
+    assert not set(am_keys) <= set(old_am_keys) and not set(old_am_keys) <= set(am_keys)
+
+    # New variables start at their lower bound and new rows with a basic slack, or at zero (the LP is not scaled)
+    default = -1 if first_method == 1 else 0
+    np.testing.assert_array_equal(col_start, [old_cols.get(name, default) for name in names])
+    np.testing.assert_array_equal(row_starts['ag_management'], [old_am_rows.get(key, 0) for key in am_keys])
+    assert row_starts.keys() == start['pi'].keys()
+    assert luto_solver.gurobi_model.Params.Method == 1
+
+    solution = luto_solver.solve()
+    cold_solver, cold_solution = solve(new_input_data, new_d_c)
+    assert solution.obj_val['SUM'] == pytest.approx(cold_solution.obj_val['SUM'], rel=1e-7, abs=1e-7)
+    if first_method == 1:
+        assert luto_solver.gurobi_model.IterCount < cold_solver.gurobi_model.IterCount
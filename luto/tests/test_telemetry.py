@@ -0,0 +1,72 @@
+"""
+Tests of the solve records of `GurobiTelemetryCallback`.
+"""
+
+import pytest
+from gurobipy import GRB
+
+from luto import settings
+from luto.solvers import telemetry
+from luto.solvers.telemetry import GurobiTelemetryCallback
+
+
+class _CallbackModel:
+    """
+    Stands in for the model passed to a callback, with the values of `cbGet` set by the test.
+    """
+
+    def __init__(self):
+        self.values = {}
+
+    def cbGet(self, what):
+        return self.values.get(what, 0.0)
+
+
+@pytest.mark.parametrize("method", [-1, 1, 2, 3])
+def test_phases_are_labelled_by_the_algorithm_that_solved_the_model(solver_settings, solver_input, solve, monkeypatch, method):
+    monkeypatch.setattr(settings, 'SOLVE_METHOD', method)
+    monkeypatch.setattr(settings, 'THREADS', 4)
+    luto_solver, _ = solve(*solver_input(7, ncells=14))
+    record, model = luto_solver.telemetry['solves'][-1], luto_solver.gurobi_model
+    phases = {phase for phase in telemetry.SOLVE_PHASES if record[f"{phase}_time"] is not None}
+    progress_phases = {progress['phase'] for progress in record['progress']}
+
+    if model.BarIterCount > 0:
+        assert 'barrier' in phases and 'simplex' not in phases
+        assert progress_phases <= {'barrier', 'crossover', 'simplex'}
+    else:
+        assert 'simplex' in phases and 'barrier' not in phases and 'crossover' not in phases
+        assert 'crossover' not in progress_phases
+    if method == 1:
+        assert progress_phases == {'simplex'}
+    if method == 2:
+        assert 'crossover' in phases
+    assert sum(record[f"{phase}_time"] for phase in phases) == pytest.approx(record['runtime'])
+
+
+def test_progress_is_recorded_when_iterations_or_time_advanced():
+    callback = GurobiTelemetryCallback()
+    model = _CallbackModel()
+
+    def call(where, iteration, runtime):
+        model.values[GRB.Callback.RUNTIME] = runtime
+        model.values[GRB.Callback.SPX_ITRCNT if where == GRB.Callback.SIMPLEX else GRB.Callback.BARRIER_ITRCNT] = iteration
+        callback(model, where)
+
+    step = telemetry.PROGRESS_ITERATIONS['simplex']
+    for i in range(5 * step):
+        call(GRB.Callback.SIMPLEX, i, i * 1e-5)
+    assert [p['iteration'] for p in callback.progress] == [step * i for i in range(5)]
+
+    # Without iterations, simplex is recorded once enough time passed
+    call(GRB.Callback.SIMPLEX, 5 * step, 4.0)
+    call(GRB.Callback.SIMPLEX, 5 * step, 4.0 + telemetry.PROGRESS_SECONDS / 2)
+    call(GRB.Callback.SIMPLEX, 5 * step, 4.0 + telemetry.PROGRESS_SECONDS)
+    assert [p['time'] for p in callback.progress[-2:]] == [4.0, 4.0 + telemetry.PROGRESS_SECONDS]
+
+    # Every barrier iteration is recorded, and so is the first simplex callback after barrier
+    for i in range(3):
+        call(GRB.Callback.BARRIER, i, 5.0 + i * 1e-3)
+    call(GRB.Callback.SIMPLEX, 5 * step + 1, 5.1)
+    assert [p['phase'] for p in callback.progress[-4:]] == ['barrier'] * 3 + ['simplex']
+    assert callback.simplex_resume_time == 5.1
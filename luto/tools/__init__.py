@@ -607,7 +607,8 @@ def read_dvars(yr:int, df_yr: pd.DataFrame) -> tuple:
     
 def calc_water(
     data, 
-    ind:np.ndarray, 
+    region_matrix, 
+    region_names:list[str], 
     ag_w_mrj:np.ndarray, 
     non_ag_w_rk:np.ndarray, 
     ag_man_w_mrj:np.ndarray, 
@@ -619,57 +620,49 @@ def calc_water(
     '''
     Note:
         This function is only used for the `write_water` in the `luto.tools.write` module.
-        Calculate water yields for year given the index. 
+        Calculate water yields for year for all regions at once, by multiplying the sparse
+        (region x cell) `region_matrix` with the cell-wise water yields of every land use. 
     
     Return:
     - pd.DataFrame, the water yields for year and region.
     '''
     
     # Calculate water yields for year and region.
-    index_levels = ['Landuse Type', 'Landuse', 'Water_supply',  'Water Net Yield (ML)']
-
-    # Agricultural contribution
-    ag_mrj = ag_w_mrj[:, ind, :] * ag_dvar[:, ind, :]   
-    ag_jm = np.einsum('mrj->jm', ag_mrj)                             
-    ag_df = pd.DataFrame(
-        ag_jm.reshape(-1).tolist(),
-        index=pd.MultiIndex.from_product(
-            [['Agricultural Landuse'],
-                data.AGRICULTURAL_LANDUSES,
-                data.LANDMANS])).reset_index()
-    ag_df.columns = index_levels
+    index_levels = ['Landuse Type', 'Landuse', 'Water_supply']
+
+    # Agricultural contribution, flattened to cell x (landuse, water_supply)
+    ag_rjm = np.einsum('mrj,mrj->rjm', ag_w_mrj, ag_dvar)
+    ag_cols = pd.MultiIndex.from_product(
+        [['Agricultural Landuse'], data.AGRICULTURAL_LANDUSES, data.LANDMANS])
 
     # Non-agricultural contribution
-    non_ag_rk = non_ag_w_rk[ind, :] * non_ag_dvar[ind, :]  # Non-agricultural contribution
-    non_ag_k = np.einsum('rk->k', non_ag_rk)                             # Sum over cells
-    non_ag_df = pd.DataFrame(
-        non_ag_k, 
-        index= pd.MultiIndex.from_product([
-                ['Non-agricultural Landuse'],
-                settings.NON_AG_LAND_USES.keys() ,
-                ['dry']  # non-agricultural land is always dry
-    ])).reset_index()
-    non_ag_df.columns = index_levels
+    non_ag_rk = non_ag_w_rk * non_ag_dvar
+    non_ag_cols = pd.MultiIndex.from_product([
+        ['Non-agricultural Landuse'],
+        settings.NON_AG_LAND_USES.keys(),
+        ['dry']  # non-agricultural land is always dry
+    ])
 
     # Agricultural managements contribution
-    AM_dfs = []
-    for am, am_lus in AG_MANAGEMENTS_TO_LAND_USES.items():  # Agricultural managements contribution
+    am_rjms, am_cols = [], []
+    for am, am_lus in AG_MANAGEMENTS_TO_LAND_USES.items():
         am_j = np.array([data.DESC2AGLU[lu] for lu in am_lus])
-        am_mrj = ag_man_w_mrj[am][:, ind, :] * am_dvar[am][:, ind, :][:, :, am_j] 
-        am_jm = np.einsum('mrj->jm', am_mrj)
-        # water yields for each agricultural management in long dataframe format
-        df_am = pd.DataFrame(
-            am_jm.reshape(-1).tolist(),
-            index=pd.MultiIndex.from_product([
-                ['Agricultural Management'],
-                am_lus,
-                data.LANDMANS
-                ])).reset_index()
-        df_am.columns = index_levels
-        AM_dfs.append(df_am)
-    AM_df = pd.concat(AM_dfs)
-    
-    return pd.concat([ag_df, non_ag_df, AM_df])
+        am_rjms.append(np.einsum('mrj,mrj->rjm', ag_man_w_mrj[am], am_dvar[am][:, :, am_j]))
+        am_cols.append(pd.MultiIndex.from_product(
+            [['Agricultural Management'], am_lus, data.LANDMANS]))
+
+    # Sum each contribution by region with a sparse product, and stack the small (region x col) results
+    w_region_cols = np.hstack(
+        [region_matrix @ ag_rjm.reshape(data.NCELLS, -1), region_matrix @ non_ag_rk]
+        + [region_matrix @ am_rjm.reshape(data.NCELLS, -1) for am_rjm in am_rjms]
+    )
+    cols = ag_cols.append([non_ag_cols, *am_cols]).set_names(index_levels)
+    wny_df = pd.DataFrame(
+        w_region_cols.T,
+        index=cols,
+        columns=pd.Index(region_names, name='region'))
+
+    return wny_df.melt(ignore_index=False, value_name='Water Net Yield (ML)').reset_index()
 
 
 class LogToFile:
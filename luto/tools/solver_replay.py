@@ -0,0 +1,135 @@
+# Copyright 2022 Fjalar J. de Haan and Brett A. Bryan at Deakin University
+#
+# This file is part of LUTO 2.0.
+#
+# LUTO 2.0 is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# LUTO 2.0 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# LUTO 2.0. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Replays the models written by `LutoSolver` (with `settings.WRITE_SOLVER_MODELS` on) under different
+solver settings, without loading data or formulating the model again. For each model and combination of
+settings it reports the status, solve time, iteration counts and the drift of the objective from the
+objective of the pipeline's own solve.
+
+Edit `REPLAY_GRID` below and run `python -m luto.tools.solver_replay`.
+"""
+
+import os
+import json
+import itertools
+import numpy as np
+import pandas as pd
+import gurobipy as gp
+
+from glob import glob
+from luto import settings
+from luto.solvers.solver import get_gurobi_env
+
+
+# Settings to replay the models with; every combination is solved. Settings not listed keep their value in settings.py
+REPLAY_GRID = {
+    'SOLVE_METHOD': [2, 1],
+    'PRESOLVE': [0, -1],
+    'BARHOMOGENOUS': [1, 0],
+    'CROSSOVER': [0, -1],
+    'FEASIBILITY_TOLERANCE': [settings.FEASIBILITY_TOLERANCE],
+    'OPTIMALITY_TOLERANCE': [settings.OPTIMALITY_TOLERANCE],
+    'BARRIER_CONVERGENCE_TOLERANCE': [settings.BARRIER_CONVERGENCE_TOLERANCE],
+    'THREADS': [settings.THREADS],
+}
+
+
+def replay_model(model_path: str, overrides: dict, solver: str = 'gurobi') -> dict:
+    """
+    Solves the model at `model_path` with the settings in `overrides` changed, using 'gurobi' or 'highs'.
+    Returns the status, solve time, iteration counts, objective and solution of the solve.
+    """
+    if solver == 'gurobi':
+        env = get_gurobi_env(overrides, logfilename="")
+        model = gp.read(model_path, env=env)
+        model.optimize()
+        solved = model.Status == gp.GRB.OPTIMAL
+        result = {
+            'status': model.Status,
+            'solve_time': model.Runtime,
+            'simplex_iterations': model.IterCount,
+            'barrier_iterations': model.BarIterCount,
+            'objective': model.ObjVal if solved else np.nan,
+            'x': np.array(model.getAttr('X', model.getVars())) if solved else None,
+        }
+        model.dispose()
+        env.dispose()
+
+    elif solver == 'highs':
+        import highspy
+        from luto.solvers.highs_solver import set_highs_options
+
+        highs = highspy.Highs()
+        set_highs_options(highs, overrides)
+        highs.readModel(model_path)
+        start_time = highs.getRunTime()     # The run time also counts reading the model
+        highs.run()
+        solved = highs.getModelStatus() == highspy.HighsModelStatus.kOptimal
+        info = highs.getInfo()
+        result = {
+            'status': highs.modelStatusToString(highs.getModelStatus()),
+            'solve_time': highs.getRunTime() - start_time,
+            'simplex_iterations': info.simplex_iteration_count,
+            'barrier_iterations': info.ipm_iteration_count,
+            'objective': info.objective_function_value if solved else np.nan,
+            'x': np.array(highs.getSolution().col_value) if solved else None,
+        }
+
+    else:
+        raise ValueError("Unknown solver: must be either 'gurobi' or 'highs'")
+
+    return result
+
+
+def replay_models(model_dir: str, grid: dict = REPLAY_GRID, solver: str = settings.SOLVER) -> pd.DataFrame:
+    """
+    Replays every model in `model_dir` with every combination of the settings in `grid`.
+    """
+    records = []
+    for model_path in sorted(glob(f"{model_dir}/*.mps")):
+        name = os.path.basename(model_path)[:-len('.mps')]
+        with open(f"{model_dir}/{name}.json") as f:
+            pipeline_solve = json.load(f)
+        pipeline_objective = pipeline_solve['objective']
+        objective_scale = pipeline_solve.get('objective_scale', 1.0)    # The models are written scaled, see settings.LP_SCALING
+
+        for values in itertools.product(*grid.values()):
+            overrides = dict(zip(grid.keys(), values))
+            print(f"Replaying {name} with {overrides}...", flush=True)
+
+            result = replay_model(model_path, overrides, solver)
+            result['objective'] /= objective_scale
+            records.append({
+                'model': name,
+                **overrides,
+                'status': result['status'],
+                'solve_time': result['solve_time'],
+                'simplex_iterations': result['simplex_iterations'],
+                'barrier_iterations': result['barrier_iterations'],
+                'objective': result['objective'],
+                'objective_drift': result['objective'] - pipeline_objective,
+                'relative_objective_drift': (result['objective'] - pipeline_objective) / max(abs(pipeline_objective), 1e-10),
+            })
+
+    return pd.DataFrame(records)
+
+
+if __name__ == '__main__':
+    model_dir = f"{settings.OUTPUT_DIR}/solver_models"
+    results = replay_models(model_dir)
+    results.to_csv(f"{model_dir}/replay_results.csv", index=False)
+    print(results.to_string())
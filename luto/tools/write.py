@@ -54,6 +54,7 @@ import luto.economics.non_agricultural.transitions as non_ag_transitions
 import luto.economics.non_agricultural.ghg as non_ag_ghg
 import luto.economics.non_agricultural.water as non_ag_water
 import luto.economics.non_agricultural.biodiversity as non_ag_biodiversity
+import luto.economics.non_agricultural.matrices as non_ag_matrices
 
 from luto.settings import AG_MANAGEMENTS, NON_AG_LAND_USES
 from luto.ag_managements import AG_MANAGEMENTS_TO_LAND_USES
@@ -101,8 +102,14 @@ def write_data(data: Data):
     # Write the area transition between base-year and target-year
     write_area_transition_start_end(data, f'{data.path}/out_{years[-1]}')
 
-    # Write outputs for each year
-    jobs = [delayed(write_output_single_year)(data, yr, path_yr, None) for (yr, path_yr) in zip(years, paths)]
+    # Write outputs for each year, except those already written during the run. Every target year of a
+    # snapshot run is compared to the base year, not to the target year before it
+    jobs = [
+        delayed(write_output_single_year)(
+            data, yr, path_yr, data.YR_CAL_BASE if settings.MODE == 'snapshot' and yr > data.YR_CAL_BASE else None
+        )
+        for (yr, path_yr) in zip(years, paths) if yr not in data.written_years
+    ]
 
     # Check if the simulation is complete by comparing the last year in the simulation with the target year
     complete_simulation = max([int(i[-4:]) for i in os.listdir(data.path) if 'out_' in i]) == max(years)
@@ -116,7 +123,7 @@ def write_data(data: Data):
                   Only Writing the avaliable outputs ({years[0]}-{years[-1]}) to output directory.\n''')
 
     # Parallel write the outputs for each year
-    num_jobs = min(len(jobs), settings.WRITE_THREADS) if settings.PARALLEL_WRITE else 1   # Use the minimum between jobs_num and threads for parallel writing
+    num_jobs = min(max(len(jobs), 1), settings.WRITE_THREADS) if settings.PARALLEL_WRITE else 1   # Use the minimum between jobs_num and threads for parallel writing
     Parallel(n_jobs=num_jobs)(jobs)
 
     # Copy the base-year outputs to the path_begin_end_compare
@@ -161,22 +168,23 @@ def write_output_single_year(data: Data, yr_cal, path_yr, yr_cal_sim_pre=None):
     # compared to the area calculated from dvars
     write_crosstab(data, yr_cal, path_yr, yr_cal_sim_pre)
 
-    # Write the reset outputs
-    write_files(data, yr_cal, path_yr)
-    write_files_separate(data, yr_cal, path_yr) if settings.WRITE_OUTPUT_GEOTIFFS else None
-    write_dvar_area(data, yr_cal, path_yr)
-    write_quantity(data, yr_cal, path_yr, yr_cal_sim_pre)
-    write_revenue_cost_ag(data, yr_cal, path_yr)
-    write_revenue_cost_ag_management(data, yr_cal, path_yr)
-    write_revenue_cost_non_ag(data, yr_cal, path_yr)
-    write_cost_transition(data, yr_cal, path_yr)
-    write_water(data, yr_cal, path_yr)
-    write_ghg(data, yr_cal, path_yr)
-    write_ghg_separate(data, yr_cal, path_yr)
-    write_ghg_offland_commodity(data, yr_cal, path_yr)
-    write_biodiversity(data, yr_cal, path_yr)
-    write_biodiversity_separate(data, yr_cal, path_yr)
-    write_biodiversity_contribution(data, yr_cal, path_yr)
+    # Write the reset outputs; the yields of this year are shared by all the agricultural matrix builders
+    with ag_quantity.shared_yields(data, yr_cal - data.YR_CAL_BASE):
+        write_files(data, yr_cal, path_yr)
+        write_files_separate(data, yr_cal, path_yr) if settings.WRITE_OUTPUT_GEOTIFFS else None
+        write_dvar_area(data, yr_cal, path_yr)
+        write_quantity(data, yr_cal, path_yr, yr_cal_sim_pre)
+        write_revenue_cost_ag(data, yr_cal, path_yr)
+        write_revenue_cost_ag_management(data, yr_cal, path_yr)
+        write_revenue_cost_non_ag(data, yr_cal, path_yr)
+        write_cost_transition(data, yr_cal, path_yr, yr_cal_sim_pre)
+        write_water(data, yr_cal, path_yr)
+        write_ghg(data, yr_cal, path_yr)
+        write_ghg_separate(data, yr_cal, path_yr, yr_cal_sim_pre)
+        write_ghg_offland_commodity(data, yr_cal, path_yr)
+        write_biodiversity(data, yr_cal, path_yr)
+        write_biodiversity_separate(data, yr_cal, path_yr)
+        write_biodiversity_contribution(data, yr_cal, path_yr)
 
     print(f"Finished writing {yr_cal} out of {years[0]}-{years[-1]} years\n")
 
@@ -319,6 +327,23 @@ def write_files_separate(data: Data, yr_cal, path, ammap_separate=False):
 
 
 
+def get_production(data: Data, yr_cal):
+    """
+    Return the commodity production of `yr_cal`, as recorded by the solver if available,
+    otherwise calculated from the decision variables of that year.
+    """
+    if 'Production' in data.prod_data.get(yr_cal, {}):
+        return np.array(data.prod_data[yr_cal]['Production'])
+
+    return data.get_production_from_dvars(
+        yr_cal - data.YR_CAL_BASE,
+        data.ag_dvars[yr_cal],
+        data.non_ag_dvars[yr_cal],
+        data.ag_man_dvars[yr_cal],
+        data.lumaps[yr_cal],
+    )
+
+
 def write_quantity(data: Data, yr_cal, path, yr_cal_sim_pre=None):
     '''Write quantity comparison between base year and target year.'''
 
@@ -335,8 +360,8 @@ def write_quantity(data: Data, yr_cal, path, yr_cal_sim_pre=None):
         assert data.YR_CAL_BASE <= yr_cal_sim_pre < yr_cal, f"yr_cal_sim_pre ({yr_cal_sim_pre}) must be >= {data.YR_CAL_BASE} and < {yr_cal}"
 
         # Get commodity production quantities produced in base year and target year
-        prod_base = np.array(data.prod_data[yr_cal_sim_pre]['Production'])
-        prod_targ = np.array(data.prod_data[yr_cal]['Production'])
+        prod_base = get_production(data, yr_cal_sim_pre)
+        prod_targ = get_production(data, yr_cal)
         demands = data.D_CY[yr_idx]  # Get commodity demands for target year
 
         # Calculate differences
@@ -358,7 +383,7 @@ def write_quantity(data: Data, yr_cal, path, yr_cal_sim_pre=None):
         df.to_csv(os.path.join(path, f'quantity_comparison_{yr_cal}.csv'), index=False)
 
         # Write the production of each year to disk
-        production_years = pd.DataFrame({yr_cal: data.prod_data[yr_cal]['Production']})
+        production_years = pd.DataFrame({yr_cal: prod_targ})
         production_years.insert(0, 'Commodity', [i[0].capitalize() + i[1:] for i in data.COMMODITIES])
         production_years = production_years.rename(columns={2011: 'Value (tonnes, KL)'})
         production_years['Year'] = yr_cal
@@ -516,22 +541,20 @@ def write_cost_transition(data: Data, yr_cal, path, yr_cal_sim_pre=None):
     # Get the transition cost matrices for agricultural land-use
     if yr_idx == 0:
         base_mrj = np.zeros((data.NLMS, data.NCELLS, data.N_AG_LUS))
-        ag_transitions_cost_mat = {k: np.zeros((data.NLMS, data.NCELLS, data.N_AG_LUS))
-                                for k in ['Establishment cost', 'Water license cost', 'GHG emissions cost']}
+        ag_transitions_cost_smrj = np.zeros((len(ag_transitions.AG_TRANSITION_COST_TYPES), data.NLMS, data.NCELLS, data.N_AG_LUS))
     else:
         # Get the base_year mrj matirx
         base_mrj = tools.lumap2ag_l_mrj(data.lumaps[yr_cal_sim_pre], data.lmmaps[yr_cal_sim_pre])
-        # Get the transition cost matrices for agricultural land-use
-        ag_transitions_cost_mat = ag_transitions.get_transition_matrices(data, yr_idx, yr_cal_sim_pre, separate = True)
+        # Get the transition cost matrices for agricultural land-use, one slice per cost component
+        ag_transitions_cost_smrj = ag_transitions.get_transition_cost_components(data, yr_idx, yr_cal_sim_pre)
+
+    # Multiply by decision variables and sum over cells by the base land-use, for all cost components at once    (i,s,m,j)
+    ag_transitions_cost_ismj = np.einsum('mri,smrj,mrj->ismj', base_mrj, np.nan_to_num(ag_transitions_cost_smrj), ag_dvar, optimize=True)
 
     cost_dfs = []
     # Convert the transition cost matrices to a DataFrame
     for lu_desc, lu_idx in data.DESC2AGLU.items():
-        for cost_type in ag_transitions_cost_mat.keys():
-
-            base_lu_arr = base_mrj[:, :, lu_idx]                                      # Get the base land-use array                       (m,r)
-            arr = np.nan_to_num(ag_transitions_cost_mat[cost_type])                   # Get the transition cost matrix                    (m,r,j)
-            arr = np.einsum('mr,mrj,mrj->mj', base_lu_arr, arr, ag_dvar)              # Multiply by decision variables
+        for cost_type, arr in zip(ag_transitions.AG_TRANSITION_COST_TYPES, ag_transitions_cost_ismj[lu_idx]):
 
             arr_df = pd.DataFrame(arr.flatten(),
                             index=pd.MultiIndex.from_product([data.LANDMANS, data.AGRICULTURAL_LANDUSES],
@@ -644,10 +667,13 @@ def write_revenue_cost_non_ag(data: Data, yr_cal, path):
     yr_idx = yr_cal - data.YR_CAL_BASE
 
     # Get the non-agricultural revenue/cost matrices
-    ag_r_mrj = ag_revenue.get_rev_matrices(data, yr_idx)
-    non_ag_rev_mat = non_ag_revenue.get_rev_matrix(data, yr_cal, ag_r_mrj, data.lumaps[yr_cal])    # rk
-    ag_c_mrj = ag_cost.get_cost_matrices(data, yr_idx)
-    non_ag_cost_mat = non_ag_cost.get_cost_matrix(data, ag_c_mrj, data.lumaps[yr_cal], yr_cal)     # rk
+    ag_matrices = {
+        'ag_r_mrj': ag_revenue.get_rev_matrices(data, yr_idx),
+        'ag_c_mrj': ag_cost.get_cost_matrices(data, yr_idx),
+    }
+    non_ag_rk_matrices = non_ag_matrices.get_non_ag_matrices(data, yr_idx, data.lumaps[yr_cal], ag_matrices)
+    non_ag_rev_mat = non_ag_rk_matrices['non_ag_r_rk']     # rk
+    non_ag_cost_mat = non_ag_rk_matrices['non_ag_c_rk']    # rk
 
     # Replace nan with 0
     non_ag_rev_mat = np.nan_to_num(non_ag_rev_mat)
@@ -848,23 +874,6 @@ def write_water(data: Data, yr_cal, path):
     # Convert calendar year to year index.
     yr_idx = yr_cal - data.YR_CAL_BASE
    
-    # Set up data for river regions or drainage divisions
-    if settings.WATER_REGION_DEF == 'Drainage Division':
-        region_limits = data.DRAINDIV_LIMITS
-        region_id = data.DRAINDIV_ID
-        region_dict = data.DRAINDIV_DICT
-
-    elif settings.WATER_REGION_DEF == 'River Region':
-        region_limits = data.RIVREG_LIMITS
-        region_id = data.RIVREG_ID
-        region_dict = data.RIVREG_DICT
-
-    else:
-        raise ValueError(
-            f"Incorrect option for WATER_REGION_DEF in settings: {settings.WATER_REGION_DEF} "
-            f"(must be either 'Drainage Division' or 'River Region')."
-        ) 
-
     # Get water use for year in mrj format
     ag_w_mrj_CCI = ag_water.get_water_net_yield_matrices(data, yr_idx)
     non_ag_w_rk_CCI = non_ag_water.get_w_net_yield_matrix(data, ag_w_mrj_CCI, data.lumaps[yr_cal], yr_idx)
@@ -882,13 +891,13 @@ def write_water(data: Data, yr_cal, path):
     w_net_yield_limits = ag_water.get_water_net_yield_limit_values(data)
 
 
-    # Loop through specified water regions
-    df_water_seperate_dfs = []
-    df_water_limits_and_public_land_dfs = []
-    for region, (reg_name, limit_hist_level, ind) in w_net_yield_limits.items():
-        
+    # Sparse (region x cell) matrix whose rows follow the order of `w_net_yield_limits`
+    _, region_matrix = ag_water.get_water_region_matrix(data)
+    region_names = [reg_name for reg_name, _, _ in w_net_yield_limits.values()]
 
-        # Get the water yield limits and public land water yield
+    # Get the water yield limits and public land water yield
+    df_water_limits_and_public_land_dfs = []
+    for region, (reg_name, limit_hist_level, _) in w_net_yield_limits.items():
         water_limit_pub = pd.DataFrame({
             ('WNY LIMIT','HIST (ML)'):[limit_hist_level],
             ('WNY Pubulic','HIST (ML)'):[wny_outside_luto_study_area_base_yr[region]],
@@ -898,51 +907,44 @@ def write_water(data: Data, yr_cal, path):
         water_limit_pub.columns = ['Type','CCI Existence','REGION','Value (ML)']
         water_limit_pub = water_limit_pub[['REGION','Type','CCI Existence','Value (ML)']]
         water_limit_pub.insert(0, 'Year', yr_cal)
-    
-        
-        # Calculate water yield for region and save to dataframe
-        df_region = tools.calc_water(
-            data,
-            ind,
-            ag_w_mrj_base_yr,
-            non_ag_w_rk_base_yr,
-            ag_man_w_mrj,
-            data.ag_dvars[yr_cal],
-            data.non_ag_dvars[yr_cal],
-            data.ag_man_dvars[yr_cal])
-        
-
-        # Fix the land-use to the base year
-        # so that we can calculate water-yield only under climate change impact.
-        df_region_CCI = tools.calc_water(
-            data,
-            ind,
-            ag_w_mrj_CCI,
-            non_ag_w_rk_CCI,
-            ag_man_w_mrj,
-            data.ag_dvars[yr_cal],
-            data.non_ag_dvars[yr_cal],
-            data.ag_man_dvars[yr_cal])
-
-        # Calculate the water yield under different impacts
-        df_region['Without CCI'] = df_region['Water Net Yield (ML)']
-        df_region['With CCI'] = df_region_CCI['Water Net Yield (ML)']
-        
-        # Add the region name and year to the dataframe
-        df_region.insert(0, 'region', region_dict[region])
-        df_region.insert(0, 'Year', yr_cal)
-        
-        # Add dfs to list
-        df_water_seperate_dfs.append(df_region)
         df_water_limits_and_public_land_dfs.append(water_limit_pub)
 
+    # Calculate water yield for all regions
+    df_water_seperate = tools.calc_water(
+        data,
+        region_matrix,
+        region_names,
+        ag_w_mrj_base_yr,
+        non_ag_w_rk_base_yr,
+        ag_man_w_mrj,
+        data.ag_dvars[yr_cal],
+        data.non_ag_dvars[yr_cal],
+        data.ag_man_dvars[yr_cal])
+
+    # Fix the land-use to the base year
+    # so that we can calculate water-yield only under climate change impact.
+    df_water_seperate_CCI = tools.calc_water(
+        data,
+        region_matrix,
+        region_names,
+        ag_w_mrj_CCI,
+        non_ag_w_rk_CCI,
+        ag_man_w_mrj,
+        data.ag_dvars[yr_cal],
+        data.non_ag_dvars[yr_cal],
+        data.ag_man_dvars[yr_cal])
+
+    # Calculate the water yield under different impacts
+    df_water_seperate['Without CCI'] = df_water_seperate['Water Net Yield (ML)']
+    df_water_seperate['With CCI'] = df_water_seperate_CCI['Water Net Yield (ML)']
+    df_water_seperate.insert(0, 'Year', yr_cal)
+
     
     # Write the water limits and public land water yield to CSV
     df_water_limits_and_public_land = pd.concat(df_water_limits_and_public_land_dfs)
     df_water_limits_and_public_land.to_csv( os.path.join(path, f'water_yield_limits_and_public_land_{yr_cal}.csv'), index=False)
 
     # Write the separate water use to CSV
-    df_water_seperate = pd.concat(df_water_seperate_dfs)
     df_water_seperate = df_water_seperate.melt(
         id_vars=['Year','region','Landuse Type','Landuse','Water_supply'],
         value_vars=['Without CCI', 'With CCI'],
@@ -1136,7 +1138,7 @@ def write_biodiversity_contribution(data: Data, yr_cal, path):
 
 
 
-def write_ghg_separate(data: Data, yr_cal, path):
+def write_ghg_separate(data: Data, yr_cal, path, yr_cal_sim_pre=None):
 
     if not settings.GHG_EMISSIONS_LIMITS == 'on':
         return
@@ -1239,7 +1241,7 @@ def write_ghg_separate(data: Data, yr_cal, path):
     if yr_cal == data.YR_CAL_BASE:
         ghg_t = np.zeros(data.ag_dvars[yr_cal].shape, dtype=np.bool_)
     else:
-        yr_cal_sim_pre = simulated_year_list[yr_idx_sim - 1]
+        yr_cal_sim_pre = simulated_year_list[yr_idx_sim - 1] if yr_cal_sim_pre is None else yr_cal_sim_pre
         ghg_t = ag_ghg.get_ghg_transition_penalties(data, data.lumaps[yr_cal_sim_pre])
 
 